@@ -3,6 +3,8 @@ from __future__ import absolute_import
 import os
 import sqlite3 as sql
 
+from collections import OrderedDict
+from threading import Thread, Lock, Event
 from gi.repository import Gtk
 from sunflower.common import get_cache_directory, encode_file_name
 
@@ -33,11 +35,25 @@ class EmblemManager:
 			'emblem-urgent',
 			'emblem-web'
 		)
+	cache_size = 100  # number of directories with emblems kept in memory
+	schema_version = 1  # version of database layout, stored as user_version
+	vacuum_free_pages = 1000  # number of unused database pages before it's compacted
 
 	def __init__(self, parent):
 		self._parent = parent
 		self._icon_manager = self._parent.icon_manager
 
+		# emblems for recently used directories and icon availability
+		self._cache = OrderedDict()
+		self._cache_lock = Lock()
+		self._stop_event = Event()
+		self._generation = 0
+		self._has_icon = {}
+
+		# icon availability changes with theme
+		icon_theme = Gtk.IconTheme.get_default()
+		icon_theme.connect('changed', self._handle_icon_theme_change)
+
 		# connect to database
 		self._connection = self._connect_to_database()
 
@@ -45,6 +61,9 @@ class EmblemManager:
 		if not self._check_database():
 			self._create_database()
 
+		# remove emblems of items which no longer exist
+		Thread(target=self._collect_garbage, daemon=True).start()
+
 	def _connect_to_database(self):
 		"""Create a connection to database."""
 		cache_directory = get_cache_directory()
@@ -72,74 +91,226 @@ class EmblemManager:
 
 	def _check_database(self):
 		"""Check storage database integrity."""
-		result = False
-
 		cursor = self._get_cursor()
-		result = self._table_exists(cursor, 'items')
-		result = result and self._table_exists(cursor, 'emblems')
+		cursor.execute('PRAGMA user_version')
 
-		return result
+		return cursor.fetchone()[0] == self.schema_version
 
 	def _create_database(self):
-		"""Create database tables."""
+		"""Create database tables, migrating data from older versions."""
 		cursor = self._get_cursor()
+		migrate = self._table_exists(cursor, 'items')
 
-		cursor.executescript('''
-				CREATE TABLE items (
+		script = '''
+				BEGIN;
+				{0}
+				CREATE TABLE directories (
 					id INTEGER PRIMARY KEY AUTOINCREMENT,
-					path TEXT NOT NULL,
-					name TEXT NOT NULL
+					path TEXT NOT NULL UNIQUE
 				);
-				CREATE INDEX items_by_path ON items(path);
-				CREATE INDEX items_by_path_and_name ON items(path, name);
 
 				CREATE TABLE emblems (
-					id INTEGER PRIMARY KEY AUTOINCREMENT,
-					item INTEGER NOT NULL,
-					value TEXT NOT NULL
-				);
-				CREATE INDEX emblems_by_item ON emblems(item);
-			''')
+					directory INTEGER NOT NULL,
+					name TEXT NOT NULL,
+					value TEXT NOT NULL,
+					PRIMARY KEY (directory, name, value)
+				) WITHOUT ROWID;
+				{1}
+				PRAGMA user_version={2};
+				COMMIT;
+			'''
+
+		if migrate:
+			# items were stored with full path, move them to directories
+			script = script.format(
+					'''
+					ALTER TABLE items RENAME TO legacy_items;
+					ALTER TABLE emblems RENAME TO legacy_emblems;
+					''',
+					'''
+					INSERT INTO directories(path) SELECT DISTINCT path FROM legacy_items;
+					INSERT OR IGNORE INTO emblems(directory, name, value)
+						SELECT directories.id, legacy_items.name, legacy_emblems.value FROM legacy_items
+						JOIN legacy_emblems ON legacy_emblems.item=legacy_items.id
+						JOIN directories ON directories.path=legacy_items.path;
+
+					DROP TABLE legacy_emblems;
+					DROP TABLE legacy_items;
+					''',
+					self.schema_version
+				)
 
-		# commit changes
-		self._connection.commit()
+		else:
+			script = script.format('', '', self.schema_version)
+
+		cursor.executescript(script)
 
 	def _get_cursor(self):
 		"""Return new cursor for database."""
 		assert self._connection is not None
 		return self._connection.cursor()
 
-	def add_emblem(self, path, item_name, emblem):
-		"""Add emblems for specified path."""
-		result = False
+	def _get_directory_id(self, cursor, path, create=False):
+		"""Return id of directory, optionally creating it."""
+		cursor.execute('SELECT id FROM directories WHERE path=?', (path,))
+		data = cursor.fetchone()
+
+		if data is not None:
+			return data[0]
+
+		if not create:
+			return None
+
+		cursor.execute('INSERT INTO directories(path) VALUES(?)', (path,))
+		return cursor.lastrowid
+
+	def _collect_garbage(self):
+		"""Remove emblems for items which no longer exist and compact database.
+
+		Only local items in existing directories are checked. Missing directories
+		are left alone as they might belong to currently unmounted devices.
+		Database is compacted only when enough space is left unused.
+
+		"""
+		connection = self._connect_to_database()
+		cursor = connection.cursor()
+		changed_paths = []
+
+		try:
+			cursor.execute('SELECT id, path FROM directories')
+
+			for directory_id, path in cursor.fetchall():
+				if self._stop_event.is_set():
+					return
+
+				if not os.path.isabs(path) or not os.path.isdir(path):
+					continue
+
+				cursor.execute('SELECT DISTINCT name FROM emblems WHERE directory=?', (directory_id,))
+				missing = [(directory_id, row[0]) for row in cursor.fetchall() if not os.path.lexists(os.path.join(path, row[0]))]
+
+				if missing:
+					cursor.executemany('DELETE FROM emblems WHERE directory=? AND name=?', missing)
+					changed_paths.append(path)
+
+			# remove directories without emblems
+			cursor.execute('DELETE FROM directories WHERE id NOT IN (SELECT DISTINCT directory FROM emblems)')
+			connection.commit()
+
+			# cached emblems could have been loaded before removal
+			for path in changed_paths:
+				self._invalidate(path)
+
+			cursor.execute('PRAGMA freelist_count')
+			if cursor.fetchone()[0] >= self.vacuum_free_pages:
+				connection.execute('VACUUM')
+
+		except sql.Error:
+			pass  # database is busy, try again next time
+
+		finally:
+			connection.close()
+
+	def cancel_all(self):
+		"""Stop garbage collection if it's still running."""
+		self._stop_event.set()
+
+	def _handle_icon_theme_change(self, icon_theme, data=None):
+		"""Forget icon availability when icon theme changes."""
+		self._has_icon.clear()
+
+	def _filter_available(self, emblems):
+		"""Return list of emblems which exist in current icon theme."""
+		result = []
+
+		for emblem in emblems:
+			available = self._has_icon.get(emblem)
+
+			if available is None:
+				available = Gtk.IconTheme.get_default().has_icon(emblem)
+				self._has_icon[emblem] = available
+
+			if available:
+				result.append(emblem)
+
+		return result
+
+	def _invalidate(self, path=None):
+		"""Remove cached emblems for specified path or all paths."""
+		with self._cache_lock:
+			self._generation += 1
+
+			if path is None:
+				self._cache.clear()
+			else:
+				self._cache.pop(path, None)
+
+	def _get_path_emblems(self, path):
+		"""Return dictionary of item names and their stored emblems for path."""
+		with self._cache_lock:
+			result = self._cache.get(path)
+
+			if result is not None:
+				self._cache.move_to_end(path)
+				return result
+
+			generation = self._generation
+
+		# load all emblems for path at once
+		result = {}
 		cursor = self._get_cursor()
+		cursor.execute(
+				'SELECT emblems.name, emblems.value FROM emblems '
+				'JOIN directories ON directories.id=emblems.directory '
+				'WHERE directories.path=?',
+				(path,)
+			)
 
-		# find item id
-		cursor.execute('SELECT id FROM items WHERE path=? AND name=? LIMIT 1', (path, item_name))
-		data = cursor.fetchone()
+		for item_name, emblem in cursor.fetchall():
+			result.setdefault(item_name, []).append(emblem)
 
-		if data is None:
-			# item doesn't exist, insert new one
-			cursor.execute('INSERT INTO items(path, name) VALUES(?, ?)', (path, item_name))
-			item_id = cursor.lastrowid
+		# store emblems in cache unless they changed while loading
+		with self._cache_lock:
+			if generation != self._generation:
+				return result
 
-		else:
-			item_id = data[0]
+			self._cache[path] = result
 
-		# find emblem id
-		cursor.execute('SELECT id FROM emblems WHERE item=? AND value=? LIMIT 1', (item_id, emblem))
-		data = cursor.fetchone()
+			while len(self._cache) > self.cache_size:
+				self._cache.popitem(last=False)
 
-		# emblem already exists
-		if data is not None:
-			return result
+		return result
+
+	def _move_directory_tree(self, cursor, source, destination):
+		"""Update paths of moved directory and directories inside of it."""
+		prefix = os.path.join(source, '')
+		upper = prefix[:-1] + chr(ord(os.path.sep) + 1)
+
+		cursor.execute('SELECT id, path FROM directories WHERE path=? OR (path>? AND path<?)', (source, prefix, upper))
 
-		# add new emblem to item
-		cursor.execute('INSERT INTO emblems(item, value) VALUES(?, ?)', (item_id, emblem))
-		result = True
+		for directory_id, path in cursor.fetchall():
+			new_path = destination if path == source else os.path.join(destination, path[len(prefix):])
+			existing_id = self._get_directory_id(cursor, new_path)
+
+			if existing_id is None:
+				cursor.execute('UPDATE directories SET path=? WHERE id=?', (new_path, directory_id))
+
+			else:
+				# directory was merged with existing one
+				cursor.execute('UPDATE OR REPLACE emblems SET directory=? WHERE directory=?', (existing_id, directory_id))
+				cursor.execute('DELETE FROM directories WHERE id=?', (directory_id,))
+
+	def add_emblem(self, path, item_name, emblem):
+		"""Add emblems for specified path."""
+		cursor = self._get_cursor()
+		directory_id = self._get_directory_id(cursor, path, create=True)
+
+		cursor.execute('INSERT OR IGNORE INTO emblems(directory, name, value) VALUES(?, ?, ?)', (directory_id, item_name, emblem))
+		result = cursor.rowcount > 0
 
 		# commit changes
 		self._connection.commit()
+		self._invalidate(path)
 
 		return result
 
@@ -155,51 +326,103 @@ class EmblemManager:
 
 	def set_emblems(self, path, item_name, emblems):
 		"""Set multiple emblems at the same time."""
-		self.clear_emblems(path, item_name, remove_item=False)
+		self.set_emblems_bulk(path, {item_name: emblems})
+
+	def set_emblems_bulk(self, path, emblems):
+		"""Set emblems for multiple items in path using single transaction.
+
+		Emblems are specified as dictionary of item names and emblem lists.
+		Existing emblems of specified items are replaced.
+
+		"""
 		cursor = self._get_cursor()
+		directory_id = self._get_directory_id(cursor, path, create=True)
 
-		# find item id
-		cursor.execute('SELECT id FROM items WHERE path=? AND name=? LIMIT 1', (path, item_name))
-		data = cursor.fetchone()
+		# replace emblems
+		cursor.executemany('DELETE FROM emblems WHERE directory=? AND name=?', ((directory_id, name) for name in emblems))
+		cursor.executemany(
+				'INSERT OR IGNORE INTO emblems(directory, name, value) VALUES(?, ?, ?)',
+				((directory_id, name, emblem) for name, values in emblems.items() for emblem in values)
+			)
+
+		self._connection.commit()
+		self._invalidate(path)
+
+	def toggle_emblem_many(self, path, item_names, emblem):
+		"""Toggle emblem on multiple items in path using single transaction.
 
-		if data is None:
-			# item doesn't exist, insert new one
-			cursor.execute('INSERT INTO items(path, name) VALUES(?, ?)', (path, item_name))
-			item_id = cursor.lastrowid
+		Emblem is removed if all of the items have it, otherwise it's added to
+		items missing it. Returns True if emblem was added.
+
+		"""
+		current = self._get_path_emblems(path)
+		remove = all(emblem in current.get(name, ()) for name in item_names)
+
+		cursor = self._get_cursor()
+		directory_id = self._get_directory_id(cursor, path, create=not remove)
+
+		if remove:
+			cursor.executemany(
+					'DELETE FROM emblems WHERE directory=? AND name=? AND value=?',
+					((directory_id, name, emblem) for name in item_names)
+				)
 
 		else:
-			item_id = data[0]
+			cursor.executemany(
+					'INSERT OR IGNORE INTO emblems(directory, name, value) VALUES(?, ?, ?)',
+					((directory_id, name, emblem) for name in item_names)
+				)
+
+		self._connection.commit()
+		self._invalidate(path)
+
+		return not remove
+
+	def move_emblems(self, items):
+		"""Move emblems along with items using single transaction.
+
+		Items are specified as list of (source, destination) absolute paths.
+		Emblems of items inside of moved directories are moved as well.
+
+		"""
+		cursor = self._get_cursor()
+
+		for source, destination in items:
+			source_path, source_name = os.path.split(source)
+			destination_path, destination_name = os.path.split(destination)
+			source_id = self._get_directory_id(cursor, source_path)
+
+			if source_id is not None:
+				destination_id = self._get_directory_id(cursor, destination_path, create=True)
+
+				# replace emblems of overwritten item
+				cursor.execute('DELETE FROM emblems WHERE directory=? AND name=?', (destination_id, destination_name))
+				cursor.execute(
+						'UPDATE emblems SET directory=?, name=? WHERE directory=? AND name=?',
+						(destination_id, destination_name, source_id, source_name)
+					)
+
+			self._move_directory_tree(cursor, source, destination)
 
-		# store new emblems
-		data = tuple((item_id, emblem) for emblem in emblems)
-		cursor.executemany('INSERT INTO emblems(item, value) VALUES(?, ?)', data)
 		self._connection.commit()
+		self._invalidate()
 
 	def remove_emblem(self, path, item_name, emblem):
 		"""Remove emblem from path."""
 		result = False
 		cursor = self._get_cursor()
-
-		# find item id
-		cursor.execute('SELECT id FROM items WHERE path=? AND name=? LIMIT 1', (path, item_name))
-		data = cursor.fetchone()
+		directory_id = self._get_directory_id(cursor, path)
 
 		# item doesn't exist
-		if data is None:
-			return result
-
-		# find emblem id
-		cursor.execute('SELECT id FROM emblems WHERE item=? AND value=? LIMIT 1', (data[0], emblem))
-		data = cursor.fetchone()
-
-		# emblem doesn't exist
-		if data is None:
+		if directory_id is None:
 			return result
 
 		# remove emblem
-		cursor.execute('DELETE FROM emblems WHERE id=?', (data[0],))
+		cursor.execute('DELETE FROM emblems WHERE directory=? AND name=? AND value=?', (directory_id, item_name, emblem))
+		result = cursor.rowcount > 0
+
 		self._connection.commit()
-		result = True
+		self._invalidate(path)
 
 		return result
 
@@ -207,48 +430,28 @@ class EmblemManager:
 		"""Clear all emblems for path."""
 		result = False
 		cursor = self._get_cursor()
-
-		# find item id
-		cursor.execute('SELECT id FROM items WHERE path=? AND name=? LIMIT 1', (path, item_name))
-		data = cursor.fetchone()
+		directory_id = self._get_directory_id(cursor, path)
 
 		# remove emblems
-		if data is not None:
-			cursor.execute('DELETE FROM emblems WHERE item=?', (data[0],))
-
-			# remove item if requested
-			if remove_item:
-				cursor.execute('DELETE FROM items WHERE id=?', (data[0],))
+		if directory_id is not None:
+			cursor.execute('DELETE FROM emblems WHERE directory=? AND name=?', (directory_id, item_name))
+			result = cursor.rowcount > 0
 
 			# commit changes
 			self._connection.commit()
-			result = True
+			self._invalidate(path)
 
 		return result
 
 	def get_emblems(self, path, item_name):
 		"""Get all emblem names for item in path."""
-		result = None
-		cursor = self._get_cursor()
-
-		# find path in database
-		cursor.execute('SELECT id FROM items WHERE path=? AND name=? LIMIT 1', (path, item_name))
-		row = cursor.fetchone()
+		emblems = self._get_path_emblems(path).get(item_name)
 
 		# no emblems for this path
-		if row is None:
-			return result
-
-		# get emblems for this item
-		item_id = row[0]
-		cursor.execute('SELECT value FROM emblems WHERE item=?', (item_id,))
+		if emblems is None:
+			return None
 
-		# prepare result
-		icon_theme = Gtk.IconTheme.get_default()
-		result = tuple(row[0] for row in cursor.fetchall())
-		result = [icon for icon in result if icon_theme.has_icon(icon)]
-
-		return result
+		return self._filter_available(emblems)
 
 	def get_available_emblems(self):
 		"""Get all available emblems."""
@@ -256,22 +459,5 @@ class EmblemManager:
 
 	def get_emblems_for_path(self, path):
 		"""Get emblems for all items in specified path."""
-		result = {}
-		cursor = self._get_cursor()
-
-		# get all the items in path
-		cursor.execute('SELECT id, name FROM items WHERE path=?', (path,))
-		items = cursor.fetchall()
-
-		# exit if there are no items in path
-		if len(items) == 0:
-			return result
-
-		# get emblems for each item
-		icon_theme = Gtk.IconTheme.get_default()
-		for item_id, item_name in items:
-			cursor.execute('SELECT value FROM emblems WHERE item=?', (item_id,))
-			emblems = tuple(row[0] for row in cursor.fetchall())
-			result[item_name] = [icon for icon in emblems if icon_theme.has_icon(icon)]
-
-		return result
+		emblems = self._get_path_emblems(path)
+		return {item_name: self._filter_available(values) for item_name, values in emblems.items()}
@@ -42,6 +42,7 @@ from sunflower.tools.advanced_rename import AdvancedRename
 from sunflower.tools.find_files import FindFiles
 from sunflower.tools.version_check import VersionCheck
 from sunflower.tools.disk_usage import DiskUsage
+from sunflower.tools.file_index import FileIndex
 from sunflower.config import Config
 
 # user interface imports
@@ -157,6 +158,7 @@ class MainWindow(Gtk.ApplicationWindow):
 		self.indicator = Indicator(self)
 		self.preferences_window = PreferencesWindow(self)
 		self.disk_usage = DiskUsage(self)
+		self.file_index = FileIndex(self)
 		self.shortcuts_window = ShortcutsWindow(self)
 
 		# create header bar
@@ -520,6 +522,12 @@ class MainWindow(Gtk.ApplicationWindow):
 		# terminate all disk usage threads
 		self.disk_usage.cancel_all()
 
+		# stop indexing files
+		self.file_index.cancel_all()
+
+		# stop removing stale emblems
+		self.emblem_manager.cancel_all()
+
 		# lock keyring
 		self.keyring_manager.lock_keyring()
 
@@ -1891,6 +1899,10 @@ class MainWindow(Gtk.ApplicationWindow):
 					'force_directories': False,
 					'show_expanders': False,
 					'second_extension': False,
+					'compact_list': False,
+					'metadata_cache': False,
+					'metadata_cache_ttl': 10,
+					'metadata_cache_size': 10000,
 					'always_visible': []
 				})
 
@@ -1904,6 +1916,7 @@ class MainWindow(Gtk.ApplicationWindow):
 					'overwrite_in_silent': True,
 					'trash_files': True,
 					'reserve_size': False,
+					'copy_workers': 1,
 					'automount_start': False,
 					'automount_insert': False,
 					'follow_symlink': False
@@ -67,6 +67,10 @@ class ItemListOptions(SettingsPage):
 		self._checkbox_media_preview = Gtk.CheckButton(_('Fast media preview'))
 		self._checkbox_show_expanders = Gtk.CheckButton(_('Show tree expanders'))
 		self._checkbox_second_extension = Gtk.CheckButton(_('Support second level extension'))
+		self._checkbox_compact_list = Gtk.CheckButton(_('Compact list for very large directories'))
+		self._checkbox_compact_list.set_tooltip_text(_('Uses less memory but disables tree expanding. Applies to new tabs.'))
+		self._checkbox_metadata_cache = Gtk.CheckButton(_('Cache file information on remote locations'))
+		self._checkbox_metadata_cache.set_tooltip_text(_('Reduces number of requests sent to server. Applies to new tabs.'))
 
 		self._checkbox_row_hinting.connect('toggled', self._parent.enable_save)
 		self._checkbox_case_sensitive.connect('toggled', self._parent.enable_save)
@@ -77,6 +81,8 @@ class ItemListOptions(SettingsPage):
 		self._checkbox_media_preview.connect('toggled', self._parent.enable_save)
 		self._checkbox_show_expanders.connect('toggled', self._parent.enable_save)
 		self._checkbox_second_extension.connect('toggled', self._parent.enable_save)
+		self._checkbox_compact_list.connect('toggled', self._parent.enable_save)
+		self._checkbox_metadata_cache.connect('toggled', self._parent.enable_save)
 
 		# file access mode format
 		hbox_mode_format = Gtk.HBox(False, 5)
@@ -398,6 +404,8 @@ class ItemListOptions(SettingsPage):
 		vbox_operation.pack_start(self._checkbox_single_click, False, False, 0)
 		vbox_operation.pack_start(self._checkbox_right_click, False, False, 0)
 		vbox_operation.pack_start(self._checkbox_second_extension, False, False, 0)
+		vbox_operation.pack_start(self._checkbox_compact_list, False, False, 0)
+		vbox_operation.pack_start(self._checkbox_metadata_cache, False, False, 0)
 		vbox_operation.pack_start(hbox_executable_action, False, False, 5)
 		vbox_operation.pack_start(hbox_quick_search, False, False, 5)
 		vbox_operation.pack_start(vbox_time_format, False, False, 5)
@@ -676,6 +684,8 @@ class ItemListOptions(SettingsPage):
 		self._checkbox_load_directories.set_active(section.get('force_directories'))
 		self._checkbox_show_expanders.set_active(section.get('show_expanders'))
 		self._checkbox_second_extension.set_active(section.get('second_extension'))
+		self._checkbox_compact_list.set_active(section.get('compact_list'))
+		self._checkbox_metadata_cache.set_active(section.get('metadata_cache'))
 
 		search_modifier = section.get('search_modifier')
 		self._checkbox_control.set_active(search_modifier[0] == '1')
@@ -728,6 +738,8 @@ class ItemListOptions(SettingsPage):
 		section.set('force_directories', self._checkbox_load_directories.get_active())
 		section.set('show_expanders', self._checkbox_show_expanders.get_active())
 		section.set('second_extension', self._checkbox_second_extension.get_active())
+		section.set('compact_list', self._checkbox_compact_list.get_active())
+		section.set('metadata_cache', self._checkbox_metadata_cache.get_active())
 
 		search_modifier = "%d%d%d" % (
 								self._checkbox_control.get_active(),
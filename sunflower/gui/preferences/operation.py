@@ -25,6 +25,15 @@ class OperationOptions(SettingsPage):
 		self._checkbox_automount_on_insert = Gtk.CheckButton(_('Automount removable drives when inserted'))
 		self._checkbox_confirm_delete = Gtk.CheckButton(_('Show confirmation dialog before deleting items'))
 
+		# number of files copied at the same time
+		hbox_copy_workers = Gtk.HBox(False, 5)
+		label_copy_workers = Gtk.Label(label=_('Number of files copied simultaneously:'))
+		label_copy_workers.set_alignment(0, 0.5)
+
+		adjustment = Gtk.Adjustment(1, 1, 32, 1, 4)
+		self._spinbutton_copy_workers = Gtk.SpinButton.new(adjustment, 0, 0)
+		self._spinbutton_copy_workers.connect('value-changed', self._parent.enable_save)
+
 		self._checkbox_trash_files.connect('toggled', self._parent.enable_save)
 		self._checkbox_reserve_size.connect('toggled', self._parent.enable_save)
 		self._checkbox_automount_on_start.connect('toggled', self._parent.enable_save)
@@ -35,6 +44,10 @@ class OperationOptions(SettingsPage):
 		vbox_general.pack_start(self._checkbox_trash_files, False, False, 0)
 		vbox_general.pack_start(self._checkbox_reserve_size, False, False, 0)
 
+		hbox_copy_workers.pack_start(label_copy_workers, False, False, 0)
+		hbox_copy_workers.pack_start(self._spinbutton_copy_workers, False, False, 0)
+		vbox_general.pack_start(hbox_copy_workers, False, False, 5)
+
 		vbox_mounts.pack_start(self._checkbox_automount_on_start, False, False, 0)
 		vbox_mounts.pack_start(self._checkbox_automount_on_insert, False, False, 0)
 
@@ -83,6 +96,7 @@ class OperationOptions(SettingsPage):
 		# load options
 		self._checkbox_trash_files.set_active(operations.get('trash_files'))
 		self._checkbox_reserve_size.set_active(operations.get('reserve_size'))
+		self._spinbutton_copy_workers.set_value(operations.get('copy_workers'))
 		self._checkbox_automount_on_start.set_active(operations.get('automount_start'))
 		self._checkbox_automount_on_insert.set_active(operations.get('automount_insert'))
 		self._checkbox_confirm_delete.set_active(confirmations.get('delete_items'))
@@ -96,6 +110,7 @@ class OperationOptions(SettingsPage):
 		# save settings
 		operations.set('trash_files', self._checkbox_trash_files.get_active())
 		operations.set('reserve_size', self._checkbox_reserve_size.get_active())
+		operations.set('copy_workers', self._spinbutton_copy_workers.get_value_as_int())
 		operations.set('automount_start', self._checkbox_automount_on_start.get_active())
 		operations.set('automount_insert', self._checkbox_automount_on_insert.get_active())
 		confirmations.set('delete_items', self._checkbox_confirm_delete.get_active())
@@ -145,12 +145,17 @@ class PropertiesWindow(Gtk.Window):
 									os.path.basename(self._path),
 									self._entry_name.get_text()
 								)
+				self._provider.commit_changes()
 
-				self._path = os.path.join(
+				new_path = os.path.join(
 									os.path.dirname(self._path),
 									self._entry_name.get_text()
 								)
 
+				# keep emblems with renamed item
+				self._application.emblem_manager.move_emblems(((self._path, new_path),))
+				self._path = new_path
+
 				# recreate item monitor
 				self._create_monitor()
 
@@ -292,6 +297,7 @@ class PropertiesWindow(Gtk.Window):
 		# set file mode
 		if not initial_update:
 			self._provider.set_mode(self._path, self._mode)
+			self._provider.commit_changes()
 
 	def _ownership_update(self):
 		"""Update owner and group"""
@@ -337,6 +343,7 @@ class PropertiesWindow(Gtk.Window):
 		# save new owner and group
 		try:
 			self._provider.set_owner(self._path, owner_id, group_id)
+			self._provider.commit_changes()
 
 		except OSError as error:
 			dialog = Gtk.MessageDialog(
@@ -378,13 +385,8 @@ class PropertiesWindow(Gtk.Window):
 		self._emblems_store.set_value(active_item, EmblemColumn.SELECTED, is_selected)
 
 		# update emblem database
-		update_method = (
-					self._application.emblem_manager.remove_emblem,
-					self._application.emblem_manager.add_emblem
-				)[is_selected]
-
 		path, item_name = os.path.split(self._path)
-		update_method(path, item_name, emblem)
+		self._application.emblem_manager.toggle_emblem_many(path, (item_name,), emblem)
 
 		# notify monitor of our change
 		parent = self._provider.get_parent()
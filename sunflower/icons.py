@@ -2,9 +2,13 @@ from __future__ import absolute_import
 from builtins import filter
 
 import os
+import re
 import sys
+import fnmatch
 import zipfile
 
+from collections import OrderedDict
+from threading import Lock
 from gi.repository import Gtk, Gio, GdkPixbuf, GLib
 from sunflower.common import UserDirectory, get_user_directory, get_static_assets_directory
 
@@ -12,6 +16,8 @@ from sunflower.common import UserDirectory, get_user_directory, get_static_asset
 class IconManager:
 	"""Icon manager class provides easy and abstract way of dealing with icons"""
 
+	cache_size = 1000  # number of file extensions with cached mime types and icons
+
 	def __init__(self, parent):
 		self._parent = parent
 		self._icon_theme = Gtk.IconTheme.get_default()
@@ -19,9 +25,111 @@ class IconManager:
 		self._default_file = None
 		self._default_directory = None
 
+		# file extension to mime type and icon name cache
+		self._file_icons = OrderedDict()
+		self._file_icons_lock = Lock()
+		self._name_patterns = self._get_name_patterns()
+		self._icon_theme.connect('changed', self._handle_theme_change)
+
 		# preload information
 		self._prepare_icons()
 
+	def _handle_theme_change(self, icon_theme, data=None):
+		"""Forget cached icons when theme changes."""
+		with self._file_icons_lock:
+			self._file_icons.clear()
+
+	def _get_name_patterns(self):
+		"""Return expression matching names whose mime type doesn't depend on extension alone.
+
+		Shared mime database matches some types on whole name, like `CMakeLists.txt`
+		or `Makefile.am`, or on patterns other than extension. Such names can't share
+		cached mime type with other files with the same extension.
+
+		"""
+		patterns = set()
+		data_directories = [GLib.get_user_data_dir()] + list(GLib.get_system_data_dirs())
+
+		for directory in data_directories:
+			try:
+				with open(os.path.join(directory, 'mime', 'globs2'), 'r') as raw_file:
+					for line in raw_file:
+						if line.startswith('#'):
+							continue
+
+						fields = line.rstrip('\n').split(':')
+						if len(fields) < 3:
+							continue
+
+						# simple extensions are handled by cache key
+						pattern = fields[2]
+						if pattern.startswith('*.') and not any(char in pattern[2:] for char in '*?['):
+							continue
+
+						patterns.add(pattern)
+
+			except (OSError, UnicodeDecodeError):
+				pass
+
+		if not patterns:
+			return None
+
+		return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns), re.IGNORECASE)
+
+	def _get_cache_key(self, filename):
+		"""Return part of file name which determines its mime type and icon.
+
+		Mime type is guessed from file name, for most files that means from
+		everything after first dot. Names without extension and names matched
+		by other patterns of mime database are used whole.
+
+		"""
+		name = os.path.basename(filename)
+		position = name.find('.', 1)
+
+		if position == -1 or (self._name_patterns is not None and self._name_patterns.match(name)):
+			return name
+
+		return name[position:]
+
+	def _get_file_type(self, filename):
+		"""Return mime type and icon name for specified file, using cache when possible."""
+		key = self._get_cache_key(filename)
+
+		with self._file_icons_lock:
+			result = self._file_icons.get(key)
+
+			if result is not None:
+				self._file_icons.move_to_end(key)
+				return result
+
+		icon_name = self._default_file
+		mime_type = self._parent.associations_manager.get_mime_type(filename)
+		themed_icon = None
+
+		# get icon names
+		if mime_type is not None:
+			themed_icon = Gio.content_type_get_icon(mime_type)
+
+		# get only valid icon names
+		if themed_icon is not None:
+			icon_list = themed_icon.get_names()
+			icon_list = list(filter(self.has_icon, icon_list))
+
+			if len(icon_list) > 0:
+				icon_name = icon_list[0]
+
+		# store result for other files with same extension
+		result = (mime_type, icon_name)
+
+		with self._file_icons_lock:
+			self._file_icons[key] = result
+
+			while len(self._file_icons) > self.cache_size:
+				self._file_icons.popitem(last=False)
+
+		return result
+
 	def _prepare_icons(self):
 		"""Load special user directories"""
 		# set default icons for file and directory
@@ -67,25 +175,13 @@ class IconManager:
 		"""Get icon sizes for specified name"""
 		return self._icon_theme.get_icon_sizes(icon_name)
 
+	def get_mime_type_for_file(self, filename):
+		"""Return mime type guessed from name of specified file"""
+		return self._get_file_type(filename)[0]
+
 	def get_icon_for_file(self, filename, size=Gtk.IconSize.MENU):
 		"""Load icon for specified file"""
-		result = self._default_file
-		mime_type = self._parent.associations_manager.get_mime_type(filename)
-		themed_icon = None
-
-		# get icon names
-		if mime_type is not None:
-			themed_icon = Gio.content_type_get_icon(mime_type)
-
-		# get only valid icon names
-		if themed_icon is not None:
-			icon_list = themed_icon.get_names()
-			icon_list = list(filter(self.has_icon, icon_list))
-
-			if len(icon_list) > 0:
-				result = icon_list[0]
-
-		return result
+		return self._get_file_type(filename)[1]
 
 	def get_icon_for_directory(self, path, size=Gtk.IconSize.MENU):
 		"""Get icon for specified directory"""
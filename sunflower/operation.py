@@ -4,22 +4,25 @@ import os
 import fnmatch
 
 from gi.repository import Gtk, GObject
+from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 
 from sunflower.gui.input_dialog import OverwriteFileDialog, OverwriteDirectoryDialog, OperationError
 from sunflower.gui.operation_dialog import CopyDialog, MoveDialog, DeleteDialog, RenameDialog
 from sunflower.gui.error_list import ErrorList
-from sunflower.plugin_base.provider import Mode as FileMode, TrashError, Support as ProviderSupport
+from sunflower.plugin_base.provider import Mode as FileMode, FileType, TrashError, Support as ProviderSupport
 from sunflower.plugin_base.monitor import MonitorSignals
 from sunflower.common import format_size
 from sunflower.queue import OperationQueue
+from sunflower.tools.directory_walker import DirectoryWalker
 from sunflower.gui.input_dialog import OverwriteOption
 
 
 class BufferSize:
 	LOCAL = 4096 * 1024
 	REMOTE = 100 * 1024
+	ARCHIVE = 1024 * 1024
 
 
 class Option:
@@ -103,6 +106,17 @@ class Operation(Thread):
 		if self._dialog is not None:
 			GObject.idle_add(self._dialog.destroy)
 
+	def _commit_changes(self, provider):
+		"""Write changes staged by provider and log errors. Returns True on success."""
+		try:
+			provider.commit_changes()
+
+		except Exception as error:
+			self._error_list.append(str(error))
+			return False
+
+		return True
+
 	def _get_free_space_input(self, needed, available):
 		"""Get user input when there is not enough space"""
 		size_format = self._application.options.get('size_format')
@@ -627,14 +641,35 @@ class CopyOperation(Operation):
 		self._total_count = 0
 		self._total_size = 0
 		self._buffer_size = 0
+		self._input_lock = Lock()
+		self._relative_paths = {}  # source path to relative path used while scanning
+		self._destination_names = {}  # file and relative path to chosen destination name
+
+		# number of files copied at the same time
+		self._copy_workers = max(1, self._application.options.section('operations').get('copy_workers'))
 
 		# cache settings
 		should_reserve = self._application.options.section('operations').get('reserve_size')
 		supported_by_provider = ProviderSupport.RESERVE_SIZE in self._destination.get_support()
 		self._reserve_size = should_reserve and supported_by_provider
 
+		# files from archives are extracted in storage order, by multiple workers
+		# only when members can be read independently, otherwise single worker
+		# continues decompressing where previous member ended
+		source_support = self._source.get_support()
+		self._bulk_read = ProviderSupport.BULK_READ in source_support and self._destination.is_local
+
+		if self._bulk_read and ProviderSupport.RANDOM_ACCESS in source_support:
+			self._copy_workers = max(self._copy_workers, os.cpu_count() or 1)
+
+		elif self._bulk_read:
+			self._copy_workers = 1
+
 		# detect buffer size
-		if self._source.is_local and self._destination.is_local:
+		if self._bulk_read:
+			self._buffer_size = BufferSize.ARCHIVE
+
+		elif self._source.is_local and self._destination.is_local:
 			system_stat = self._destination.get_system_size(self._destination_path)
 
 			if system_stat.block_size:
@@ -663,6 +698,9 @@ class CopyOperation(Operation):
 			self._selection_list = [item for item in self._selection_list
 									if not item.startswith(file_name + os.path.sep)]
 
+		# directories are listed in parallel while scanning
+		walker = DirectoryWalker(self._source, self._abort, self._can_continue)
+
 		# traverse through the rest of the items
 		for item in self._selection_list:
 			if self._abort.is_set(): break  # abort operation if requested
@@ -702,7 +740,8 @@ class CopyOperation(Operation):
 				if can_procede:
 					self._dir_list.append((item, relative_path))
 					if can_create: self._dir_list_create.append((item, relative_path))
-					self._scan_directory(item, relative_path)
+					self._relative_paths[source_path] = relative_path
+					walker.add(item, source_path)
 
 			elif fnmatch.fnmatch(item, self._options[Option.FILE_TYPE]):
 				# item is a file, get stats and update lists
@@ -716,6 +755,9 @@ class CopyOperation(Operation):
 
 				self._file_list.append((item, relative_path))
 
+		# scan content of selected directories
+		self._scan_directories(walker)
+
 	def _set_mode(self, path, mode):
 		"""Set mode for specified path"""
 		if not self._options[Option.SET_MODE]: return
@@ -735,10 +777,7 @@ class CopyOperation(Operation):
 
 		except Exception as error:
 			# problem setting mode, ask user
-			if Skip.MODE_SET in self._response_cache:
-				response = self._response_cache[Skip.MODE_SET]
-			else:
-				response = self._get_mode_set_error_input(error)
+			response = self._get_error_response(Skip.MODE_SET, self._get_mode_set_error_input, error)
 
 			# try to set mode again
 			if response == OperationError.RESPONSE_RETRY:
@@ -766,10 +805,7 @@ class CopyOperation(Operation):
 
 		except Exception as error:
 			# problem with setting owner, ask user
-			if Skip.MODE_SET in self._response_cache:
-				response = self._response_cache[Skip.MODE_SET]
-			else:
-				response = self._get_mode_set_error_input(error)
+			response = self._get_error_response(Skip.MODE_SET, self._get_mode_set_error_input, error)
 
 			# try to set owner again
 			if response == OperationError.RESPONSE_RETRY:
@@ -798,10 +834,7 @@ class CopyOperation(Operation):
 
 		except Exception as error:
 			# problem with setting owner, ask user
-			if Skip.MODE_SET in self._response_cache:
-				response = self._response_cache[Skip.MODE_SET]
-			else:
-				response = self._get_mode_set_error_input(error)
+			response = self._get_error_response(Skip.MODE_SET, self._get_mode_set_error_input, error)
 
 			# try to set timestamp again
 			if response == OperationError.RESPONSE_RETRY:
@@ -809,65 +842,67 @@ class CopyOperation(Operation):
 
 			return
 
-	def _scan_directory(self, directory, relative_path=None):
-		"""Recursively scan directory and populate list"""
-		source_path = self._source_path if relative_path is None else os.path.join(self._source_path, relative_path)
-		try:
-			# try to get listing from directory
-			item_list = self._source.list_dir(directory, relative_to=source_path)
+	def _scan_directories(self, walker):
+		"""Scan directories added to walker and populate lists"""
+		for directory, source_path, item_list, error in walker:
+			relative_path = self._relative_paths[source_path]
 
-		except Exception as error:
-			# problem with reading specified directory, ask user
-			if Skip.READ in self._response_cache:
-				response = self._response_cache[Skip.READ]
-			else:
-				response = self._get_read_error_input(error)
+			if error is not None:
+				# problem with reading specified directory, ask user
+				if Skip.READ in self._response_cache:
+					response = self._response_cache[Skip.READ]
+				else:
+					response = self._get_read_error_input(error)
 
-			# try to scan specified directory again
-			if response == OperationError.RESPONSE_RETRY:
-				self._scan_directory(directory, relative_path)
+				# try to scan specified directory again
+				if response == OperationError.RESPONSE_RETRY:
+					walker.add(directory, source_path)
 
-			return
+				continue
 
-		for item in item_list:
-			if self._abort.is_set(): break  # abort operation if requested
-			self._can_continue.wait()  # pause lock
+			for item, item_stat in item_list:
+				if self._abort.is_set(): break  # abort operation if requested
+				self._can_continue.wait()  # pause lock
 
-			GObject.idle_add(self._dialog.set_current_file, os.path.join(directory, item))
-			GObject.idle_add(self._dialog.pulse)
+				GObject.idle_add(self._dialog.set_current_file, os.path.join(directory, item))
+				GObject.idle_add(self._dialog.pulse)
 
-			full_name = os.path.join(directory, item)
+				full_name = os.path.join(directory, item)
 
-			# item is a directory, scan it
-			if self._source.is_dir(full_name, relative_to=source_path):
-				can_procede = True
-				can_create = True
+				# links need to be resolved in order to find out where they point to
+				if item_stat.type is FileType.LINK:
+					is_dir = self._source.is_dir(full_name, relative_to=source_path)
+				else:
+					is_dir = item_stat.type is FileType.DIRECTORY
 
-				if self._destination.exists(full_name, relative_to=self._destination_path):
-					can_create = False
+				# item is a directory, scan it
+				if is_dir:
+					can_procede = True
+					can_create = True
 
-					if self._merge_all is not None:
-						can_procede = self._merge_all
-					else:
-						can_procede = self._get_merge_input(full_name)
+					if self._destination.exists(full_name, relative_to=self._destination_path):
+						can_create = False
 
-				if can_procede:
-					# allow processing specified directory
-					self._dir_list.append((full_name, source_path))
-					if can_create: self._dir_list_create.append((full_name, source_path))
-					self._scan_directory(full_name, relative_path)
+						if self._merge_all is not None:
+							can_procede = self._merge_all
+						else:
+							can_procede = self._get_merge_input(full_name)
 
-			elif fnmatch.fnmatch(item, self._options[Option.FILE_TYPE]):
-				# item is a file, update global statistics
-				item_stat = self._source.get_stat(full_name, relative_to=source_path)
+					if can_procede:
+						# allow processing specified directory
+						self._dir_list.append((full_name, source_path))
+						if can_create: self._dir_list_create.append((full_name, source_path))
+						walker.add(full_name, source_path)
 
-				GObject.idle_add(self._dialog.increment_total_size, item_stat.size)
-				GObject.idle_add(self._dialog.increment_total_count, 1)
+				elif fnmatch.fnmatch(item, self._options[Option.FILE_TYPE]):
+					# item is a file, update global statistics
+					GObject.idle_add(self._dialog.increment_total_size, item_stat.size)
+					GObject.idle_add(self._dialog.increment_total_count, 1)
 
-				self._total_count += 1
-				self._total_size += item_stat.size
+					self._total_count += 1
+					self._total_size += item_stat.size
 
-				self._file_list.append((full_name, relative_path))
+					self._file_list.append((full_name, relative_path))
 
 	def _create_directory(self, directory, relative_path=None):
 		"""Create specified directory"""
@@ -913,13 +948,15 @@ class CopyOperation(Operation):
 		# set owner
 		self._set_owner(directory, file_stat.user_id, file_stat.group_id)
 
-	def _copy_file(self, file_name, relative_path=None):
-		"""Copy file content"""
+	def _get_destination_name(self, file_name, relative_path=None):
+		"""Check if destination file exists and ask user what to do.
+
+		Returns name of destination file or None if user chose to skip it.
+
+		"""
 		can_procede = True
 		source_path = self._source_path if relative_path is None else os.path.join(self._source_path, relative_path)
 		dest_file = file_name
-		sh = None
-		dh = None
 
 		# check if destination file exists
 		if self._destination.exists(file_name, relative_to=self._destination_path):
@@ -927,7 +964,8 @@ class CopyOperation(Operation):
 				can_procede = self._overwrite_all
 
 			else:
-				can_procede, options = self._get_overwrite_input(file_name)
+				with self._input_lock:
+					can_procede, options = self._get_overwrite_input(file_name)
 
 				# get new name if user specified
 				if options[OverwriteOption.RENAME]:
@@ -941,12 +979,44 @@ class CopyOperation(Operation):
 
 		# if user skipped this file return
 		if not can_procede:
-			self._file_list.pop(self._file_list.index((file_name, relative_path)))
+			self._file_list.remove((file_name, relative_path))
 
 			# update total size
 			file_stat = self._source.get_stat(file_name, relative_to=source_path)
 			GObject.idle_add(self._dialog.increment_current_size, file_stat.size)
-			return
+			return None
+
+		self._destination_names[(file_name, relative_path)] = dest_file
+
+		return dest_file
+
+	def _get_error_response(self, skip, get_input, error):
+		"""Get cached response for specified error type or ask user.
+
+		Since files can be copied by multiple workers at the same time this
+		method makes sure only one question is asked at a time.
+
+		"""
+		with self._input_lock:
+			if skip in self._response_cache:
+				response = self._response_cache[skip]
+			else:
+				response = get_input(error)
+
+		return response
+
+	def _copy_file(self, file_name, relative_path=None):
+		"""Copy file"""
+		dest_file = self._get_destination_name(file_name, relative_path)
+
+		if dest_file is not None:
+			self._copy_file_content(file_name, dest_file, relative_path)
+
+	def _copy_file_content(self, file_name, dest_file, relative_path=None):
+		"""Copy file content and set its parameters"""
+		source_path = self._source_path if relative_path is None else os.path.join(self._source_path, relative_path)
+		sh = None
+		dh = None
 
 		try:
 			# get file stats
@@ -988,20 +1058,17 @@ class CopyOperation(Operation):
 		except Exception as error:
 			# close handles if they exist
 			if hasattr(sh, 'close'): sh.close()
-			if hasattr(dh, 'close'): sh.close()
+			if hasattr(dh, 'close'): dh.close()
 
-			if Skip.CREATE in self._response_cache:
-				response = self._response_cache[Skip.CREATE]
-			else:
-				response = self._get_create_error_input(error)
+			response = self._get_error_response(Skip.CREATE, self._get_create_error_input, error)
 
 			# try to create file again and copy contents
 			if response == OperationError.RESPONSE_RETRY:
-				self._copy_file(dest_file)
+				self._copy_file_content(file_name, dest_file, relative_path)
 
 			else:
 				# user didn't want to retry, remove file from list
-				self._file_list.pop(self._file_list.index((file_name, relative_path)))
+				self._file_list.remove((file_name, relative_path))
 
 			# remove amount of copied bytes from total size
 			GObject.idle_add(self._dialog.increment_current_size, -destination_size)
@@ -1009,36 +1076,34 @@ class CopyOperation(Operation):
 			# exit method
 			return
 
+		# destination provider picks the fastest way to copy data
+		copier = self._destination.copy_file_data(sh, dh, self._buffer_size)
+
 		while True:
 			if self._abort.is_set(): break
 			self._can_continue.wait()  # pause lock
 
-			data = sh.read(self._buffer_size)
-
-			if data:
-				try:
-					# try writing data to destination
-					dh.write(data)
+			try:
+				# copy next chunk of data to destination
+				data_size = next(copier, None)
 
-				except IOError as error:
-					# handle error
-					if Skip.WRITE in self._response_cache:
-						response = self._response_cache[Skip.WRITE]
-					else:
-						response = self._get_write_error_input(error)
+			except IOError as error:
+				# handle error
+				response = self._get_error_response(Skip.WRITE, self._get_write_error_input, error)
 
-					# try to write data again
-					if response == OperationError.RESPONSE_RETRY:
-						GObject.idle_add(self._dialog.increment_current_size, -dh.tell())
-						if hasattr(sh, 'close'): sh.close()
-						if hasattr(dh, 'close'): sh.close()
+				# try to write data again
+				if response == OperationError.RESPONSE_RETRY:
+					GObject.idle_add(self._dialog.increment_current_size, -destination_size)
+					if hasattr(sh, 'close'): sh.close()
+					if hasattr(dh, 'close'): dh.close()
 
-						self._copy_file(dest_file)
+					self._copy_file_content(file_name, dest_file, relative_path)
 
-					return
+				return
 
-				destination_size += len(data)
-				GObject.idle_add(self._dialog.increment_current_size, len(data))
+			if data_size is not None:
+				destination_size += data_size
+				GObject.idle_add(self._dialog.increment_current_size, data_size)
 				if file_stat.size > 0:  # ensure we don't end up with error on 0 size files
 					GObject.idle_add(
 									self._dialog.set_current_file_fraction,
@@ -1140,17 +1205,63 @@ class CopyOperation(Operation):
 
 		item_list = self._file_list[:]
 
-		# copy all the files in list
-		for file_name, source_path in item_list:
-			# abort operation if requested
-			if self._abort.is_set(): break
+		# read files in the order they are stored to avoid seeking back and forth
+		if self._bulk_read:
+			def get_storage_key(item):
+				file_name, source_path = item
+				relative_to = self._source_path if source_path is None else os.path.join(self._source_path, source_path)
+				return self._source.get_storage_key(file_name, relative_to=relative_to)
+
+			item_list.sort(key=get_storage_key)
+
+		# copy files one by one
+		if self._copy_workers == 1:
+			for file_name, source_path in item_list:
+				# abort operation if requested
+				if self._abort.is_set(): break
+				self._can_continue.wait()  # pause lock
+
+				# copy file
+				GObject.idle_add(self._dialog.set_current_file, file_name)
+				self._copy_file(file_name, source_path)
+				GObject.idle_add(self._dialog.increment_current_count, 1)
+
+			return
+
+		# copy multiple files at the same time, overwrite questions are asked
+		# from this thread in list order and only file content is copied by workers
+		def copy_content(file_name, dest_file, source_path):
 			self._can_continue.wait()  # pause lock
 
-			# copy file
-			GObject.idle_add(self._dialog.set_current_file, file_name)
-			self._copy_file(file_name, source_path)
+			if not self._abort.is_set():
+				GObject.idle_add(self._dialog.set_current_file, file_name)
+				self._copy_file_content(file_name, dest_file, source_path)
+
 			GObject.idle_add(self._dialog.increment_current_count, 1)
 
+		futures = []
+
+		with ThreadPoolExecutor(max_workers=self._copy_workers) as executor:
+			for file_name, source_path in item_list:
+				# abort operation if requested
+				if self._abort.is_set(): break
+				self._can_continue.wait()  # pause lock
+
+				dest_file = self._get_destination_name(file_name, source_path)
+
+				if dest_file is None:
+					GObject.idle_add(self._dialog.increment_current_count, 1)
+					continue
+
+				futures.append(executor.submit(copy_content, file_name, dest_file, source_path))
+
+		# report errors workers didn't handle
+		for future in futures:
+			error = future.exception()
+
+			if error is not None:
+				self._error_list.append(str(error))
+
 	def _create_links(self):
 		GObject.idle_add(self._update_status, _('Creating links...'))
 		for link_name, source_path in self._link_list:
@@ -1198,6 +1309,7 @@ class CopyOperation(Operation):
 		self._create_links()
 		self._create_directory_list()
 		self._copy_file_list()
+		self._commit_changes(self._destination)
 
 		# notify user if window is not focused
 		def show_notification():
@@ -1240,6 +1352,11 @@ class CopyOperation(Operation):
 class MoveOperation(CopyOperation):
 	"""Operation thread used for moving files"""
 
+	def __init__(self, application, source, destination, options, destination_path=None):
+		CopyOperation.__init__(self, application, source, destination, options, destination_path)
+
+		self._moved_items = []  # source and destination paths of moved files
+
 	def _remove_path(self, path, item_list, relative_path=None):
 		"""Remove path specified path."""
 		source_path = self._source_path if relative_path is None else os.path.join(self._source_path, relative_path)
@@ -1305,6 +1422,11 @@ class MoveOperation(CopyOperation):
 								relative_to=source_path
 							)
 
+			self._moved_items.append((
+						os.path.join(source_path, file_name),
+						os.path.join(self._destination_path, dest_file)
+					))
+
 			# push events to the queue
 			if self._source_queue is not None:
 				event = (MonitorSignals.DELETED, file_name, None)
@@ -1406,6 +1528,32 @@ class MoveOperation(CopyOperation):
 					# prevent division by zero
 					GObject.idle_add(self._dialog.set_current_file_fraction, 1)
 
+	def _move_emblems(self, copied):
+		"""Move emblems of moved items to their new location."""
+		item_list = self._moved_items
+
+		# files which were copied and then removed, possibly under new name,
+		# those left in source after abort or errors keep their emblems
+		if copied:
+			for file_name, relative_path in self._file_list:
+				source_path = self._source_path if relative_path is None else os.path.join(self._source_path, relative_path)
+
+				if self._source.exists(file_name, relative_to=source_path):
+					continue
+
+				dest_file = self._destination_names.get((file_name, relative_path), file_name)
+				item_list.append((os.path.join(source_path, file_name), os.path.join(self._destination_path, dest_file)))
+
+		# directories are created on destination so move only those removed from source
+		for directory, relative_path in self._dir_list:
+			source_path = self._source_path if relative_path is None else os.path.join(self._source_path, relative_path)
+
+			if not self._source.exists(directory, relative_to=source_path):
+				item_list.append((os.path.join(source_path, directory), os.path.join(self._destination_path, directory)))
+
+		if item_list:
+			self._application.emblem_manager.move_emblems(item_list)
+
 	def _check_devices(self):
 		"""Check if source and destination are on the same file system"""
 		dev_source = self._source.get_stat(self._source.get_path(), extended=True).device
@@ -1454,15 +1602,27 @@ class MoveOperation(CopyOperation):
 		self._create_directory_list()
 
 		# copy/move files
-		if self._check_devices():
+		same_device = self._check_devices()
+
+		if same_device:
 			# both paths are on the same file system, move instead of copy
 			self._move_file_list()
 			self._delete_directories()
+			self._commit_changes(self._destination)
 
 		else:
 			# paths are located on different file systems, copy and remove
+			# sources only once copies are written to destination archive
 			self._copy_file_list()
-			self._delete_file_list()
+
+			if self._commit_changes(self._destination):
+				self._delete_file_list()
+
+		# write changes to source archive
+		self._commit_changes(self._source)
+
+		# keep emblems with moved items
+		self._move_emblems(copied=not same_device)
 
 		# notify user if window is not focused
 		def notify_is_not_focused():
@@ -1611,6 +1771,9 @@ class DeleteOperation(Operation):
 				# prevent division by zero
 				GObject.idle_add(self._dialog.set_current_file_fraction, 1)
 
+		# write changes to archives
+		self._commit_changes(self._source)
+
 		# notify user if window is not focused
 		def show_notification():
 			if not self._dialog.is_active() and not self._application.is_active() and not self._abort.is_set():
@@ -1649,6 +1812,7 @@ class RenameOperation(Operation):
 		self._destination_path = path
 		self._source_path = path
 		self._file_list = file_list
+		self._renamed_items = []  # old and new paths of renamed items
 
 	def _create_dialog(self):
 		"""Create operation dialog"""
@@ -1678,10 +1842,14 @@ class RenameOperation(Operation):
 			else:
 				# rename path
 				self._source.rename_path(old_name, new_name, relative_to=self._source_path)
+				self._renamed_items.append((
+							os.path.join(self._source_path, old_name),
+							os.path.join(self._source_path, new_name)
+						))
 
 				# push event to the queue
 				if self._source_queue is not None:
-					delete_event = (MonitorSignals.DELETE, old_name, None)
+					delete_event = (MonitorSignals.DELETED, old_name, None)
 					create_event = (MonitorSignals.CREATED, new_name, None)
 
 					self._source_queue.put(delete_event, False)
@@ -1696,7 +1864,7 @@ class RenameOperation(Operation):
 
 			# try renaming path again
 			if response == OperationError.RESPONSE_RETRY:
-				self._remove_path(old_name, new_name, index)
+				self._rename_path(old_name, new_name, index)
 
 			else:
 				# user didn't want to retry, remove path from list
@@ -1726,6 +1894,13 @@ class RenameOperation(Operation):
 				# prevent division by zero
 				GObject.idle_add(self._dialog.set_current_file_fraction, 1)
 
+		# write changes to archives
+		self._commit_changes(self._source)
+
+		# keep emblems with renamed items
+		if self._renamed_items:
+			self._application.emblem_manager.move_emblems(self._renamed_items)
+
 		# notify user if window is not focused
 		def notify_is_not_focused():
 			if not self._dialog.is_active() and not self._application.is_active() and not self._abort.is_set():
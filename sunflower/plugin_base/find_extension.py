@@ -47,6 +47,27 @@ class FindExtension:
 		"""Return widget container."""
 		return self.container
 
+	def get_process_predicate(self):
+		"""Return picklable callable testing local path or None.
+
+		Find files tool can run returned callable in separate processes when
+		searching local files. Extensions doing expensive checks, like reading
+		file content, should return one. Callable is retrieved after search has
+		been started and must accept single path argument.
+
+		"""
+		return None
+
+	def find_in_index(self, file_index, path, recursive):
+		"""Return list of matching paths from file index or None.
+
+		Extensions matching only by item name can answer queries using file
+		name index instead of walking through directories. None should be
+		returned if index can't be used or doesn't contain specified path.
+
+		"""
+		return None
+
 	def is_path_ok(self, provider, path):
 		"""Check is specified path fits the cirteria."""
 		return True
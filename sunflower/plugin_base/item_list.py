@@ -7,6 +7,7 @@ from gi.repository import Gtk, Gdk, GObject
 from sunflower import common
 from sunflower.plugin_base.plugin import PluginBase
 from sunflower.plugin_base.provider import Mode as FileMode
+from sunflower.plugin_base.metadata_cache import MetadataCache, CachedProvider
 from sunflower.operation import CopyOperation, MoveOperation
 from sunflower.accelerator_group import AcceleratorGroup
 from sunflower.parameters import Parameters
@@ -45,6 +46,11 @@ class ItemList(PluginBase):
 		self._menu_timer = None
 		self._monitor_list = []
 
+		# file information from remote locations is shared by all providers in tab
+		self._metadata_cache = None
+		if section.get('metadata_cache'):
+			self._metadata_cache = MetadataCache(section.get('metadata_cache_ttl'), section.get('metadata_cache_size'))
+
 		self.history = []
 		self.history_manager = HistoryManager(self, self.history)
 
@@ -1319,6 +1325,10 @@ class ItemList(PluginBase):
 			if Provider is not None:
 				result = Provider(self)
 
+				# avoid round trips for repeated requests on remote locations
+				if self._metadata_cache is not None and not result.is_local:
+					result = CachedProvider(result, self._metadata_cache)
+
 				# cache provider for later use
 				root_path = result.get_root_path(path)
 				self._providers[root_path] = result
@@ -0,0 +1,285 @@
+from __future__ import absolute_import
+
+import os
+import time
+
+from collections import OrderedDict
+from threading import Lock
+from sunflower.plugin_base.monitor import MonitorSignals
+from sunflower.plugin_base.provider import Mode
+
+
+MISSING = object()  # marks results which are not cached
+
+
+class MetadataCache:
+	"""Cache of file information shared by providers of single item list.
+
+	Results are kept for `ttl` seconds and number of cached results is limited
+	to `size`, least recently used ones are removed first. Counters of hits
+	and misses are kept for diagnostics.
+
+	"""
+
+	def __init__(self, ttl, size):
+		self._ttl = ttl
+		self._size = size
+		self._lock = Lock()
+
+		self._results = OrderedDict()  # key to (expiration time, value)
+		self._keys = {}  # path to set of keys
+
+		self.hits = 0
+		self.misses = 0
+
+	def _forget(self, key):
+		"""Remove cached result. Lock must be held by caller."""
+		self._results.pop(key, None)
+		path = key[1]
+		keys = self._keys.get(path)
+
+		if keys is not None:
+			keys.discard(key)
+			if not keys:
+				del self._keys[path]
+
+	def get(self, key, default=None):
+		"""Return cached result or default value if result is missing or expired."""
+		with self._lock:
+			item = self._results.get(key)
+
+			if item is None or item[0] < time.time():
+				if item is not None:
+					self._forget(key)
+
+				self.misses += 1
+				return default
+
+			self._results.move_to_end(key)
+			self.hits += 1
+
+			return item[1]
+
+	def set(self, key, value):
+		"""Store result. Second element of key is path result belongs to."""
+		with self._lock:
+			self._results[key] = (time.time() + self._ttl, value)
+			self._results.move_to_end(key)
+			self._keys.setdefault(key[1], set()).add(key)
+
+			while len(self._results) > self._size:
+				self._forget(next(iter(self._results)))
+
+	def invalidate(self, path, children=False):
+		"""Forget results for path and optionally for all paths it contains."""
+		with self._lock:
+			for key in list(self._keys.get(path, ())):
+				self._forget(key)
+
+			if children:
+				prefix = os.path.join(path, '')
+				for child_path in [child for child in self._keys if child.startswith(prefix)]:
+					for key in list(self._keys.get(child_path, ())):
+						self._forget(key)
+
+	def clear(self):
+		"""Forget all cached results."""
+		with self._lock:
+			self._results.clear()
+			self._keys.clear()
+
+
+class CachedProvider:
+	"""Provider wrapper serving repeated file information requests from cache.
+
+	Calls to `exists`, `is_file`, `is_dir`, `is_link` and `get_stat` are
+	cached, all other attributes are taken from wrapped provider. Cached
+	results are invalidated when items are modified through this provider and
+	on events from monitors it created.
+
+	"""
+
+	def __init__(self, provider, cache):
+		self._provider = provider
+		self._cache = cache
+
+	def __getattr__(self, name):
+		return getattr(self._provider, name)
+
+	def _get_cached(self, key, method, *args, **kwargs):
+		"""Return cached result or call method and store its result."""
+		result = self._cache.get(key, MISSING)
+
+		if result is MISSING:
+			result = method(*args, **kwargs)
+			self._cache.set(key, result)
+
+		return result
+
+	def _invalidate(self, path, relative_to=None, children=False):
+		"""Forget cached results for specified path."""
+		self._cache.invalidate(self._provider.real_path(path, relative_to), children)
+
+	def _handle_monitor_event(self, monitor, event, path, other_path, monitor_path):
+		"""Invalidate cached results for paths monitor reported."""
+		if event is MonitorSignals.DIRECTORY_CHANGED:
+			self._cache.invalidate(monitor_path, children=True)
+			return
+
+		# events can contain names relative to monitored path
+		for item in (path, other_path):
+			if item is None:
+				continue
+
+			if not item.startswith(monitor_path):
+				item = os.path.join(monitor_path, item)
+
+			self._cache.invalidate(item, children=event in (MonitorSignals.DELETED, MonitorSignals.MOVED))
+
+	def is_file(self, path, relative_to=None):
+		"""Test if given path is file"""
+		real_path = self._provider.real_path(path, relative_to)
+		return self._get_cached(('is_file', real_path), self._provider.is_file, real_path)
+
+	def is_dir(self, path, relative_to=None):
+		"""Test if given path is directory"""
+		real_path = self._provider.real_path(path, relative_to)
+		return self._get_cached(('is_dir', real_path), self._provider.is_dir, real_path)
+
+	def is_link(self, path, relative_to=None):
+		"""Test if given path is a link"""
+		real_path = self._provider.real_path(path, relative_to)
+		return self._get_cached(('is_link', real_path), self._provider.is_link, real_path)
+
+	def exists(self, path, relative_to=None):
+		"""Test if given path exists"""
+		real_path = self._provider.real_path(path, relative_to)
+		return self._get_cached(('exists', real_path), self._provider.exists, real_path)
+
+	def get_stat(self, path, relative_to=None, extended=False, follow=False):
+		"""Return file statistics."""
+		real_path = self._provider.real_path(path, relative_to)
+		return self._get_cached(
+					('get_stat', real_path, extended, follow),
+					self._provider.get_stat,
+					real_path,
+					extended=extended,
+					follow=follow
+				)
+
+	def list_dir_info(self, path, relative_to=None, extended=False):
+		"""Generate (name, file_info) pairs for each item in directory and cache them."""
+		real_path = self._provider.real_path(path, relative_to)
+
+		for name, file_info in self._provider.list_dir_info(real_path, extended=extended):
+			self._cache.set(('get_stat', os.path.join(real_path, name), extended, False), file_info)
+			yield name, file_info
+
+	def link(self, existing_path, destination_path, relative_to=None, symbolic=True):
+		"""Create hard or symbolic link from existing path"""
+		try:
+			return self._provider.link(existing_path, destination_path, relative_to, symbolic)
+		finally:
+			self._invalidate(destination_path, relative_to)
+
+	def unlink(self, path, relative_to=None):
+		"""Unlink given path"""
+		try:
+			return self._provider.unlink(path, relative_to)
+		finally:
+			self._invalidate(path, relative_to)
+
+	def remove_file(self, path, relative_to=None):
+		"""Remove file"""
+		try:
+			return self._provider.remove_file(path, relative_to)
+		finally:
+			self._invalidate(path, relative_to)
+
+	def remove_path(self, path, relative_to=None):
+		"""Remove path"""
+		try:
+			return self._provider.remove_path(path, relative_to)
+		finally:
+			self._invalidate(path, relative_to, children=True)
+
+	def trash_path(self, path, relative_to=None):
+		"""Move path to the trash"""
+		try:
+			return self._provider.trash_path(path, relative_to)
+		finally:
+			self._invalidate(path, relative_to, children=True)
+
+	def create_file(self, path, mode=None, relative_to=None):
+		"""Create empty file with specified mode set"""
+		try:
+			if mode is None:
+				return self._provider.create_file(path, relative_to=relative_to)
+
+			return self._provider.create_file(path, mode, relative_to)
+
+		finally:
+			self._invalidate(path, relative_to)
+
+	def create_directory(self, path, mode=None, relative_to=None):
+		"""Create directory with specified mode set"""
+		try:
+			if mode is None:
+				return self._provider.create_directory(path, relative_to=relative_to)
+
+			return self._provider.create_directory(path, mode, relative_to)
+
+		finally:
+			self._invalidate(path, relative_to)
+
+	def get_file_handle(self, path, mode, relative_to=None):
+		"""Open path in specified mode and return its handle"""
+		try:
+			return self._provider.get_file_handle(path, mode, relative_to)
+		finally:
+			if mode is not Mode.READ:
+				self._invalidate(path, relative_to)
+
+	def set_mode(self, path, mode, relative_to=None):
+		"""Set access mode to specified path"""
+		try:
+			return self._provider.set_mode(path, mode, relative_to)
+		finally:
+			self._invalidate(path, relative_to)
+
+	def set_owner(self, path, owner=-1, group=-1, relative_to=None):
+		"""Set owner and/or group for specified path"""
+		try:
+			return self._provider.set_owner(path, owner, group, relative_to)
+		finally:
+			self._invalidate(path, relative_to)
+
+	def set_timestamp(self, path, access=None, modify=None, change=None, relative_to=None):
+		"""Set timestamp for specified path"""
+		try:
+			return self._provider.set_timestamp(path, access, modify, change, relative_to)
+		finally:
+			self._invalidate(path, relative_to)
+
+	def move_path(self, source, destination, relative_to=None):
+		"""Move path on same file system to a different parent node"""
+		try:
+			return self._provider.move_path(source, destination, relative_to)
+		finally:
+			self._invalidate(source, relative_to, children=True)
+			self._invalidate(destination, relative_to, children=True)
+
+	def rename_path(self, source, destination, relative_to=None):
+		"""Rename file/directory within parents path"""
+		try:
+			return self._provider.rename_path(source, destination, relative_to)
+		finally:
+			self._invalidate(source, relative_to, children=True)
+			self._invalidate(destination, relative_to, children=True)
+
+	def get_monitor(self, path):
+		"""Return monitor for specified path, its events invalidate cached results"""
+		result = self._provider.get_monitor(path)
+		result.connect('changed', self._handle_monitor_event, path)
+
+		return result
@@ -20,6 +20,7 @@ class MonitorSignals:
 	EMBLEM_CHANGED = 8  # list of emblems has changed
 	DIRECTORY_SIZE_CHANGED = 9  # calculated directory size has changed
 	DIRECTORY_SIZE_STOPPED = 10  # directory size calculation has finished
+	DIRECTORY_CHANGED = 11  # too many changes at once, whole directory should be reloaded
 
 
 class Monitor(GObject.GObject):
@@ -33,6 +34,12 @@ class Monitor(GObject.GObject):
 	This monitor class also provides custom event queue which can be
 	used to manually emit signals.
 
+	Events are not emitted right away but collected for a short period of
+	time. Events which only update details of an item are merged with
+	previous ones for the same item and duplicates are removed. When number
+	of content changes in a single period goes over a threshold they are
+	replaced with single `DIRECTORY_CHANGED` event until the rate drops.
+
 	"""
 
 	__gtype_name__ = 'Sunflower_Monitor'
@@ -41,6 +48,26 @@ class Monitor(GObject.GObject):
 			}
 
 	TIMEOUT = 1000
+	COALESCE_TIMEOUT = 100  # period in which events are collected before emitting
+	RESCAN_TIMEOUT = 1000  # period used while directory is changing rapidly
+	RESCAN_THRESHOLD = 100  # number of content events in a period causing reload
+
+	# events which change directory content and can be replaced by reload
+	_content_events = (
+			MonitorSignals.CHANGED,
+			MonitorSignals.CHANGES_DONE,
+			MonitorSignals.DELETED,
+			MonitorSignals.CREATED,
+			MonitorSignals.ATTRIBUTE_CHANGED,
+			MonitorSignals.MOVED,
+		)
+
+	# events which only cause item details to be updated
+	_detail_events = (
+			MonitorSignals.CHANGED,
+			MonitorSignals.CHANGES_DONE,
+			MonitorSignals.ATTRIBUTE_CHANGED,
+		)
 
 	def __init__(self, provider, path):
 		GObject.GObject.__init__(self)
@@ -53,6 +80,15 @@ class Monitor(GObject.GObject):
 		# clear initial value
 		self._paused.clear()
 
+		# coalescing of events
+		self._pending = []
+		self._mergeable = {}  # path to index of pending event new details can be merged with
+		self._last_events = {}  # path to last pending event
+		self._content_count = 0
+		self._overloaded = False
+		self._flush_timeout = self.COALESCE_TIMEOUT
+		self._flush_scheduled = False
+
 		self._queue = Queue()
 		self._start_interval()
 
@@ -74,8 +110,8 @@ class Monitor(GObject.GObject):
 				# no more events in the queue
 				break
 
-		# emit events from a set
-		for event in set(events):
+		# pass events through coalescing
+		for event in events:
 			self._emit_signal(*event)
 
 		# if paused break inteval cycle
@@ -89,9 +125,80 @@ class Monitor(GObject.GObject):
 		path specified in constructor.
 
 		"""
-		if not self._paused.is_set():
+		if self._paused.is_set():
+			return
+
+		is_content = signal in self._content_events
+		event = (signal, path, other_path)
+
+		if is_content:
+			self._content_count += 1
+
+			# too many changes, replace them all with directory reload
+			if not self._overloaded and self._content_count > self.RESCAN_THRESHOLD:
+				self._overloaded = True
+				self._pending = [item for item in self._pending if item[0] not in self._content_events]
+				self._mergeable.clear()
+				self._last_events.clear()
+
+		if is_content and self._overloaded:
+			pass  # reload will be emitted instead
+
+		elif self._last_events.get(path) == event:
+			pass  # same as previous event for this path
+
+		elif signal in self._detail_events and path in self._mergeable:
+			# details are already going to be updated, upgrade to full update if needed
+			index = self._mergeable[path]
+			if signal is MonitorSignals.CHANGED and self._pending[index][0] is MonitorSignals.ATTRIBUTE_CHANGED:
+				self._pending[index] = event
+				self._last_events[path] = event
+
+		else:
+			# remember which events can absorb following detail changes
+			if signal in (MonitorSignals.CREATED, MonitorSignals.CHANGED, MonitorSignals.ATTRIBUTE_CHANGED):
+				self._mergeable[path] = len(self._pending)
+
+			else:
+				self._mergeable.pop(path, None)
+
+			if signal is MonitorSignals.MOVED:
+				self._mergeable.pop(other_path, None)
+				self._last_events.pop(other_path, None)
+
+			self._pending.append(event)
+			self._last_events[path] = event
+
+		# schedule emitting of collected events
+		if not self._flush_scheduled:
+			self._flush_scheduled = True
+			GObject.timeout_add(self._flush_timeout, self._flush_events)
+
+	def _flush_events(self):
+		"""Emit events collected during the last period."""
+		events = self._pending
+		overloaded = self._overloaded
+
+		# prepare for next period, keep longer period while directory is changing rapidly
+		self._pending = []
+		self._mergeable.clear()
+		self._last_events.clear()
+		self._content_count = 0
+		self._overloaded = False
+		self._flush_timeout = self.RESCAN_TIMEOUT if overloaded else self.COALESCE_TIMEOUT
+		self._flush_scheduled = False
+
+		if self._paused.is_set():
+			return False
+
+		for signal, path, other_path in events:
 			self.emit('changed', signal, path, other_path)
 
+		if overloaded:
+			self.emit('changed', MonitorSignals.DIRECTORY_CHANGED, None, None)
+
+		return False
+
 	def is_manual(self):
 		"""Check if monitor solely relies on queues"""
 		return True
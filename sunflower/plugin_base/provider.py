@@ -69,6 +69,8 @@ class Support:
 	SET_ACCESS = 6
 	SET_TIMESTAMP = 7
 	SYSTEM_SIZE = 8
+	BULK_READ = 9
+	RANDOM_ACCESS = 10
 
 
 class Mode:
@@ -165,6 +167,31 @@ class Provider:
 		"""Open path in specified mode and return its handle"""
 		pass
 
+	def copy_file_data(self, source_handle, destination_handle, chunk_size):
+		"""Copy data between two open file handles.
+
+		This is a generator which yields number of bytes copied after each
+		chunk so caller can report progress and pause or abort copying.
+
+		"""
+		while True:
+			data = source_handle.read(chunk_size)
+
+			if not data:
+				break
+
+			destination_handle.write(data)
+			yield len(data)
+
+	def get_storage_key(self, path, relative_to=None):
+		"""Return key used to order reading of multiple files.
+
+		Providers supporting `BULK_READ` return location of file content in
+		underlying storage so files can be read in the order they are stored.
+
+		"""
+		return 0
+
 	def get_stat(self, path, relative_to=None, extended=False, follow=False):
 		"""Return file statistics.
 
@@ -242,6 +269,37 @@ class Provider:
 		"""Get directory list"""
 		pass
 
+	def list_dir_info(self, path, relative_to=None, extended=False):
+		"""Generate (name, file_info) pairs for each item in directory.
+
+		Returned file information is the same as from `get_stat` without following
+		symbolic links. Providers capable of retrieving statistics along with the listing
+		should override this method in order to avoid separate call for each item.
+
+		"""
+		real_path = self.real_path(path, relative_to)
+
+		for name in self.list_dir(real_path):
+			yield name, self.get_stat(name, relative_to=real_path, extended=extended)
+
+	def commit_changes(self):
+		"""Write changes which were staged by provider.
+
+		Providers which can't modify items in place, like archives, collect
+		changes and write them all at once. This method is called at the end of
+		each operation.
+
+		"""
+		pass
+
+	def cancel_listings(self, thread=None):
+		"""Cancel directory listings running in thread with specified identifier
+		or all listings if thread is not specified. Listings which were cancelled
+		raise `OSError`.
+
+		"""
+		pass
+
 	def get_parent(self):
 		"""Return parent list"""
 		return self._parent
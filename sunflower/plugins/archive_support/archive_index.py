@@ -0,0 +1,138 @@
+from __future__ import absolute_import
+
+import os
+
+from sunflower.plugin_base.provider import FileType
+
+
+class ArchiveEntry:
+	"""Information about single archive member.
+
+	Besides file information each entry holds provider specific `data` used
+	to locate member content in the archive. Entries for directories which
+	are implied by member paths but not stored in archive have `data` set to
+	None.
+
+	"""
+	__slots__ = ('size', 'mode', 'time_modify', 'type', 'data')
+
+	def __init__(self, size, mode, time_modify, type, data=None):
+		self.size = size
+		self.mode = mode
+		self.time_modify = time_modify
+		self.type = type
+		self.data = data
+
+
+class ArchiveIndex:
+	"""Index of archive members keyed by full path and parent directory.
+
+	Paths are relative to archive root without leading or trailing separator,
+	root directory itself is stored as an empty string. Parent directories
+	which are missing in archive are created when their children are added.
+	Names of children are kept as keys of dictionary, preserving order in
+	which they were added while allowing fast removal.
+
+	"""
+	directory_mode = 0o755
+
+	def __init__(self):
+		self._entries = {'': ArchiveEntry(0, self.directory_mode, 0, FileType.DIRECTORY)}
+		self._children = {'': {}}
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, path):
+		return path in self._entries
+
+	def _add_directory(self, path):
+		"""Make sure directory with specified path exists in the index."""
+		if path in self._entries:
+			return
+
+		self._entries[path] = ArchiveEntry(0, self.directory_mode, 0, FileType.DIRECTORY)
+		self._children[path] = {}
+
+		parent, name = os.path.split(path)
+		self._add_directory(parent)
+		self._children[parent][name] = None
+
+	def add(self, path, entry):
+		"""Add archive member to the index."""
+		path = path.strip(os.path.sep)
+
+		if path == '':
+			return
+
+		# member stored explicitly replaces implied or duplicate entry
+		if path in self._entries:
+			existing = self._entries[path]
+			self._entries[path] = entry
+
+			if entry.type is FileType.DIRECTORY:
+				self._children.setdefault(path, {})
+
+			elif existing.type is FileType.DIRECTORY:
+				self._children.pop(path, None)
+
+			return
+
+		self._entries[path] = entry
+
+		if entry.type is FileType.DIRECTORY:
+			self._children[path] = {}
+
+		parent, name = os.path.split(path)
+		self._add_directory(parent)
+		self._children[parent][name] = None
+
+	def remove(self, path):
+		"""Remove member and all of its children from the index. Returns list of
+		removed entries.
+
+		"""
+		path = path.strip(os.path.sep)
+		result = []
+
+		if path == '' or path not in self._entries:
+			return result
+
+		# remove children first
+		for name in self._children.pop(path, ()):
+			child_path = os.path.join(path, name)
+			result.extend(self.remove(child_path))
+
+		result.append((path, self._entries.pop(path)))
+
+		parent, name = os.path.split(path)
+		if parent in self._children:
+			self._children[parent].pop(name, None)
+
+		return result
+
+	def get(self, path):
+		"""Return entry for specified path or None."""
+		return self._entries.get(path.strip(os.path.sep))
+
+	def get_children(self, path):
+		"""Return names in specified directory or None."""
+		return self._children.get(path.strip(os.path.sep))
+
+	def is_dir(self, path):
+		"""Check if path is a directory."""
+		return path.strip(os.path.sep) in self._children
+
+	def walk(self, path=''):
+		"""Generate (path, entry) pairs for specified path and all of its children."""
+		path = path.strip(os.path.sep)
+		entry = self._entries.get(path)
+
+		if entry is None:
+			return
+
+		yield path, entry
+
+		for name in self._children.get(path, ()):
+			for item in self.walk(os.path.join(path, name) if path else name):
+				yield item
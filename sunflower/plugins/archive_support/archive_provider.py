@@ -0,0 +1,191 @@
+from __future__ import absolute_import
+
+import os
+
+from threading import RLock
+from sunflower.plugin_base.provider import Provider, SystemSize
+from sunflower.plugin_base.provider import FileInfo, FileInfoExtended, FileType
+
+
+class ArchiveProvider(Provider):
+	"""Base class for archive providers serving file information from index.
+
+	Derived classes need to implement `_create_index` which returns
+	`ArchiveIndex` with all archive members and methods for accessing member
+	content.
+
+	"""
+
+	is_local = False
+	protocol = None
+
+	def __init__(self, parent, path, selection=None):
+		Provider.__init__(self, parent, path, selection)
+
+		self._index = None  # created on first use
+		self._index_lock = RLock()
+
+		# get icon name
+		icon_manager = self._parent._parent.icon_manager
+		self._protocol_icon = icon_manager.get_icon_for_file(path)
+
+	def real_path(self, path, relative_to=None):
+		"""Commonly used function to get real path"""
+		result = path if relative_to is None else os.path.join(relative_to, path)
+
+		if result.startswith(self._path):
+			result = result[len(self._path) + 1:]
+
+		return result
+
+	def _create_index(self):
+		"""Create index of archive members."""
+		pass
+
+	def _get_index(self):
+		"""Return index of archive members, creating it on first use.
+
+		Index is created only once even when requested from multiple threads
+		and derived classes can hold the lock while modifying archive.
+
+		"""
+		with self._index_lock:
+			if self._index is None:
+				self._index = self._create_index()
+
+			return self._index
+
+	def _get_file_info(self, entry, extended=False):
+		"""Convert archive entry to FileInfo or FileInfoExtended object."""
+		if entry is None:
+			# handle invalid files/links
+			if not extended:
+				result = FileInfo(
+							size = 0,
+							mode = 0,
+							user_id = 0,
+							group_id = 0,
+							time_modify = 0,
+							type = FileType.INVALID,
+						)
+
+			else:
+				result = FileInfoExtended(
+							size = 0,
+							mode = 0,
+							i_mode = 0,
+							user_id = 0,
+							group_id = 0,
+							time_access = 0,
+							time_modify = 0,
+							time_change = 0,
+							time_access_ns = 0,
+							time_modify_ns = 0,
+							time_change_ns = 0,
+							type = FileType.INVALID,
+							device = 0,
+							inode = 0
+						)
+
+		elif not extended:
+			result = FileInfo(
+						size = entry.size,
+						mode = entry.mode,
+						user_id = 0,
+						group_id = 0,
+						time_modify = entry.time_modify,
+						type = entry.type
+					)
+
+		else:
+			result = FileInfoExtended(
+						size = entry.size,
+						mode = entry.mode,
+						i_mode = 0,
+						user_id = 0,
+						group_id = 0,
+						time_access = 0,
+						time_modify = entry.time_modify,
+						time_change = 0,
+						time_access_ns = 0,
+						time_modify_ns = int(entry.time_modify * 10**9),
+						time_change_ns = 0,
+						type = entry.type,
+						device = 0,
+						inode = 0
+					)
+
+		return result
+
+	def is_file(self, path, relative_to=None):
+		"""Test if given path is file"""
+		entry = self._get_index().get(self.real_path(path, relative_to))
+		return entry is not None and entry.type is FileType.REGULAR
+
+	def is_dir(self, path, relative_to=None):
+		"""Test if given path is directory"""
+		return self._get_index().is_dir(self.real_path(path, relative_to))
+
+	def is_link(self, path, relative_to=None):
+		"""Test if given path is a link"""
+		entry = self._get_index().get(self.real_path(path, relative_to))
+		return entry is not None and entry.type is FileType.LINK
+
+	def exists(self, path, relative_to=None):
+		"""Test if given path exists"""
+		return self.real_path(path, relative_to) in self._get_index()
+
+	def get_stat(self, path, relative_to=None, extended=False, follow=False):
+		"""Return file statistics.
+
+		This method returns FileInfo or FileInfoExtended objects for specified
+		path. Unless otherwise specified by `follow` parameter this method is not
+		suppose to follow symlinks.
+
+		"""
+		entry = self._get_index().get(self.real_path(path, relative_to))
+		return self._get_file_info(entry, extended)
+
+	def get_directory_size(self, path, relative_to=None):
+		"""Return directory size"""
+		pass
+
+	def list_dir(self, path, relative_to=None):
+		"""Get directory list."""
+		children = self._get_index().get_children(self.real_path(path, relative_to))
+		return list(children) if children is not None else []
+
+	def list_dir_info(self, path, relative_to=None, extended=False):
+		"""Generate (name, file_info) pairs for each item in directory."""
+		index = self._get_index()
+		real_path = self.real_path(path, relative_to)
+
+		for name in list(index.get_children(real_path) or ()):
+			entry = index.get(os.path.join(real_path, name))
+			yield name, self._get_file_info(entry, extended)
+
+	def get_parent(self):
+		"""Return parent list"""
+		return self._parent
+
+	def get_root_path(self, path):
+		"""Get root for specified path"""
+		return 'file:///' if path.startswith('file://') else os.path.sep
+
+	def get_parent_path(self, path):
+		"""Get parent path for specified"""
+		pass
+
+	def get_system_size(self, path):
+		"""Return system size information."""
+		return SystemSize(
+				block_size = 0,
+				block_total = 0,
+				block_available = 0,
+				size_total = 0,
+				size_available = 0
+			)
+
+	def get_protocol_icon(self):
+		"""Returns protocol icon name used in tab title bar"""
+		return self._protocol_icon
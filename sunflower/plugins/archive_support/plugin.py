@@ -1,8 +1,10 @@
 from __future__ import absolute_import
 
 from .zip_provider import ZipProvider
+from .tar_provider import TarProvider
 
 
 def register_plugin(application):
 	"""Register plugin classes with application"""
 	application.register_provider(ZipProvider)
+	application.register_provider(TarProvider)
@@ -0,0 +1,494 @@
+from __future__ import absolute_import
+
+import io
+import os
+import bz2
+import zlib
+import lzma
+import json
+import bisect
+import hashlib
+import tarfile
+
+from collections import namedtuple
+from threading import Lock
+from sunflower.common import get_cache_directory
+from sunflower.plugin_base.provider import Support, Mode, FileType
+from .archive_index import ArchiveIndex, ArchiveEntry
+from .archive_provider import ArchiveProvider
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+
+class Compression:
+	NONE = 0
+	GZIP = 1
+	BZIP2 = 2
+	XZ = 3
+	ZSTD = 4
+
+
+# magic numbers at the start of each compressed frame
+SIGNATURES = {
+		Compression.GZIP: b'\x1f\x8b',
+		Compression.BZIP2: b'BZh',
+		Compression.XZ: b'\xfd7zXZ\x00',
+		Compression.ZSTD: b'\x28\xb5\x2f\xfd',
+	}
+
+
+# errors raised by decompressors on corrupted data
+DECOMPRESSION_ERRORS = (zlib.error, lzma.LZMAError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+# position in archive from which decompression can start, `state` is
+# decompressor which already consumed data before `compressed` offset or
+# None if new compressed frame starts at that offset
+SeekPoint = namedtuple('SeekPoint', ['compressed', 'uncompressed', 'state'])
+
+
+def create_decompressor(compression):
+	"""Create decompressor object for single compressed frame."""
+	result = None
+
+	if compression is Compression.GZIP:
+		result = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+	elif compression is Compression.BZIP2:
+		result = bz2.BZ2Decompressor()
+
+	elif compression is Compression.XZ:
+		result = lzma.LZMADecompressor()
+
+	elif compression is Compression.ZSTD:
+		result = zstandard.ZstdDecompressor().decompressobj()
+
+	return result
+
+
+class StreamReader:
+	"""Sequential reader of uncompressed archive content starting at seek point.
+
+	While reading, starts of compressed frames and, for streams which allow
+	copying decompressor state, periodic snapshots are reported back to the
+	provider so later reads can start closer to requested data.
+
+	"""
+	chunk_size = 64 * 1024
+
+	def __init__(self, provider, compression, point):
+		self._provider = provider
+		self._compression = compression
+
+		self._compressed = point.compressed  # offset of next compressed read
+		self._position = point.uncompressed  # offset of next uncompressed byte
+		self._checkpoint = point.uncompressed
+		self._decompressor = point.state.copy() if point.state is not None else None
+
+		self._input = b''
+		self._output = bytearray()
+		self._finished = False
+
+	def _read_compressed(self):
+		"""Read next chunk of raw data from archive."""
+		data = self._provider._read_archive(self._compressed, self.chunk_size)
+		self._compressed += len(data)
+
+		return data
+
+	def _decompress_chunk(self):
+		"""Return next chunk of uncompressed data or None at the end of stream."""
+		if self._compression is Compression.NONE:
+			return self._read_compressed() or None
+
+		# start of new frame, make sure it's not padding at the end of file
+		if self._decompressor is None:
+			signature = SIGNATURES[self._compression]
+
+			if len(self._input) < len(signature):
+				self._input += self._read_compressed()
+
+			if not self._input.startswith(signature):
+				return None
+
+			point = SeekPoint(self._compressed - len(self._input), self._position, None)
+			self._provider._add_seek_point(point)
+
+			self._decompressor = create_decompressor(self._compression)
+			self._checkpoint = self._position
+
+		if not self._input:
+			self._input = self._read_compressed()
+
+			# archive is truncated
+			if not self._input:
+				return None
+
+		data = self._decompressor.decompress(self._input)
+		self._input = b''
+		self._position += len(data)
+
+		if self._decompressor.eof:
+			self._input = self._decompressor.unused_data
+			self._decompressor = None
+
+		elif self._compression is Compression.GZIP \
+		and self._position - self._checkpoint >= self._provider.checkpoint_interval:
+			point = SeekPoint(self._compressed, self._position, self._decompressor.copy())
+			self._provider._add_seek_point(point)
+			self._checkpoint = self._position
+
+		return data
+
+	def read(self, size=-1):
+		"""Read up to specified number of uncompressed bytes."""
+		while not self._finished and (size < 0 or len(self._output) < size):
+			data = self._decompress_chunk()
+
+			if data is None:
+				self._finished = True
+			else:
+				self._output.extend(data)
+
+		if size < 0:
+			size = len(self._output)
+
+		result = bytes(self._output[:size])
+		del self._output[:size]
+
+		return result
+
+	def get_position(self):
+		"""Return offset of next byte returned by `read` in uncompressed stream."""
+		return self._position - len(self._output)
+
+	def is_finished(self):
+		"""Check if there is no more data to read."""
+		return self._finished and not self._output
+
+	def skip(self, size):
+		"""Skip specified number of uncompressed bytes."""
+		while size > 0:
+			data = self.read(min(size, 1024 * 1024))
+
+			if not data:
+				break
+
+			size -= len(data)
+
+
+class MemberFile:
+	"""Read-only handle for content of single archive member. Stream reader
+	is handed back to provider on close so following members can be read
+	without decompressing archive from the start again.
+
+	"""
+
+	def __init__(self, provider, reader, size):
+		self._provider = provider
+		self._reader = reader
+		self._remaining = size
+
+	def read(self, size=-1):
+		"""Read data from member."""
+		if self._reader is None:
+			raise ValueError('I/O operation on closed file.')
+
+		if size < 0 or size > self._remaining:
+			size = self._remaining
+
+		result = self._reader.read(size)
+		self._remaining -= len(result)
+
+		return result
+
+	def close(self):
+		"""Release stream reader."""
+		if self._reader is not None:
+			self._provider._release_stream(self._reader)
+
+		self._reader = None
+
+
+class TarProvider(ArchiveProvider):
+	"""Provider for handling of tar archives.
+
+	Archive is decompressed once to create index of members along with offsets
+	of their content in uncompressed stream. Index and offsets of compressed
+	frames are stored in cache directory so archive doesn't need to be
+	decompressed again until it changes. Member content is read by
+	decompressing from the closest known seek point or by continuing with
+	reader left by previously read member, so members read in storage order
+	are decompressed in a single pass.
+
+	Only starts of compressed frames are stored in cache. Decompressor
+	snapshots made for single frame gzip streams exist only in memory, so
+	after restart such archives are decompressed from the beginning until
+	snapshots are made again. Single frame xz, bzip2 and zstd streams have
+	no snapshots at all, so reading members out of order from them starts
+	decompression at the beginning of the archive.
+
+	"""
+
+	archives = (
+			'application/x-tar',
+			'application/x-compressed-tar',
+			'application/x-bzip-compressed-tar',
+			'application/x-bzip2-compressed-tar',
+			'application/x-xz-compressed-tar',
+		) + (('application/x-zstd-compressed-tar',) if zstandard is not None else ())
+
+	cache_version = 1
+	checkpoint_interval = 4 * 1024 * 1024  # uncompressed bytes between decompressor snapshots
+	idle_readers = 4  # number of stream readers kept for reading following members
+
+	def __init__(self, parent, path, selection=None):
+		ArchiveProvider.__init__(self, parent, path, selection)
+
+		self._compression = None
+		self._seek_points = [SeekPoint(0, 0, None)]
+		self._seek_offsets = [0]
+		self._readers = []  # idle stream readers
+		self._lock = Lock()
+
+	def _read_archive(self, offset, size):
+		"""Read raw data from archive. Handle is shared by all readers."""
+		with self._lock:
+			self._handle.seek(offset)
+			return self._handle.read(size)
+
+	def _add_seek_point(self, point):
+		"""Remember new position from which decompression can start."""
+		with self._lock:
+			position = bisect.bisect_left(self._seek_offsets, point.uncompressed)
+
+			if position < len(self._seek_offsets) and self._seek_offsets[position] == point.uncompressed:
+				# starting new frame is cheaper than copying decompressor
+				if point.state is None:
+					self._seek_points[position] = point
+
+				return
+
+			self._seek_offsets.insert(position, point.uncompressed)
+			self._seek_points.insert(position, point)
+
+	def _get_compression(self):
+		"""Detect compression used for archive."""
+		header = self._read_archive(0, 8)
+
+		for compression, signature in SIGNATURES.items():
+			if header.startswith(signature):
+				return compression
+
+		return Compression.NONE
+
+	def _open_stream(self, offset):
+		"""Create reader positioned at specified offset in uncompressed stream."""
+		if self._compression is Compression.NONE:
+			return StreamReader(self, self._compression, SeekPoint(offset, offset, None))
+
+		with self._lock:
+			position = bisect.bisect_right(self._seek_offsets, offset) - 1
+			point = self._seek_points[position]
+
+			# continue with idle reader if it's closer than seek point
+			result = None
+			for reader in self._readers:
+				if point.uncompressed <= reader.get_position() <= offset \
+				and (result is None or reader.get_position() > result.get_position()):
+					result = reader
+
+			if result is not None:
+				self._readers.remove(result)
+			else:
+				result = StreamReader(self, self._compression, point)
+
+		result.skip(offset - result.get_position())
+
+		return result
+
+	def _release_stream(self, reader):
+		"""Keep stream reader for reading following members."""
+		if self._compression is Compression.NONE or reader.is_finished():
+			return
+
+		with self._lock:
+			self._readers.append(reader)
+
+			# forget reader furthest behind as it's least likely to be used
+			if len(self._readers) > self.idle_readers:
+				self._readers.sort(key=StreamReader.get_position)
+				del self._readers[0]
+
+	def _get_archive_signature(self):
+		"""Return values identifying current version of archive or None."""
+		try:
+			file_stat = os.fstat(self._handle.fileno())
+
+		except (AttributeError, OSError, io.UnsupportedOperation):
+			return None
+
+		return [file_stat.st_size, file_stat.st_mtime_ns]
+
+	def _get_cache_file(self):
+		"""Return path to file storing archive index."""
+		key = hashlib.sha1(self._path.encode('utf-8', 'surrogateescape')).hexdigest()
+		return os.path.join(get_cache_directory(), 'sunflower_archives', '{0}.json'.format(key))
+
+	def _load_index(self, signature):
+		"""Load archive index from cache. Returns None if cache is missing or stale."""
+		try:
+			with open(self._get_cache_file(), 'r') as raw_file:
+				data = json.load(raw_file)
+
+		except (OSError, ValueError):
+			return None
+
+		if data.get('version') != self.cache_version or data.get('signature') != signature:
+			return None
+
+		result = ArchiveIndex()
+		for path, file_type, size, mode, time_modify, content in data['members']:
+			result.add(path, ArchiveEntry(size, mode, time_modify, file_type, content))
+
+		for compressed, uncompressed in data['seek_points']:
+			self._add_seek_point(SeekPoint(compressed, uncompressed, None))
+
+		return result
+
+	def _save_index(self, signature, index):
+		"""Store archive index and starts of compressed frames in cache."""
+		with self._lock:
+			seek_points = [(point.compressed, point.uncompressed) for point in self._seek_points if point.state is None]
+
+		data = {
+				'version': self.cache_version,
+				'signature': signature,
+				'seek_points': seek_points,
+				'members': [
+					(path, entry.type, entry.size, entry.mode, entry.time_modify, entry.data)
+					for path, entry in index.walk() if path != ''
+				]
+			}
+
+		cache_file = self._get_cache_file()
+		temporary_file = '{0}.tmp'.format(cache_file)
+
+		try:
+			if not os.path.isdir(os.path.dirname(cache_file)):
+				os.makedirs(os.path.dirname(cache_file))
+
+			with open(temporary_file, 'w') as raw_file:
+				json.dump(data, raw_file)
+
+			os.rename(temporary_file, cache_file)
+
+		except OSError:
+			pass  # index will be created again next time
+
+	def _scan_archive(self):
+		"""Decompress archive once and create index of its members."""
+		result = ArchiveIndex()
+		reader = StreamReader(self, self._compression, self._seek_points[0])
+
+		try:
+			with tarfile.open(fileobj=reader, mode='r|') as archive:
+				for info in archive:
+					path = os.path.normpath(info.name).strip(os.path.sep)
+
+					if path in ('', os.path.curdir):
+						continue
+
+					if info.isdir():
+						entry = ArchiveEntry(0, info.mode, info.mtime, FileType.DIRECTORY)
+
+					elif info.issym():
+						entry = ArchiveEntry(0, info.mode, info.mtime, FileType.LINK, info.linkname)
+
+					elif info.islnk():
+						# hard links share content with previously stored member
+						target = result.get(os.path.normpath(info.linkname))
+
+						if target is None or target.type is not FileType.REGULAR:
+							continue
+
+						entry = ArchiveEntry(target.size, info.mode, info.mtime, FileType.REGULAR, target.data)
+
+					elif info.isreg():
+						# content of sparse files can't be read directly
+						offset = info.offset_data if info.sparse is None else None
+						entry = ArchiveEntry(info.size, info.mode, info.mtime, FileType.REGULAR, offset)
+
+					else:
+						continue
+
+					result.add(path, entry)
+
+		except (tarfile.TarError, EOFError, OSError) + DECOMPRESSION_ERRORS:
+			pass  # show members read until error
+
+		return result
+
+	def _create_index(self):
+		"""Create index of archive members."""
+		self._compression = self._get_compression()
+
+		if self._compression is Compression.ZSTD and zstandard is None:
+			return ArchiveIndex()
+
+		signature = self._get_archive_signature()
+		result = self._load_index(signature) if signature is not None else None
+
+		if result is None:
+			result = self._scan_archive()
+
+			if signature is not None:
+				self._save_index(signature, result)
+
+		return result
+
+	def readlink(self, path, relative_to=None):
+		"""Return target of symbolic link"""
+		entry = self._get_index().get(self.real_path(path, relative_to))
+
+		if entry is None or entry.type is not FileType.LINK:
+			return None
+
+		return entry.data
+
+	def get_file_handle(self, path, mode, relative_to=None):
+		"""Open path in specified mode and return its handle"""
+		result = None
+
+		if mode is Mode.READ:
+			entry = self._get_index().get(self.real_path(path, relative_to))
+
+			if entry is not None and entry.type is FileType.REGULAR and entry.data is not None:
+				result = MemberFile(self, self._open_stream(entry.data), entry.size)
+
+		return result
+
+	def get_storage_key(self, path, relative_to=None):
+		"""Return offset of member content in uncompressed stream."""
+		entry = self._get_index().get(self.real_path(path, relative_to))
+
+		if entry is None or entry.type is not FileType.REGULAR or entry.data is None:
+			return 0
+
+		return entry.data
+
+	def get_support(self):
+		"""Return supported options by provider"""
+		result = [Support.BULK_READ]
+
+		if self._compression is None:
+			self._compression = self._get_compression()
+
+		# members of compressed archive are best read one after another
+		if self._compression is Compression.NONE:
+			result.append(Support.RANDOM_ACCESS)
+
+		return tuple(result)
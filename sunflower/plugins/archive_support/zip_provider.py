@@ -2,62 +2,104 @@ from __future__ import absolute_import
 
 import os
 import io
+import stat
 import time
+import errno
+import shutil
 import zipfile
 import datetime
+import tempfile
 
-from sunflower.plugin_base.provider import Provider, Support, SystemSize, Mode
-from sunflower.plugin_base.provider import FileInfo, FileInfoExtended, FileType
+from sunflower.plugin_base.provider import Provider, Support, Mode, FileType
+from .archive_index import ArchiveIndex, ArchiveEntry
+from .archive_provider import ArchiveProvider
 
 
-class ZipProvider(Provider):
-	"""Provider for handling of ZIP archives."""
+class StagedFile(io.FileIO):
+	"""Handle for writing member content to temporary file. Member size is
+	updated once handle is closed.
+
+	"""
+
+	def __init__(self, path, entry):
+		io.FileIO.__init__(self, path, 'w+')
+		self._entry = entry
+
+	def close(self):
+		"""Update member information and close the file."""
+		if not self.closed:
+			self._entry.size = os.fstat(self.fileno()).st_size
+			self._entry.time_modify = time.time()
+
+		io.FileIO.close(self)
+
+
+class AppendWriter:
+	"""Stream adding data to the end of archive handle.
+
+	Position is reported but seeking is not supported, so `zipfile` stores
+	sizes after member data instead of updating local headers. This allows
+	using handles opened in append mode.
+
+	"""
+
+	def __init__(self, handle, position):
+		self._handle = handle
+		self._position = position
+
+	def write(self, data):
+		self._handle.write(data)
+		self._position += len(data)
+
+		return len(data)
+
+	def tell(self):
+		return self._position
+
+	def seek(self, offset, whence=os.SEEK_SET):
+		raise io.UnsupportedOperation('seek')
+
+	def flush(self):
+		self._handle.flush()
+
+
+class ZipProvider(ArchiveProvider):
+	"""Provider for handling of ZIP archives.
+
+	Changes are staged in the index until `commit_changes` is called. Content
+	of new members is kept in temporary files and entries of existing members
+	keep their `ZipInfo`. When members are only added, they are written in
+	place of central directory, otherwise whole archive is rewritten once
+	leaving out removed members.
+
+	"""
 
-	is_local = False
-	protocol = None
 	archives = (
 			'application/zip',
 			'application/jar',
 			'application/war'
 		)
 
+	buffer_size = 1024 * 1024
+
 	def __init__(self, parent, path, selection=None):
-		Provider.__init__(self, parent, path, selection)
+		ArchiveProvider.__init__(self, parent, path, selection)
 
-		self._cache = {}
-		self._file_list = []
 		self._zip_file = None
 
-		# get icon name
-		icon_manager = self._parent._parent.icon_manager
-		self._protocol_icon = icon_manager.get_icon_for_file(path)
-
-	def real_path(self, path, relative_to=None):
-		"""Commonly used function to get real path"""
-		result = path if relative_to is None else os.path.join(relative_to, path)
-
-		if result.startswith(self._path):
-			result = result[len(self._path) + 1:]
-
-		return result
+		self._staging_directory = None
+		self._modified = False  # there are staged changes
+		self._rewrite = False  # existing members were changed, removed or renamed
 
-	def _update_cache(self):
-		"""Update archive cache."""
-		self._cache[''] = []  # root directory
+	def _create_index(self):
+		"""Create index of archive members."""
+		result = ArchiveIndex()
 
 		for info in self._zip_file.infolist():
 			# detect file type
 			if info.filename[-1] == os.path.sep:
-				raw_name = info.filename[:-1]
-				key_name, file_name = os.path.split(raw_name)
 				file_type = FileType.DIRECTORY
-
-				# create storage list for directory
-				if raw_name not in self._cache:
-					self._cache[raw_name] = []
-
 			else:
-				key_name, file_name = os.path.split(info.filename)
 				file_type = FileType.REGULAR
 
 			# prepare file timestamp
@@ -73,21 +115,9 @@ class ZipProvider(Provider):
 			if mode == 0:
 				mode = 0o644 if file_type == FileType.REGULAR else 0o775
 
-			# prepare file info
-			file_info = FileInfo(
-					size = info.file_size,
-					mode = mode,
-					user_id = 0,
-					group_id = 0,
-					time_modify = file_timestamp,
-					type = file_type
-				)
+			result.add(info.filename, ArchiveEntry(info.file_size, mode, file_timestamp, file_type, info))
 
-			if key_name not in self._cache:
-				self._cache[key_name] = []
-
-			self._cache[key_name].append((file_name, file_info))
-			self._file_list.append(info.filename)
+		return result
 
 	def set_archive_handle(self, handle):
 		"""Set archive file handle."""
@@ -96,43 +126,289 @@ class ZipProvider(Provider):
 
 	def release_archive_handle(self):
 		"""Release archive handle when it's no longer needed."""
+		try:
+			self.commit_changes()
+
+		finally:
+			self._zip_file.close()
+			self._remove_staging_directory()
+			Provider.release_archive_handle(self)
+
+	def _get_staging_directory(self):
+		"""Return directory for temporary files, creating it if needed."""
+		if self._staging_directory is None:
+			# keep temporary files on the same file system as archive when possible
+			parent = os.path.dirname(self._path)
+			if not os.path.isdir(parent) or not os.access(parent, os.W_OK):
+				parent = None
+
+			self._staging_directory = tempfile.mkdtemp(prefix='.sunflower-', dir=parent)
+
+		return self._staging_directory
+
+	def _stage_file(self, real_path, mode=None):
+		"""Create empty member which content is kept in temporary file."""
+		index = self._get_index()
+		existing = index.get(real_path)
+
+		if existing is not None and existing.type is FileType.DIRECTORY:
+			raise OSError(errno.EISDIR, os.strerror(errno.EISDIR), real_path)
+
+		# reuse temporary file of staged member
+		if existing is not None and not isinstance(existing.data, zipfile.ZipInfo):
+			open(existing.data, 'wb').close()
+			existing.size = 0
+
+			if mode is not None:
+				existing.mode = mode
+
+			return existing
+
+		if mode is None:
+			mode = existing.mode if existing is not None else 0o644
+
+		handle, staged_path = tempfile.mkstemp(dir=self._get_staging_directory())
+		os.close(handle)
+
+		result = ArchiveEntry(0, mode, time.time(), FileType.REGULAR, staged_path)
+		index.add(real_path, result)
+
+		self._modified = True
+		self._rewrite = self._rewrite or existing is not None
+
+		return result
+
+	def _remove_member(self, real_path):
+		"""Remove member and its children from the index."""
+		removed = self._get_index().remove(real_path)
+
+		if not removed:
+			raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), real_path)
+
+		for path, entry in removed:
+			if isinstance(entry.data, zipfile.ZipInfo):
+				self._rewrite = True
+
+			elif entry.type is FileType.REGULAR:
+				os.remove(entry.data)
+
+		self._modified = True
+
+	def _change_member(self, real_path):
+		"""Return entry for member which attributes are about to change."""
+		entry = self._get_index().get(real_path)
+
+		if entry is None:
+			raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), real_path)
+
+		self._modified = True
+		self._rewrite = self._rewrite or isinstance(entry.data, zipfile.ZipInfo)
+
+		return entry
+
+	def _get_members(self, new_only=False):
+		"""Generate (path, entry) pairs for members to be written to archive."""
+		index = self._get_index()
+
+		for path, entry in index.walk():
+			if path == '':
+				continue
+
+			stored = isinstance(entry.data, zipfile.ZipInfo)
+
+			if new_only and stored:
+				continue
+
+			# directories implied by member paths are not stored
+			if entry.type is FileType.DIRECTORY and not stored and index.get_children(path):
+				continue
+
+			yield path, entry
+
+	def _write_member(self, archive, path, entry):
+		"""Write member to specified archive."""
+		# zip archives can't store dates before 1980
+		date_time = time.localtime(max(entry.time_modify, 315532800))[:6]
+
+		if entry.type is FileType.DIRECTORY:
+			info = zipfile.ZipInfo(path + '/', date_time)
+			info.external_attr = (stat.S_IFDIR | stat.S_IMODE(entry.mode)) << 16 | 0x10
+			archive.writestr(info, b'')
+			return
+
+		info = zipfile.ZipInfo(path, date_time)
+		info.external_attr = (stat.S_IFREG | stat.S_IMODE(entry.mode)) << 16
+		info.file_size = entry.size  # needed to decide if zip64 extensions are used
+
+		if isinstance(entry.data, zipfile.ZipInfo):
+			info.compress_type = entry.data.compress_type
+			source = self._zip_file.open(entry.data, 'r')
+
+		else:
+			info.compress_type = zipfile.ZIP_DEFLATED
+			source = open(entry.data, 'rb')
+
+		with source, archive.open(info, 'w') as destination:
+			shutil.copyfileobj(source, destination, self.buffer_size)
+
+	def _append_members(self):
+		"""Write new members in place of central directory."""
+		start = self._zip_file.start_dir
+		members = self._zip_file.infolist()
+		comment = self._zip_file.comment
 		self._zip_file.close()
-		Provider.release_archive_handle(self)
 
-	def is_file(self, path, relative_to=None):
-		"""Test if given path is file"""
-		real_path = self.real_path(path, relative_to)
-		return real_path in self._file_list and real_path not in self._cache
+		self._handle.truncate(start)
+		self._handle.seek(start)
 
-	def is_dir(self, path, relative_to=None):
-		"""Test if given path is directory"""
-		real_path = self.real_path(path, relative_to)
-		return real_path in self._cache
+		try:
+			with zipfile.ZipFile(AppendWriter(self._handle, start), 'w') as archive:
+				# existing members are listed in new central directory as well
+				archive.filelist.extend(members)
+				archive.comment = comment
 
-	def is_link(self, path, relative_to=None):
-		"""Test if given path is a link"""
-		return False
+				for path, entry in self._get_members(new_only=True):
+					self._write_member(archive, path, entry)
 
-	def exists(self, path, relative_to=None):
-		"""Test if given path exists"""
-		real_path = self.real_path(path, relative_to)
-		return real_path in self._cache or real_path == ''
+		except Exception:
+			# put original central directory back
+			self._handle.truncate(start)
+			self._handle.seek(start)
+
+			with zipfile.ZipFile(AppendWriter(self._handle, start), 'w') as archive:
+				archive.filelist.extend(members)
+				archive.comment = comment
+
+			raise
+
+	def _write_archive(self, raw_file):
+		"""Write all members to new archive in specified file."""
+		with zipfile.ZipFile(raw_file, 'w') as archive:
+			archive.comment = self._zip_file.comment
+
+			for path, entry in self._get_members():
+				self._write_member(archive, path, entry)
+
+	def _is_local_archive(self):
+		"""Check if archive handle belongs to local file at archive path."""
+		try:
+			return os.path.samestat(os.fstat(self._handle.fileno()), os.stat(self._path))
+
+		except (AttributeError, OSError, io.UnsupportedOperation):
+			return False
+
+	def _rewrite_archive(self):
+		"""Write all members to new archive which replaces existing one."""
+		if not self._is_local_archive():
+			self._copy_archive()
+			return
+
+		# new archive is created next to existing one and replaces it once complete
+		handle, temporary_path = tempfile.mkstemp(prefix='.sunflower-', suffix='.zip', dir=os.path.dirname(self._path))
+
+		try:
+			with os.fdopen(handle, 'w+b') as temporary_file:
+				self._write_archive(temporary_file)
+				temporary_file.flush()
+				os.fsync(temporary_file.fileno())
+
+			os.chmod(temporary_path, stat.S_IMODE(os.stat(self._path).st_mode))
+			os.replace(temporary_path, self._path)
+
+		except Exception:
+			if os.path.exists(temporary_path):
+				os.remove(temporary_path)
+
+			raise
+
+		# continue using new file
+		self._zip_file.close()
+		self._handle.close()
+		self._handle = open(self._path, 'a+b')
+
+	def _copy_archive(self):
+		"""Write all members to temporary file and copy it over archive handle.
+
+		This is only used when archive can't be replaced as a file. Failing to
+		copy data back leaves archive damaged.
+
+		"""
+		with tempfile.TemporaryFile(dir=self._get_staging_directory()) as temporary_file:
+			self._write_archive(temporary_file)
+			self._zip_file.close()
+
+			temporary_file.seek(0)
+			self._handle.seek(0)
+			self._handle.truncate(0)
+			shutil.copyfileobj(temporary_file, self._handle, self.buffer_size)
+
+	def commit_changes(self):
+		"""Write all staged changes to archive."""
+		with self._index_lock:
+			if not self._modified:
+				return
+
+			try:
+				if self._rewrite:
+					self._rewrite_archive()
+				else:
+					self._append_members()
 
-	def remove_directory(self, path, recursive, relative_to=None):
-		"""Remove directory and optionally its content"""
-		pass
+				self._handle.flush()
+
+			except Exception:
+				# keep staged changes and continue with archive as it was left,
+				# original error is reported even if archive can't be opened
+				try:
+					if self._zip_file.fp is None:
+						self._zip_file = zipfile.ZipFile(self._handle, 'a')
+
+				except Exception:
+					pass
+
+				raise
+
+			# reload archive, index is created again from new central directory
+			self._zip_file = zipfile.ZipFile(self._handle, 'a')
+			self._index = None
+			self._modified = False
+			self._rewrite = False
+
+			self._remove_staging_directory()
+
+	def _remove_staging_directory(self):
+		"""Remove temporary files of staged members."""
+		if self._staging_directory is not None:
+			shutil.rmtree(self._staging_directory, ignore_errors=True)
+			self._staging_directory = None
+
+	def remove_directory(self, path, relative_to=None):
+		"""Remove directory and its content"""
+		with self._index_lock:
+			self._remove_member(self.real_path(path, relative_to))
 
 	def remove_file(self, path, relative_to=None):
 		"""Remove file"""
-		pass
+		with self._index_lock:
+			self._remove_member(self.real_path(path, relative_to))
 
 	def create_file(self, path, mode=None, relative_to=None):
 		"""Create empty file with specified mode set"""
-		pass
+		with self._index_lock:
+			self._stage_file(self.real_path(path, relative_to), mode)
 
 	def create_directory(self, path, mode=None, relative_to=None):
 		"""Create directory with specified mode set"""
-		pass
+		real_path = self.real_path(path, relative_to)
+
+		with self._index_lock:
+			index = self._get_index()
+
+			if real_path in index:
+				raise OSError(errno.EEXIST, os.strerror(errno.EEXIST), real_path)
+
+			index.add(real_path, ArchiveEntry(0, mode or ArchiveIndex.directory_mode, time.time(), FileType.DIRECTORY))
+			self._modified = True
 
 	def get_file_handle(self, path, mode, relative_to=None):
 		"""Open path in specified mode and return its handle"""
@@ -140,142 +416,76 @@ class ZipProvider(Provider):
 		real_path = self.real_path(path, relative_to)
 
 		if mode is Mode.READ:
-			result = self._zip_file.open(real_path, 'r')
-
-		elif mode is Mode.WRITE:
-			pass
-
-		else:
-			pass
+			# members can be read from multiple threads, reading and decompression
+			# is thread safe but opening is not and archive must not be committed
+			# between member lookup and opening
+			with self._index_lock:
+				entry = self._get_index().get(real_path)
 
-		return result
+				if entry is not None and not isinstance(entry.data, zipfile.ZipInfo) and entry.type is FileType.REGULAR:
+					result = open(entry.data, 'rb')
 
-	def get_stat(self, path, relative_to=None, extended=False, follow=False):
-		"""Return file statistics.
+				else:
+					member = entry.data if entry is not None and entry.data is not None else real_path
+					result = self._zip_file.open(member, 'r')
 
-		This method returns FileInfo or FileInfoExtended objects for specified
-		path. Unless otherwise specified by `follow` parameter this method is not
-		suppose to follow symlinks.
+		elif mode is Mode.WRITE:
+			with self._index_lock:
+				entry = self._stage_file(real_path)
+				result = StagedFile(entry.data, entry)
 
-		"""
-		result = None
-		real_path = self.real_path(path, relative_to)
-		key_name, file_name = os.path.split(real_path)
-
-		if key_name in self._cache:
-			# find file information
-			for stored_file_name, file_info in self._cache[key_name]:
-				if stored_file_name == file_name:
-					result = file_info
-					break
-
-			if extended and result is not None:
-				result = FileInfoExtended(
-							size = result.size,
-							mode = result.mode,
-							i_mode = 0,
-							user_id = result.user_id,
-							group_id = result.group_id,
-							time_access = 0,
-							time_modify = result.time_modify,
-							time_change = 0,
-							time_access_ns = 0,
-							time_modify_ns = result.time_modify * 10**9,
-							time_change_ns = 0,
-							type = result.type,
-							device = 0,
-							inode = 0
-						)
+		return result
 
-		else:
-			# handle invalid files/links
-			if extended:
-				result = FileInfo(
-							size = 0,
-							mode = 0,
-							user_id = 0,
-							group_id = 0,
-							time_modify = 0,
-							type = FileType.INVALID,
-						)
+	def get_storage_key(self, path, relative_to=None):
+		"""Return offset of member in archive."""
+		entry = self._get_index().get(self.real_path(path, relative_to))
 
-			else:
-				result = FileInfoExtended(
-							size = 0,
-							mode = 0,
-							i_mode = 0,
-							user_id = 0,
-							group_id = 0,
-							time_access = 0,
-							time_modify = 0,
-							time_change = 0,
-							time_access_ns = 0,
-							time_modify_ns = 0,
-							time_change_ns = 0,
-							type = FileType.INVALID,
-							device = 0,
-							inode = 0
-						)
+		if entry is None or not isinstance(entry.data, zipfile.ZipInfo):
+			return 0
 
-		return result
+		return entry.data.header_offset
 
-	def get_directory_size(self, path, relative_to=None):
-		"""Return directory size"""
-		pass
+	def set_mode(self, path, mode, relative_to=None):
+		"""Set access mode to specified path"""
+		with self._index_lock:
+			self._change_member(self.real_path(path, relative_to)).mode = mode
 
 	def set_timestamp(self, path, access=None, modify=None, change=None, relative_to=None):
-		"""Set timestamp for specified path"""
-		pass
+		"""Set timestamp for specified path, modify timestamp is in nanoseconds"""
+		if modify is None:
+			return
+
+		with self._index_lock:
+			self._change_member(self.real_path(path, relative_to)).time_modify = modify / 10**9
 
 	def move_path(self, source, destination, relative_to=None):
 		"""Move path on same file system to a different parent node """
-		pass
+		self.rename_path(source, destination, relative_to)
 
 	def rename_path(self, source, destination, relative_to=None):
 		"""Rename file/directory within parents path"""
-		pass
+		real_source = self.real_path(source, relative_to)
+		real_destination = self.real_path(destination, relative_to)
 
-	def list_dir(self, path, relative_to=None):
-		"""Get directory list."""
-		real_path = self.real_path(path, relative_to)
+		with self._index_lock:
+			index = self._get_index()
 
-		# update file cache
-		if len(self._cache) == 0:
-			self._update_cache()
+			if real_source not in index:
+				raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), real_source)
 
-		# get file list
-		result = []
-		if real_path in self._cache:
-			result = [info[0] for info in self._cache[real_path]]
+			if real_destination in index:
+				raise OSError(errno.EEXIST, os.strerror(errno.EEXIST), real_destination)
 
-		return result
+			# parents are added before their children
+			removed = index.remove(real_source)
+			for path, entry in reversed(removed):
+				index.add(real_destination + path[len(real_source):], entry)
 
-	def get_parent(self):
-		"""Return parent list"""
-		return self._parent
+				if isinstance(entry.data, zipfile.ZipInfo):
+					self._rewrite = True
 
-	def get_root_path(self, path):
-		"""Get root for specified path"""
-		return 'file:///' if path.startswith('file://') else os.path.sep
-
-	def get_parent_path(self, path):
-		"""Get parent path for specified"""
-		pass
-
-	def get_system_size(self, path):
-		"""Return system size information."""
-		return SystemSize(
-				block_size = 0,
-				block_total = 0,
-				block_available = 0,
-				size_total = 0,
-				size_available = 0
-			)
+			self._modified = True
 
 	def get_support(self):
 		"""Return supported options by provider"""
-		return (Support.SET_TIMESTAMP, Support.SET_ACCESS)
-
-	def get_protocol_icon(self):
-		"""Returns protocol icon name used in tab title bar"""
-		return self._protocol_icon
+		return (Support.SET_TIMESTAMP, Support.SET_ACCESS, Support.BULK_READ, Support.RANDOM_ACCESS)
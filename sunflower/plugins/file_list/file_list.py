@@ -7,7 +7,8 @@ import sys
 import fnmatch
 
 from gi.repository import GObject, Gtk, Gdk, GLib, Gio
-from threading import Thread, Event
+from collections import deque, OrderedDict
+from threading import Thread, Event, Lock
 
 from .column_editor import FileList_ColumnEditor
 
@@ -23,28 +24,43 @@ from sunflower.plugin_base.monitor import MonitorSignals, MonitorError
 from sunflower.plugin_base.provider import FileType, Mode as FileMode, Support as ProviderSupport
 from sunflower.widgets.thumbnail_view import ThumbnailView
 from sunflower.widgets.emblems_renderer import CellRendererEmblems
+from sunflower.widgets.compact_list_model import CompactListModel
 
 
 class Column:
 	NAME = 0
-	FORMATED_NAME = 1
-	EXTENSION = 2
-	SIZE = 3
-	FORMATED_SIZE = 4
-	MODE = 5
-	FORMATED_MODE = 6
-	TIME = 7
-	FORMATED_TIME = 8
-	IS_DIR = 9
-	IS_PARENT_DIR = 10
-	IS_LINK = 11
-	COLOR = 12
-	ICON = 13
-	SELECTED = 14
-	USER_ID = 15
-	GROUP_ID = 16
-	EMBLEMS = 17
-	SORT_DATA = 18
+	EXTENSION = 1
+	SIZE = 2
+	MODE = 3
+	TIME = 4
+	IS_DIR = 5
+	IS_PARENT_DIR = 6
+	IS_LINK = 7
+	COLOR = 8
+	ICON = 9
+	SELECTED = 10
+	USER_ID = 11
+	GROUP_ID = 12
+	EMBLEMS = 13
+	SORT_DATA = 14
+
+
+# version of column layout stored with tab options, sort column of tabs saved
+# before formatted values were removed from the store needs to be mapped
+COLUMN_LAYOUT = 2
+OLD_SORT_COLUMNS = {
+		0: Column.NAME,
+		1: Column.NAME,
+		2: Column.EXTENSION,
+		3: Column.SIZE,
+		4: Column.SIZE,
+		5: Column.MODE,
+		6: Column.MODE,
+		7: Column.TIME,
+		8: Column.TIME,
+		15: Column.USER_ID,
+		16: Column.GROUP_ID,
+	}
 
 
 class FileList(ItemList):
@@ -58,6 +74,18 @@ class FileList(ItemList):
 	column_editor = None
 	number_split = re.compile('([0-9]+)')
 
+	# number of items added to the list at once while loading directory, batch
+	# size is increased while flushing takes less than a single frame
+	flush_size_min = 100
+	flush_size_max = 10000
+	flush_frame_time = 1 / 60.0
+
+	# maximum number of formatted dates and modes remembered between redraws
+	format_cache_size = 1000
+
+	# number of directories for which parsed `.hidden` files are kept
+	hidden_cache_size = 20
+
 	def __init__(self, parent, notebook, options):
 		ItemList.__init__(self, parent, notebook, options)
 
@@ -66,29 +94,40 @@ class FileList(ItemList):
 		self._sort_column = self._options.get('sort_column', 0)
 		self._sort_ascending = self._options.get('sort_ascending', True)
 
+		# migrate sort column saved with old column layout only once
+		if self._options.get('column_layout') is None:
+			self._sort_column = OLD_SORT_COLUMNS.get(self._sort_column, Column.NAME)
+			self._options.set('column_layout', COLUMN_LAYOUT)
+
 		section = self._parent.options.section('item_list')
 		self._always_visible_items = section.get('always_visible')
+		self._compact_list = section.get('compact_list')
 
 		# event object controlling path change thread
 		self._thread_active = Event()
 		self._main_thread_lock = Event()
 
-		self._item_queue = []
+		self._item_queue = deque()
+		self._flush_size = self.flush_size_min
+		self._flush_pending = False  # flush of item queue is already scheduled
+		self._loading = False
 		self._emblem_cache = {}
+		self._name_index = {}  # relative item name to persistent iter
+		self._directory_sizes = {}  # relative directory name to calculated size
+		self._formated_time = {}
+		self._formated_mode = {}
+		self._hidden_names = OrderedDict()  # (provider, directory) to (time_modify, names)
+		self._hidden_names_lock = Lock()  # cache is used by loading thread and monitor
 
 		# storage system for list items
-		self._store = Gtk.TreeStore(
+		column_types = (
 								# name is a string, but it can contain surrogates,
 								# so it can't be marshalled as a gstring.
 								GObject.TYPE_PYOBJECT,	# Column.NAME
-								str,	# Column.FORMATED_NAME
 								str,	# Column.EXTENSION
 								float,	# Column.SIZE
-								str,	# Column.FORMATED_SIZE
 								int,	# Column.MODE
-								str,	# Column.FORMATED_MODE
 								int,	# Column.DATE
-								str,	# Column.FORMATED_DATE
 								bool,	# Column.IS_DIR
 								bool,	# Column.IS_PARENT_DIR
 								bool,	# Column.IS_LINK
@@ -98,9 +137,18 @@ class FileList(ItemList):
 								int,	# Column.USER_ID
 								int,	# Column.GROUP_ID
 								GObject.TYPE_PYOBJECT,	# Column.EMBLEMS
-								str		# Column.SORT_DATA
+								GObject.TYPE_PYOBJECT	# Column.SORT_DATA
 							)
 
+		if self._compact_list:
+			# flat list with compact storage for very large directories
+			self._store = CompactListModel(column_types, packed_columns=(Column.NAME,))
+			self._store.set_sort_key(self._get_sort_value, self._get_sort_group)
+
+		else:
+			self._store = Gtk.TreeStore(*column_types)
+			self._store.set_sort_func(Column.SORT_DATA, self._sort_func)
+
 		# set item list model
 		self._item_list.set_model(self._store)
 
@@ -165,11 +213,13 @@ class FileList(ItemList):
 		col_name.add_attribute(cell_icon, 'icon-name', Column.ICON)
 		col_name.add_attribute(cell_emblems, 'emblems', Column.EMBLEMS)
 		col_name.add_attribute(cell_emblems, 'is-link', Column.IS_LINK)
-		col_name.add_attribute(cell_name, 'text', Column.FORMATED_NAME)
 		col_extension.add_attribute(cell_extension, 'text', Column.EXTENSION)
-		col_size.add_attribute(cell_size, 'text', Column.FORMATED_SIZE)
-		col_mode.add_attribute(cell_mode, 'text', Column.FORMATED_MODE)
-		col_date.add_attribute(cell_date, 'text', Column.FORMATED_TIME)
+
+		# formatted values are generated only for rows being drawn
+		col_name.set_cell_data_func(cell_name, self._name_data_func)
+		col_size.set_cell_data_func(cell_size, self._size_data_func)
+		col_mode.set_cell_data_func(cell_mode, self._mode_data_func)
+		col_date.set_cell_data_func(cell_date, self._date_data_func)
 
 		col_name.set_resizable(True)
 		col_name.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
@@ -253,6 +303,10 @@ class FileList(ItemList):
 		self._set_font_size(self._columns)
 		self._reorder_columns()
 
+		# rows in compact list are not measured individually
+		if self._compact_list:
+			self._item_list.set_fixed_height_mode(True)
+
 		# release signal block
 		self._item_list.handler_unblock_by_func(self._column_changed)
 
@@ -416,22 +470,35 @@ class FileList(ItemList):
 		self._parent.disk_usage.cancel_all_for_object(self)
 
 	def _handle_emblem_toggle(self, widget, emblem=None):
-		"""Handle toggling emblem for selected item."""
-		selection = self._get_selection(relative=True, files_only=False)
+		"""Handle toggling emblem for selected items."""
+		selection = self._get_selection_list(relative=True)
 		path = self._options.get('path')
-		absolute_path = os.path.join(self._options.get('path'), selection)
 
 		# make sure we have emblem specified
 		if emblem is None:
 			return
 
+		# use item under cursor when nothing is selected
+		if not selection:
+			selection = [self._get_selection(relative=True, files_only=False)]
+
+			if selection[0] is None:
+				return
+
+		# group items by their parent directory
+		items = OrderedDict()
+		for item in selection:
+			item_path, item_name = os.path.split(os.path.join(path, item))
+			items.setdefault(item_path, []).append(item_name)
+
 		# toggle emblem
-		item_path, item_name = os.path.split(absolute_path)
-		self._parent.emblem_manager.toggle_emblem(item_path, item_name, emblem)
+		for item_path, item_names in items.items():
+			self._parent.emblem_manager.toggle_emblem_many(item_path, item_names, emblem)
 
 		# notify monitor about change
 		queue = self.get_monitor().get_queue()
-		queue.put((MonitorSignals.EMBLEM_CHANGED, os.path.join(path, selection), None))
+		for item in selection:
+			queue.put((MonitorSignals.EMBLEM_CHANGED, os.path.join(path, item), None))
 
 		return True
 
@@ -589,8 +656,8 @@ class FileList(ItemList):
 		is_dir = item_list.get_value(selected_iter, Column.IS_DIR)
 		is_parent = item_list.get_value(selected_iter, Column.IS_PARENT_DIR)
 
-		# don't allow expanding parent directory
-		if not is_dir or is_parent:
+		# don't allow expanding parent directory, compact list is always flat
+		if not is_dir or is_parent or self._compact_list:
 			return True
 
 		# show expanders if they are hidden
@@ -598,18 +665,24 @@ class FileList(ItemList):
 			self._show_expanders = True
 			self._item_list.set_show_expanders(True)
 
+		# start loader thread and expand directory
+		self._reload_directory(selected_iter)
+
+		return True
+
+	def _reload_directory(self, parent):
+		"""Remove children of expanded directory and load them again."""
+		name = self._store.get_value(parent, Column.NAME)
+
 		# remove children if directory is already expanded
-		if item_list.iter_has_child(selected_iter):
-			child = item_list.iter_children(selected_iter)
+		if self._store.iter_has_child(parent):
+			child = self._store.iter_children(parent)
 			while child:
 				old_child = child
-				child = item_list.iter_next(old_child)
-				item_list.remove(old_child)
+				child = self._store.iter_next(old_child)
+				self._remove_iter(old_child)
 
-		# start loader thread and expand directory
-		self._load_directory(os.path.join(self.path, name), selected_iter)
-
-		return True
+		self._load_directory(os.path.join(self.path, name), parent)
 
 	def _collapse_directory(self, widget=None, data=None):
 		"""Collapse currently selected directory"""
@@ -655,6 +728,7 @@ class FileList(ItemList):
 
 				# try to create directories
 				self.get_provider().create_directory(response[1], mode, relative_to=self.path)
+				self.get_provider().commit_changes()
 
 				# push monitor event queue
 				event_queue = self.get_monitor_queue()
@@ -722,6 +796,8 @@ class FileList(ItemList):
 				new_file.write(data)
 				new_file.close()
 
+			provider.commit_changes()
+
 			# if specified, edit file after creating it
 			if edit_after:
 				full_path = os.path.join(provider.get_path(), response[1])
@@ -1001,6 +1077,12 @@ class FileList(ItemList):
 				try:
 					# rename selected item
 					self.get_provider().rename_path(selection, result[1], relative_to=self.path)
+					self.get_provider().commit_changes()
+
+					# keep emblems with renamed item
+					self._parent.emblem_manager.move_emblems((
+								(os.path.join(self.path, selection), os.path.join(self.path, result[1])),
+							))
 
 					# mark item for selection after rename
 					self._item_to_focus = result[1]
@@ -1159,7 +1241,7 @@ class FileList(ItemList):
 			mime_type = 'inode/directory'
 
 		else:
-			mime_type = associations_manager.get_mime_type(filename)
+			mime_type = self._parent.icon_manager.get_mime_type_for_file(filename)
 
 			# try to detect by content
 			if associations_manager.is_mime_type_unknown(mime_type):
@@ -1293,77 +1375,131 @@ class FileList(ItemList):
 			selected = column is self._sort_column_widget
 			column.set_sort_indicator(selected)
 
+		# regenerate sort keys on unsorted store to avoid moving rows on each change
+		self._clear_sort_function()
+		self._generate_sort_data()
+
 		# apply sorting function
 		order = [Gtk.SortType.DESCENDING, Gtk.SortType.ASCENDING][self._sort_ascending]
 		self._sort_column_widget.set_sort_order(order)
 		self._store.set_sort_column_id(Column.SORT_DATA, order)
-		self._generate_sort_data()
+
+		# move cursor to previously selected element
+		selection = self._item_list.get_selection()
+		item_list, iter_to_scroll = selection.get_selected()
+		if iter_to_scroll:
+			path_to_scroll = item_list.get_path(iter_to_scroll)
+			self._item_list.scroll_to_cell(path_to_scroll, None, True, 0.5)
 
 	def _clear_sort_function(self):
 		"""Clear sort settings"""
-		self._store.set_sort_column_id(Gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID, True)
+		self._store.set_sort_column_id(Gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID, Gtk.SortType.ASCENDING)
 
-	def _generate_sort_data(self, parent=None, iters=None):
-		"""Generate sort data for all iters in the first level or children of the provided
-		parent. Separate `iters` list is added as a convenience to allow regenerating sort
-		data for specific items in the list."""
-		bool_values = ['1', '0'] if self._sort_ascending else ['0', '1']
+	def _get_sort_key(self, data):
+		"""Return sort key for row data provided as tuple or tree model row.
 
-		# find starting point
-		found_iter = None
-		if parent is None:
-			found_iter = self._store.get_iter_first()
+		Key is a tuple of (is_parent, is_dir, value) where value depends on
+		currently selected sort column and sorting options.
 
-		elif self._store.iter_has_child(parent):
-			found_iter = self._store.iter_children(parent)
+		"""
+		value = data[self._sort_column]
 
-		def generate_data(for_iter):
-			is_dir = self._store.get_value(for_iter, Column.IS_DIR)
-			is_parent = self._store.get_value(for_iter, Column.IS_PARENT_DIR)
-			value = self._store.get_value(for_iter, self._sort_column)
+		if value is None:
+			value = ''
+
+		if isinstance(value, str):
+			if not self._sort_case_sensitive:
+				value = value.lower()
 
+			# split numbers from text so they compare by their value, splitting
+			# always produces text on even and numbers on odd positions
 			if self._sort_number_sensitive and self._sort_column == Column.NAME:
-				value = ''.join([part.rjust(12, '0') if part.isdigit() else part for part in self.number_split.split(value)])
+				parts = self.number_split.split(value)
+				value = tuple(int(part) if index % 2 else part for index, part in enumerate(parts))
 
-			if isinstance(value, str) and not self._sort_case_sensitive:
-				value = value.lower()
+		return (data[Column.IS_PARENT_DIR], data[Column.IS_DIR], value)
+
+	def _get_sort_value(self, data):
+		"""Return part of sort key which depends on sort order."""
+		return self._get_sort_key(data)[2]
 
-			if isinstance(value, int) or isinstance(value, float):
-				value = str(value).rjust(12, '0')
+	def _get_sort_group(self, data):
+		"""Return part of sort key keeping parent and directories on top."""
+		return (not data[Column.IS_PARENT_DIR], not data[Column.IS_DIR])
 
-			return '{}{}{}'.format(bool_values[is_parent], bool_values[is_dir], value)
+	def _generate_sort_data(self, iters=None):
+		"""Generate sort keys for all items in the list. Separate `iters` list is
+		added as a convenience to allow regenerating sort data for specific items."""
+		if self._compact_list:
+			# compact list generates keys while sorting, changed items are only moved
+			for found_iter in iters or ():
+				self._store.update_position(found_iter)
 
-		# collect data for all iters
-		update_data = []
-		while found_iter:
-			update_data.append((found_iter, generate_data(found_iter)))
-			found_iter = self._store.iter_next(found_iter)
+			return
 
-		# process provided list
-		if iters:
-			for found_iter in iters:
-				update_data.append((found_iter, generate_data(found_iter)))
-				found_iter = self._store.iter_next(found_iter)
+		if iters is None:
+			iters = []
+			self._store.foreach(lambda store, path, found_iter: iters.append(found_iter))
 
 		# delayed data update since we can't read and write at the same time
+		update_data = [(found_iter, self._get_sort_key(self._store[found_iter])) for found_iter in iters]
+
 		for item_iter, sort_data in update_data:
 			self._store.set_value(item_iter, Column.SORT_DATA, sort_data)
 
-		# move cursor to previously selected element
-		selection = self._item_list.get_selection()
-		item_list, iter_to_scroll = selection.get_selected()
-		if iter_to_scroll:
-			path_to_scroll = item_list.get_path(iter_to_scroll)
-			self._item_list.scroll_to_cell(path_to_scroll, None, True, 0.5)
+	def _get_row_sort_data(self, data):
+		"""Return sort data to be stored with new row."""
+		return None if self._compact_list else self._get_sort_key(data)
+
+	def _sort_func(self, store, iter1, iter2, data=None):
+		"""Compare two rows using previously generated sort keys."""
+		key1 = store.get_value(iter1, Column.SORT_DATA)
+		key2 = store.get_value(iter2, Column.SORT_DATA)
+
+		# rows are keyed on insertion, but be safe
+		if key1 is None or key2 is None:
+			return (key1 is None) - (key2 is None)
+
+		# parent and directories are always on top regardless of sort order
+		if key1[:2] != key2[:2]:
+			result = -1 if key1[:2] > key2[:2] else 1
+			return result if self._sort_ascending else -result
+
+		return (key1[2] > key2[2]) - (key1[2] < key2[2])
 
 	def _clear_list(self):
 		"""Clear item list."""
-		self._store.clear()
+		if self._compact_list:
+			# avoid notifying view about each removed row
+			self._item_list.set_model(None)
+			self._store.reset()
+			self._item_list.set_model(self._store)
+
+		else:
+			self._store.clear()
+
+		self._name_index.clear()
+		self._directory_sizes.clear()
 
 	def _directory_changed(self, monitor, event, path, other_path, parent=None):
 		"""Callback method fired when contents of directory has been changed."""
 		show_hidden = self._parent.options.section('item_list').get('show_hidden')
 
+		# too many changes at once, load directory again
+		if event is MonitorSignals.DIRECTORY_CHANGED:
+			directory = self._store.get_value(parent, Column.NAME) if parent is not None else None
+			directory = os.path.join(self.path, directory) if directory else self.path
+
+			self._parent.disk_usage.invalidate(directory)
+			self._parent.file_index.update(self.get_provider(), event, directory, None)
+
+			if parent is None:
+				self.refresh_file_list()
+			else:
+				self._reload_directory(parent)
+
+			return True
+
 		# make sure we are working with relative paths
 		if path.startswith(self.path):
 			path = path[len(self.path)+1:]
@@ -1386,17 +1522,27 @@ class FileList(ItemList):
 				fragment = path_fragments.pop(0)
 				parent = self._find_iter_by_name(fragment, parent)
 
-		# check for list of always hidden files
+		# cached directory sizes are no longer valid
+		if event in (MonitorSignals.CREATED, MonitorSignals.MOVED, MonitorSignals.DELETED, MonitorSignals.CHANGED):
+			self._parent.disk_usage.invalidate(os.path.join(self.path, parent_path or '', path))
+
+		# keep file name index up to date
+		directory = os.path.join(self.path, parent_path) if parent_path else self.path
 		provider = self.get_provider()
-		always_hidden = []
+		self._parent.file_index.update(provider, event, directory, path, other_path)
 
-		if not show_hidden and provider.exists('.hidden', relative_to=parent_path):
-			raw_file = provider.get_file_handle('.hidden', FileMode.READ, relative_to=parent_path)
-			always_hidden.extend(raw_file.read().splitlines())
-			raw_file.close()
+		# forget parsed list of hidden files when it changes, destination
+		# of moved item is not yet relative to list path at this point
+		if '.hidden' in (path, os.path.basename(other_path or '')):
+			with self._hidden_names_lock:
+				self._hidden_names.pop((provider, directory), None)
 
-		# override hidden list with always visible items
-		always_hidden = [item for item in always_hidden if item not in self._always_visible_items]
+		# check for list of always hidden files, monitor keeps cached list valid
+		always_hidden = set()
+
+		if not show_hidden:
+			always_hidden = self._get_hidden_names(provider, directory, validate=False)
+			always_hidden = always_hidden.difference(self._always_visible_items)
 
 		# node created
 		should_add = False
@@ -1619,38 +1765,114 @@ class FileList(ItemList):
 		selected = store.get_value(selected_iter, Column.SELECTED)
 		cell.set_property('text', (None, self._selection_indicator)[selected])
 
+	def _name_data_func(self, column, cell, store, selected_iter, data=None):
+		"""Format item name for display."""
+		name = os.path.basename(store.get_value(selected_iter, Column.NAME))
+
+		if not self._show_full_name and not store.get_value(selected_iter, Column.IS_DIR):
+			name = self._split_extension(name)[0]
+
+		cell.set_property('text', common.decode_file_name(name))
+
+	def _size_data_func(self, column, cell, store, selected_iter, data=None):
+		"""Format item size for display."""
+		if store.get_value(selected_iter, Column.IS_DIR):
+			name = store.get_value(selected_iter, Column.NAME)
+			size = self._directory_sizes.get(name)
+
+		else:
+			size = store.get_value(selected_iter, Column.SIZE)
+
+		if size is None:
+			text = '<DIR>'
+		else:
+			text = common.format_size(size, self._size_format, False)
+
+		cell.set_property('text', text)
+
+	def _mode_data_func(self, column, cell, store, selected_iter, data=None):
+		"""Format item access mode for display."""
+		text = None
+
+		if not store.get_value(selected_iter, Column.IS_PARENT_DIR):
+			file_mode = store.get_value(selected_iter, Column.MODE)
+			text = self._formated_mode.get(file_mode)
+
+			if text is None:
+				text = common.format_mode(file_mode, self._mode_format)
+				self._remember_formated(self._formated_mode, file_mode, text)
+
+		cell.set_property('text', text)
+
+	def _date_data_func(self, column, cell, store, selected_iter, data=None):
+		"""Format item modification time for display."""
+		text = None
+
+		if not store.get_value(selected_iter, Column.IS_PARENT_DIR):
+			file_date = store.get_value(selected_iter, Column.TIME)
+			text = self._formated_time.get(file_date)
+
+			if text is None:
+				text = time.strftime(self._time_format, time.localtime(file_date))
+				self._remember_formated(self._formated_time, file_date, text)
+
+		cell.set_property('text', text)
+
+	def _remember_formated(self, cache, value, text):
+		"""Store formatted value in cache while keeping it from growing indefinitely."""
+		if len(cache) >= self.format_cache_size:
+			cache.clear()
+
+		cache[value] = text
+
+	def _split_extension(self, filename):
+		"""Split file name to base name and extension including leading dot."""
+		if not self._second_extension:
+			# regular extension split
+			result = os.path.splitext(filename)
+
+		else:
+			# split with support for second level of extension
+			raw = filename.rsplit('.', 2)
+			result = (raw, '') if len(raw) == 0 else (raw[0], '.{0}'.format('.'.join(raw[1:])))
+
+		return result
+
 	def _find_iter_by_name(self, name, parent=None):
 		""" Find and return item by name"""
-		result = None
-		found_iter = None
+		if parent is not None:
+			name = os.path.join(self._store.get_value(parent, Column.NAME), name)
 
-		# find starting point
-		if parent is None:
-			found_iter = self._store.get_iter_first()
+		return self._name_index.get(name)
 
-		elif self._store.iter_has_child(parent):
-			found_iter = self._store.iter_children(parent)
-			name = os.path.join(self._store.get_value(parent, Column.NAME), name)
+	def _remove_iter(self, found_iter):
+		"""Remove item and its children from the store and name index."""
+		child = self._store.iter_children(found_iter)
+		while child:
+			old_child = child
+			child = self._store.iter_next(old_child)
+			self._remove_iter(old_child)
 
-		# check all the iters for specified name
-		while found_iter:
-			if self._store.get_value(found_iter, Column.NAME) == name:
-				result = found_iter
-				break
+		name = self._store.get_value(found_iter, Column.NAME)
+		self._name_index.pop(name, None)
+		self._directory_sizes.pop(name, None)
+		self._store.remove(found_iter)
 
-			found_iter = self._store.iter_next(found_iter)
+	def _add_item(self, filename, parent=None, parent_path=None, file_stat=None):
+		"""Add item to the list
 
-		return result
+		Optional `file_stat` is used when statistics were already obtained
+		while listing the directory. Provided stats must not follow links.
 
-	def _add_item(self, filename, parent=None, parent_path=None):
-		"""Add item to the list"""
+		"""
 		result = None
 		provider = self.get_provider()
 		full_path = os.path.join(self.path, parent_path) if parent_path else self.path
 		is_link = False
 
 		# get file information
-		file_stat = provider.get_stat(filename, relative_to=full_path)
+		if file_stat is None:
+			file_stat = provider.get_stat(filename, relative_to=full_path)
 
 		# retrieve real information for special files
 		if file_stat.type is FileType.LINK:
@@ -1686,42 +1908,17 @@ class FileList(ItemList):
 			if parent is None:
 				self._files['count'] += 1
 
-		# add item to the list
+		# add item to the list, formatted values are generated when drawing
 		try:
 			# don't allow extension splitting on directories
-			formated_file_mode = common.format_mode(file_mode, self._mode_format)
-			formated_file_date = time.strftime(self._time_format, time.localtime(file_date))
-
-			if not is_dir:
-				if not self._second_extension:
-					# regular extension split
-					file_info = os.path.splitext(filename)
-
-				else:
-					# split with support for second level of extension
-					raw = filename.rsplit('.', 2)
-					file_info = (raw, '') if len(raw) == 0 else (raw[0], '.{0}'.format('.'.join(raw[1:])))
-
-				if self._show_full_name:
-					file_info = (filename, file_info[1])
-
-				formated_file_size = common.format_size(file_size, self._size_format, False)
-
-			else:
-				# item is a directory
-				file_info = (filename, '')
-				formated_file_size = '<DIR>'
+			extension = '' if is_dir else self._split_extension(filename)[1][1:]
 
 			data = (
 					os.path.join(parent_path, filename) if parent_path else filename,
-					common.decode_file_name(file_info[0]),
-					common.decode_file_name(file_info[1][1:]),
+					common.decode_file_name(extension),
 					file_size,
-					formated_file_size,
 					file_mode,
-					formated_file_mode,
 					file_date,
-					formated_file_date,
 					is_dir,
 					False,
 					is_link,
@@ -1731,12 +1928,14 @@ class FileList(ItemList):
 					file_stat.user_id,
 					file_stat.group_id,
 					self._emblem_cache[filename] if filename in self._emblem_cache else None,
-					''
+					None
 				)
 
 			self._item_queue.append(data)
 
-			if len(self._item_queue) == 100:
+			# batch size can shrink below queue length so only one flush is scheduled
+			if len(self._item_queue) >= self._flush_size and not self._flush_pending:
+				self._flush_pending = True
 				Gdk.threads_add_idle(GLib.PRIORITY_HIGH_IDLE, self._flush_queue, parent)
 
 		except Exception as error:
@@ -1746,32 +1945,100 @@ class FileList(ItemList):
 
 	def _flush_queue(self, parent=None):
 		"""Add items in queue to the list"""
-		queued_iters = []
 		path_to_select = None
+		start_time = time.monotonic()
+		self._flush_pending = False
 
-		# add items from the queue
-		for data in self._item_queue:
+		# add items from the queue, loading thread might still be adding new ones
+		for index in range(len(self._item_queue)):
+			data = self._item_queue.popleft()
+			data = data[:Column.SORT_DATA] + (self._get_row_sort_data(data),)
 			new_iter = self._store.append(parent, data)
-			queued_iters.append(new_iter)
+			self._name_index[data[0]] = new_iter
 
 			# focus specified item
 			if self._item_to_focus == data[0]:
 				path_to_select = self._store.get_path(new_iter)
 
-		# schedule sort data update
-		Gdk.threads_add_idle(GLib.PRIORITY_DEFAULT_IDLE, self._generate_sort_data, None, queued_iters)
-
 		# select path if needed
 		if path_to_select is not None:
 			Gdk.threads_add_idle(GLib.PRIORITY_HIGH_IDLE, self._item_list.set_cursor, path_to_select)
 
-		# clear item queue
-		self._item_queue[:] = []
+		# adapt batch size to the time it took to add items
+		if self._loading:
+			flush_time = time.monotonic() - start_time
+
+			if flush_time < self.flush_frame_time:
+				self._flush_size = min(self._flush_size * 10, self.flush_size_max)
+
+			elif flush_time > 2 * self.flush_frame_time:
+				self._flush_size = max(self._flush_size // 10, self.flush_size_min)
 
 		# expand row if needed
 		if parent is not None:
 			self._item_list.expand_row(self._store.get_path(parent), False)
 
+	def _get_hidden_names(self, provider, directory, validate=True):
+		"""Return set of names listed in `.hidden` file of specified directory.
+
+		Parsed files are cached and checked against modification time of the
+		file when `validate` is set. Otherwise cached value is returned without
+		accessing provider, which is used while monitor keeps cache up to date.
+
+		"""
+		key = (provider, directory)
+
+		with self._hidden_names_lock:
+			cached = self._hidden_names.get(key)
+
+		if cached is not None and not validate:
+			return cached[1]
+
+		# get modification time of the file
+		try:
+			file_stat = provider.get_stat('.hidden', relative_to=directory)
+
+		except Exception:
+			file_stat = None
+
+		if file_stat is None or file_stat.type is FileType.INVALID:
+			time_modify = None
+		else:
+			time_modify = file_stat.time_modify
+
+		if cached is not None and cached[0] == time_modify:
+			with self._hidden_names_lock:
+				if key in self._hidden_names:
+					self._hidden_names.move_to_end(key)
+
+			return cached[1]
+
+		# parse the file
+		result = frozenset()
+
+		if time_modify is not None:
+			try:
+				with provider.get_file_handle('.hidden', FileMode.READ, relative_to=directory) as raw_file:
+					data = raw_file.read()
+
+			except Exception:
+				data = b''
+
+			if isinstance(data, bytes):
+				data = data.decode('utf-8', 'surrogateescape')
+
+			result = frozenset(data.splitlines())
+
+		# store result while limiting number of cached directories
+		with self._hidden_names_lock:
+			self._hidden_names[key] = (time_modify, result)
+			self._hidden_names.move_to_end(key)
+
+			while len(self._hidden_names) > self.hidden_cache_size:
+				self._hidden_names.popitem(last=False)
+
+		return result
+
 	def _delete_item_by_name(self, name, parent):
 		"""Removes item with 'name' from the list"""
 		selection = self._item_list.get_selection()
@@ -1805,7 +2072,7 @@ class FileList(ItemList):
 					self._size['selected'] -= item_list.get_value(found_iter, Column.SIZE)
 
 			# remove
-			self._store.remove(found_iter)
+			self._remove_iter(found_iter)
 
 	def _update_item_details_by_name(self, name, parent, parent_path):
 		"""Update item details (size, time, etc.) on changed event"""
@@ -1814,32 +2081,13 @@ class FileList(ItemList):
 
 		if found_iter is not None:
 			# get node stats
-			is_dir = self._store.get_value(found_iter, Column.IS_DIR)
 			path = self.path if parent_path is None else os.path.join(self.path, parent_path)
 			file_stat = provider.get_stat(name, relative_to=path)
 
-			file_size = file_stat.size
-			file_mode = file_stat.mode
-			file_date = file_stat.time_modify
-
-			if not is_dir:
-				# format file size
-				formated_file_size = common.format_size(file_size, self._size_format, False)
-
-			else:
-				# item is a directory
-				formated_file_size = '<DIR>'
-
-			formated_file_mode = common.format_mode(file_mode, self._mode_format)
-			formated_file_date = time.strftime(self._time_format, time.localtime(file_date))
-
 			# update list store
-			self._store.set_value(found_iter, Column.SIZE, file_size)
-			self._store.set_value(found_iter, Column.MODE, file_mode)
-			self._store.set_value(found_iter, Column.TIME, file_date)
-			self._store.set_value(found_iter, Column.FORMATED_SIZE, formated_file_size)
-			self._store.set_value(found_iter, Column.FORMATED_MODE, formated_file_mode)
-			self._store.set_value(found_iter, Column.FORMATED_TIME, formated_file_date)
+			self._store.set_value(found_iter, Column.SIZE, file_stat.size)
+			self._store.set_value(found_iter, Column.MODE, file_stat.mode)
+			self._store.set_value(found_iter, Column.TIME, file_stat.time_modify)
 
 			# regenerate sort data
 			self._generate_sort_data(iters=[found_iter,])
@@ -1854,16 +2102,9 @@ class FileList(ItemList):
 			path = self.path if parent_path is None else os.path.join(self.path, parent_path)
 			file_stat = provider.get_stat(name, relative_to=path)
 
-			file_mode = file_stat.mode
-			file_date = file_stat.time_modify
-			formated_file_mode = common.format_mode(file_mode, self._mode_format)
-			formated_file_date = time.strftime(self._time_format, time.localtime(file_date))
-
 			# update list store
-			self._store.set_value(found_iter, Column.MODE, file_mode)
-			self._store.set_value(found_iter, Column.TIME, file_date)
-			self._store.set_value(found_iter, Column.FORMATED_MODE, formated_file_mode)
-			self._store.set_value(found_iter, Column.FORMATED_TIME, formated_file_date)
+			self._store.set_value(found_iter, Column.MODE, file_stat.mode)
+			self._store.set_value(found_iter, Column.TIME, file_stat.time_modify)
 
 			# regenerate sort data
 			self._generate_sort_data(iters=[found_iter,])
@@ -2080,6 +2321,9 @@ class FileList(ItemList):
 			self._main_thread_lock.set()
 			self._thread_active.clear()
 
+			# don't wait for remaining items of slow listing
+			self.get_provider().cancel_listings(self._change_path_thread.ident)
+
 			while self._main_thread_lock.is_set():
 				Gtk.main_iteration_do(blocking=False)
 
@@ -2091,7 +2335,18 @@ class FileList(ItemList):
 			self._clear_list()
 
 		# clear item queue
-		self._item_queue[:] = []
+		self._item_queue.clear()
+		self._flush_size = self.flush_size_min
+		self._flush_pending = False
+
+		# interrupted loading of top level items didn't get to sort them
+		if self._loading and parent is not None:
+			self._finish_loading()
+
+		# load top level items without sorting, order is applied once at the end
+		self._loading = parent is None
+		if self._loading:
+			self._clear_sort_function()
 
 		# default value for parent path
 		parent_path = None
@@ -2102,10 +2357,11 @@ class FileList(ItemList):
 		# add parent option for parent directory
 		if path != self.get_provider().get_root_path(path):
 			if parent is None:
-				self._store.append(parent, (
-					os.path.pardir, os.path.pardir, '', -2, '<DIR>', -1, '', -1,
-					'', True, True, False, None, 'go-up', None, 0, 0, None, ''
-					))
+				data = (
+					os.path.pardir, '', -2, -1, -1, True, True, False,
+					None, 'go-up', None, 0, 0, None, None
+					)
+				self._store.append(parent, data[:Column.SORT_DATA] + (self._get_row_sort_data(data),))
 
 			else:
 				# prepare full parent path
@@ -2119,56 +2375,63 @@ class FileList(ItemList):
 			# preload emblems for faster operation
 			self._emblem_cache = self._parent.emblem_manager.get_emblems_for_path(path)
 
-			# get initial directory listing
+			provider = self.get_provider()
+			always_hidden = set()
+			focus_found = False
+
+			# get list of always hidden files from the directory file and
+			# override it with always visible items
+			if not show_hidden:
+				always_hidden = self._get_hidden_names(provider, path)
+				always_hidden = always_hidden.difference(self._always_visible_items)
+
+			# add items as they are listed, remote providers deliver them in batches
 			try:
-				provider = self.get_provider()
-				item_list = provider.list_dir(path)
+				for item_name, file_stat in provider.list_dir_info(path):
+					# check if we are allowed to continue as we don't want
+					# items from different directory ending up in our list
+					if not self._thread_active.is_set():
+						break
+
+					# filter out hidden items, backup files and items specified in directory file
+					if not show_hidden:
+						if (item_name[0] == '.' or item_name[-1] == '~') and item_name not in self._always_visible_items:
+							continue
+
+						if item_name in always_hidden:
+							continue
+
+					if item_name == self._item_to_focus:
+						focus_found = True
+
+					# add item to the list
+					self._add_item(item_name, parent, parent_path, file_stat)
 
 			except Exception as error:
 				print('Load directory error: ', str(error))
 
-				# clear locks and exit
+				# show and sort items loaded so far, clear locks and exit
+				Gdk.threads_add_idle(GLib.PRIORITY_HIGH_IDLE, self._flush_queue, parent)
+
+				if parent is None and self._thread_active.is_set():
+					Gdk.threads_add_idle(GLib.PRIORITY_HIGH_IDLE, self._finish_loading)
+
 				self._thread_active.clear()
 				self._main_thread_lock.clear()
 
 				Gdk.threads_add_idle(GLib.PRIORITY_DEFAULT_IDLE, self._title_bar.hide_spinner)
 				return
 
-			# remove hidden files if we don't need them
-			if not show_hidden:
-				always_hidden = []
-
-				# get list of always hidden files from the directory file
-				if provider.exists('.hidden', relative_to=path):
-					raw_file = provider.get_file_handle('.hidden', FileMode.READ, relative_to=path)
-					always_hidden.extend(raw_file.read().splitlines())
-					raw_file.close()
-
-				# override hidden list with always visible items
-				always_hidden = [item for item in always_hidden if item not in self._always_visible_items]
-
-				# filter out hidden items and backup files
-				item_list = [name for name in item_list if (name[0] != '.' and name[-1] != '~') or name in self._always_visible_items]
-
-				# filter out items specified in directory file or program
-				if len(always_hidden) > 0:
-					item_list = [name for name in item_list if name not in always_hidden]
-
-			# assign item for selection
-			if not self._item_to_focus in item_list:
+			# item for selection is not in the list
+			if not focus_found:
 				self._item_to_focus = None
 
-			for item_name in item_list:
-				# check if we are allowed to continue as we don't want
-				# items from different directory ending up in our list
-				if not self._thread_active.is_set():
-					break
-
-				# add item to the list
-				self._add_item(item_name, parent, parent_path)
-
 			Gdk.threads_add_idle(GLib.PRIORITY_HIGH_IDLE, self._flush_queue, parent)
 
+			# apply sorting to loaded items unless loading was interrupted
+			if parent is None and self._thread_active.is_set():
+				Gdk.threads_add_idle(GLib.PRIORITY_HIGH_IDLE, self._finish_loading)
+
 			# hide spinner animation
 			Gdk.threads_add_idle(GLib.PRIORITY_DEFAULT_IDLE, self._title_bar.hide_spinner)
 
@@ -2189,6 +2452,20 @@ class FileList(ItemList):
 		# enable updates on cursor change
 		self._item_list.handler_unblock_by_func(self._handle_cursor_change)
 
+	def _finish_loading(self):
+		"""Leave loading mode and sort all loaded items at once."""
+		self._loading = False
+
+		order = [Gtk.SortType.DESCENDING, Gtk.SortType.ASCENDING][self._sort_ascending]
+		self._store.set_sort_column_id(Column.SORT_DATA, order)
+
+		# keep focused item visible after sorting
+		selection = self._item_list.get_selection()
+		item_list, iter_to_scroll = selection.get_selected()
+		if iter_to_scroll:
+			path_to_scroll = item_list.get_path(iter_to_scroll)
+			self._item_list.scroll_to_cell(path_to_scroll, None, True, 0.5)
+
 	def _update_emblems_by_name(self, name, parent=None, parent_path=None):
 		"""Update emblem list for specified iter in list."""
 		found_iter = self._find_iter_by_name(name, parent)
@@ -2214,14 +2491,14 @@ class FileList(ItemList):
 		if not found_iter:
 			return
 
-		# format total size
+		# store total size
 		name = self._store.get_value(found_iter, Column.NAME)
 		absolute_path = os.path.join(self.path, name)
 		total_count, total_size = self._parent.disk_usage.get(self, absolute_path)
-		formated_size = common.format_size(total_size, self._size_format, False)
+		self._directory_sizes[name] = total_size
 
-		# update list
-		self._store.set_value(found_iter, Column.FORMATED_SIZE, formated_size)
+		# redraw row with new size
+		self._store.row_changed(self._store.get_path(found_iter), found_iter)
 
 	def change_path(self, path=None, selected=None):
 		"""Change file list path."""
@@ -2503,6 +2780,8 @@ class FileList(ItemList):
 		# cache settings
 		self._time_format = section.get('time_format')
 		self._mode_format = section.get('mode_format')
+		self._formated_time.clear()
+		self._formated_mode.clear()
 
 		if plugin_options.has_section(self._name) \
 		and plugin_options.section(self._name).has('columns'):
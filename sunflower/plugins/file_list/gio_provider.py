@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import os
 
 from gi.repository import Gio, GLib
+from threading import Lock, get_ident
 from urllib.parse import unquote
 from .gio_wrapper import File
 from .local_monitor import MonitorError, LocalMonitor
@@ -10,18 +11,72 @@ from sunflower.plugin_base.provider import Provider, FileType, FileInfo, FileInf
 from sunflower.plugin_base.provider import Support
 
 
+# attributes needed to fill FileInfoExtended object
+STAT_ATTRIBUTES = (
+		'standard::name,standard::type,standard::size,'
+		'unix::mode,unix::uid,unix::gid,unix::device,unix::inode,'
+		'time::access,time::modified,time::changed'
+	)
+
+
 class GioProvider(Provider):
-	"""Generic provider for file systems supported by GIO"""
+	"""Generic provider for file systems supported by GIO
+
+	Directories are listed asynchronously in batches. Next batch is requested
+	from the file system while previous one is being processed, so items from
+	remote locations are available as soon as they arrive.
+
+	"""
 	is_local = False
 	protocol = ''
 
+	listing_batch_size = 100  # number of items requested from enumerator at once
+
+	def __init__(self, parent, path=None, selection=None):
+		self._cancellables = {}  # thread identifier to cancellable of running listing
+		self._cancellables_lock = Lock()
+
+		Provider.__init__(self, parent, path, selection)
+
+	def _start_async(self, context, start):
+		"""Start asynchronous call with results delivered to specified context.
+		Returned list will contain result once call is complete.
+
+		"""
+		result = []
+
+		context.push_thread_default()
+		try:
+			start(lambda source, async_result, *data: result.append(async_result))
+
+		finally:
+			context.pop_thread_default()
+
+		return result
+
+	def _finish_async(self, context, pending, finish):
+		"""Wait for asynchronous call to complete and return its result."""
+		while not pending:
+			context.iteration(True)
+
+		return finish(pending[0])
+
+	def _query_info(self, real_path, follow=True):
+		"""Query all needed attributes of path with single call."""
+		flags = (
+				Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+				Gio.FileQueryInfoFlags.NONE
+			)[follow]
+
+		return Gio.File.new_for_commandline_arg(real_path).query_info(STAT_ATTRIBUTES, flags, None)
+
 	def is_file(self, path, relative_to=None):
 		"""Test if given path is file"""
 		result = False
 		real_path = self.real_path(path, relative_to)
 
 		try:
-			info = Gio.File.new_for_commandline_arg(real_path).query_info('standard::type', Gio.FileQueryInfoFlags.NONE, None)
+			info = self._query_info(real_path)
 			result = info.get_file_type() == Gio.FileType.REGULAR
 		except GLib.GError as error:
 			pass
@@ -34,7 +89,7 @@ class GioProvider(Provider):
 		real_path = self.real_path(path, relative_to)
 
 		try:
-			info = Gio.File.new_for_commandline_arg(real_path).query_info('standard::type', Gio.FileQueryInfoFlags.NONE, None)
+			info = self._query_info(real_path)
 			result = info.get_file_type() == Gio.FileType.DIRECTORY
 		except GLib.GError as error:
 			pass
@@ -44,7 +99,7 @@ class GioProvider(Provider):
 	def is_link(self, path, relative_to=None):
 		"""Test if given path is a link"""
 		real_path = self.real_path(path, relative_to)
-		info = Gio.File.new_for_commandline_arg(real_path).query_info('standard::type', Gio.FileQueryInfoFlags.NONE, None)
+		info = self._query_info(real_path, follow=False)
 
 		return info.get_file_type() == Gio.FileType.SYMBOLIC_LINK
 
@@ -117,25 +172,9 @@ class GioProvider(Provider):
 		real_path = self.real_path(path, relative_to)
 		return File(real_path, mode)
 
-	def get_stat(self, path, relative_to=None, extended=False, follow=False):
-		"""Return file statistics"""
-		real_path = self.real_path(path, relative_to)
-
-		try:
-			# try getting file stats
-			flags = (
-					Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
-					Gio.FileQueryInfoFlags.NONE
-				)[follow]
-
-			file_stat = Gio.File.new_for_commandline_arg(real_path).query_info(
-											'standard::size,unix::mode,unix::uid,unix::gid'
-											'time::access,time::modified,time::changed,'
-											'standard::type,unix:device,unix::inode',
-											flags, None
-										)
-
-		except:
+	def _get_file_info(self, file_stat, extended=False):
+		"""Convert Gio.FileInfo object to FileInfo or FileInfoExtended object."""
+		if file_stat is None:
 			# handle invalid files/links
 			if not extended:
 				result = FileInfo(
@@ -213,6 +252,19 @@ class GioProvider(Provider):
 
 		return result
 
+	def get_stat(self, path, relative_to=None, extended=False, follow=False):
+		"""Return file statistics"""
+		real_path = self.real_path(path, relative_to)
+
+		try:
+			# try getting file stats
+			file_stat = self._query_info(real_path, follow)
+
+		except:
+			file_stat = None
+
+		return self._get_file_info(file_stat, extended)
+
 	def set_mode(self, path, mode, relative_to=None):
 		"""Set access mode to specified path"""
 		real_path = self.real_path(path, relative_to)
@@ -291,6 +343,87 @@ class GioProvider(Provider):
 
 		return result
 
+	def list_dir_info(self, path, relative_to=None, extended=False):
+		"""Generate (name, file_info) pairs from single enumeration of children"""
+		real_path = self.real_path(path, relative_to)
+		directory = Gio.File.new_for_commandline_arg(real_path)
+
+		# results of asynchronous calls are delivered to private context
+		context = GLib.MainContext.new()
+		cancellable = Gio.Cancellable()
+		thread = get_ident()
+
+		with self._cancellables_lock:
+			self._cancellables[thread] = cancellable
+
+		def request_batch(callback):
+			enumerator.next_files_async(self.listing_batch_size, GLib.PRIORITY_DEFAULT, cancellable, callback)
+
+		try:
+			pending = self._start_async(context, lambda callback: directory.enumerate_children_async(
+									STAT_ATTRIBUTES,
+									Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+									GLib.PRIORITY_DEFAULT,
+									cancellable,
+									callback
+								))
+
+			try:
+				enumerator = self._finish_async(context, pending, directory.enumerate_children_finish)
+
+			except GLib.GError as error:
+				raise OSError(str(error))
+
+			try:
+				pending = self._start_async(context, request_batch)
+
+				while True:
+					try:
+						batch = self._finish_async(context, pending, enumerator.next_files_finish)
+						pending = None
+
+					except GLib.GError as error:
+						pending = None
+						raise OSError(str(error))
+
+					if not batch:
+						break
+
+					# request next batch while this one is being processed
+					pending = self._start_async(context, request_batch)
+
+					for file_information in batch:
+						yield file_information.get_name(), self._get_file_info(file_information, extended)
+
+			finally:
+				# listing was abandoned, stop pending request before closing
+				if pending is not None:
+					cancellable.cancel()
+
+					while not pending:
+						context.iteration(True)
+
+				enumerator.close(None)
+
+		finally:
+			with self._cancellables_lock:
+				if self._cancellables.get(thread) is cancellable:
+					del self._cancellables[thread]
+
+	def cancel_listings(self, thread=None):
+		"""Cancel directory listings running in thread with specified identifier
+		or all listings if thread is not specified.
+
+		"""
+		with self._cancellables_lock:
+			if thread is None:
+				cancellables = list(self._cancellables.values())
+			else:
+				cancellables = [self._cancellables[thread]] if thread in self._cancellables else []
+
+		for cancellable in cancellables:
+			cancellable.cancel()
+
 	def get_root_path(self, path):
 		"""Get root for specified path"""
 		result = None
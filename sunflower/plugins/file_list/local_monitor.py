@@ -70,6 +70,9 @@ class LocalMonitor(Monitor):
 		if self._monitor is not None:
 			self._monitor.cancel()
 
+		# drop events which were not emitted yet
+		Monitor.cancel(self)
+
 	def is_manual(self):
 		"""Check if monitor solely relies on queues"""
 		return False
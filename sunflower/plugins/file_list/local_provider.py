@@ -3,6 +3,8 @@ from __future__ import absolute_import, print_function
 import os
 import sys
 import stat
+import errno
+import fcntl
 import shutil
 
 from gi.repository import Gio
@@ -11,6 +13,13 @@ from sunflower.plugin_base.provider import Provider, FileType, FileInfo, FileInf
 from sunflower.plugin_base.provider import Support, TrashError
 
 
+# ioctl request for cloning file content on copy-on-write file systems
+FICLONE = 0x40049409
+
+# errors which mean kernel can't copy data between specified files
+KERNEL_COPY_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF)
+
+
 class LocalProvider(Provider):
 	"""Content provider for local files"""
 	is_local = True
@@ -106,17 +115,11 @@ class LocalProvider(Provider):
 		real_mode = ('rb', 'wb', 'ab', 'a+b')[mode]
 		return open(real_path, real_mode)
 
-	def get_stat(self, path, relative_to=None, extended=False, follow=False):
-		"""Return file statistics"""
-		real_path = self.real_path(path, relative_to)
-
-		try:
-			# try getting file stats
-			file_stat = os.lstat(real_path) if not follow else os.stat(real_path)
-
-		except:
+	def _get_file_info(self, file_stat, extended=False):
+		"""Convert result of stat call to FileInfo or FileInfoExtended object."""
+		if file_stat is None:
 			# handle invalid files/links
-			if extended:
+			if not extended:
 				result = FileInfo(
 							size = 0,
 							mode = 0,
@@ -196,6 +199,80 @@ class LocalProvider(Provider):
 
 		return result
 
+	def copy_file_data(self, source_handle, destination_handle, chunk_size):
+		"""Copy data between two open file handles.
+
+		When both handles belong to local files, data is copied by the kernel. File
+		is cloned on file systems which support it, otherwise `copy_file_range` or
+		`sendfile` are used. Regular copying is used as a fallback.
+
+		"""
+		try:
+			source_fd = source_handle.fileno()
+			destination_fd = destination_handle.fileno()
+
+		except (AttributeError, OSError):
+			yield from Provider.copy_file_data(self, source_handle, destination_handle, chunk_size)
+			return
+
+		# make sure nothing is left in write buffer
+		destination_handle.flush()
+
+		# try cloning whole file on copy-on-write file systems
+		try:
+			fcntl.ioctl(destination_fd, FICLONE, source_fd)
+
+		except OSError:
+			pass
+
+		else:
+			yield os.fstat(source_fd).st_size
+			return
+
+		# prepare kernel copy methods in order of preference
+		copy_methods = []
+		if hasattr(os, 'copy_file_range'):
+			copy_methods.append(lambda count: os.copy_file_range(source_fd, destination_fd, count))
+		copy_methods.append(lambda count: os.sendfile(destination_fd, source_fd, None, count))
+
+		for copy_method in copy_methods:
+			try:
+				copied = copy_method(chunk_size)
+
+			except OSError as error:
+				# nothing was copied so we can try next method
+				if error.errno in KERNEL_COPY_ERRORS:
+					continue
+
+				raise
+
+			# some files report no size and appear empty to kernel copy methods,
+			# procfs, sysfs and certain FUSE file systems, so try another method
+			if copied == 0:
+				continue
+
+			while copied:
+				yield copied
+				copied = copy_method(chunk_size)
+
+			return
+
+		# kernel is not able to copy data between these files
+		yield from Provider.copy_file_data(self, source_handle, destination_handle, chunk_size)
+
+	def get_stat(self, path, relative_to=None, extended=False, follow=False):
+		"""Return file statistics"""
+		real_path = self.real_path(path, relative_to)
+
+		try:
+			# try getting file stats
+			file_stat = os.lstat(real_path) if not follow else os.stat(real_path)
+
+		except:
+			file_stat = None
+
+		return self._get_file_info(file_stat, extended)
+
 	def set_mode(self, path, mode, relative_to=None):
 		"""Set access mode to specified path"""
 		real_path = self.real_path(path, relative_to)
@@ -241,6 +318,20 @@ class LocalProvider(Provider):
 		real_path = self.real_path(path, relative_to)
 		return os.listdir(real_path)
 
+	def list_dir_info(self, path, relative_to=None, extended=False):
+		"""Generate (name, file_info) pairs using single directory scan"""
+		real_path = self.real_path(path, relative_to)
+
+		with os.scandir(real_path) as entries:
+			for entry in entries:
+				try:
+					file_stat = entry.stat(follow_symlinks=False)
+
+				except OSError:
+					file_stat = None
+
+				yield entry.name, self._get_file_info(file_stat, extended)
+
 	def get_root_path(self, path):
 		"""Get root for specified path"""
 		return 'file:///' if path.startswith('file://') else os.path.sep
@@ -1,18 +1,160 @@
 from __future__ import absolute_import
 
+import os
+import re
+import stat
+import mmap
+
 from gi.repository import Gtk
 from sunflower.plugin_base.provider import FileType, Mode
 from sunflower.plugin_base.find_extension import FindExtension
 
 
+class ContentMatcher:
+	"""Search file content for specified text or regular expression.
+
+	Matcher holds only compiled search parameters so it can be sent to other
+	processes and called with local file path there.
+
+	"""
+
+	chunk_size = 1024 * 1024  # size of data read at once from non-local files
+	regex_overlap = 64 * 1024  # bytes carried between chunks when matching regular expressions
+	binary_check_size = 8192  # number of leading bytes checked for binary content
+
+	def __init__(self, text, use_regex=False, size_limit=0, skip_binary=False):
+		self._needle = text.encode()
+		self._regex = None
+		self._size_limit = size_limit
+		self._skip_binary = skip_binary
+
+		if use_regex:
+			try:
+				self._regex = re.compile(self._needle, re.MULTILINE)
+
+			except re.error:
+				pass  # invalid expression, search for literal text instead
+
+	def __call__(self, path):
+		"""Check if local file contains pattern."""
+		try:
+			result = self.search_local(path)
+
+		except (IOError, OSError, ValueError):
+			result = False
+
+		return result
+
+	def _is_size_ok(self, size):
+		"""Check if file of specified size should be searched."""
+		return self._size_limit == 0 or size <= self._size_limit
+
+	def _is_binary(self, data):
+		"""Check if data looks like it belongs to binary file."""
+		return b'\0' in data[:self.binary_check_size]
+
+	def _contains(self, data):
+		"""Check if pattern is found in specified data."""
+		if self._regex is not None:
+			return self._regex.search(data) is not None
+
+		return data.find(self._needle) != -1
+
+	def search_local(self, path):
+		"""Search local file by mapping it into memory."""
+		result = False
+
+		# open without blocking so named pipes don't stall the search
+		descriptor = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+
+		try:
+			file_stat = os.fstat(descriptor)
+
+			if not stat.S_ISREG(file_stat.st_mode) or not self._is_size_ok(file_stat.st_size):
+				return False
+
+			# empty files can't be mapped, but also can't contain anything
+			if file_stat.st_size == 0:
+				return self._contains(b'')
+
+			data = mmap.mmap(descriptor, 0, access=mmap.ACCESS_READ)
+
+			try:
+				if not (self._skip_binary and self._is_binary(data)):
+					result = self._contains(data)
+
+			finally:
+				data.close()
+
+		finally:
+			os.close(descriptor)
+
+		return result
+
+	def search_remote(self, provider, path):
+		"""Search file from provider by reading overlapping chunks."""
+		result = False
+		file_stat = provider.get_stat(path, follow=True)
+
+		if file_stat.type is not FileType.REGULAR or not self._is_size_ok(file_stat.size):
+			return False
+
+		# keep enough data from previous chunk to find matches spanning chunk border
+		if self._regex is not None:
+			overlap = self.regex_overlap
+		else:
+			overlap = max(len(self._needle) - 1, 0)
+
+		with provider.get_file_handle(path, Mode.READ) as raw_file:  # make sure file is closed afterwards
+			tail = b''
+			first_chunk = True
+
+			while True:
+				chunk = raw_file.read(self.chunk_size)
+
+				if first_chunk:
+					first_chunk = False
+
+					if self._skip_binary and self._is_binary(chunk):
+						break
+
+				if not chunk:
+					result = self._contains(tail)
+					break
+
+				data = tail + chunk
+				if self._contains(data):
+					result = True
+					break
+
+				tail = data[-overlap:] if overlap else b''
+
+		return result
+
+
 class ContentsFindFiles(FindExtension):
 	"""Extension for finding specified contents in files"""
 
 	def __init__(self, parent):
 		FindExtension.__init__(self, parent)
 
+		self._matcher = None
+
+		# prepare options
+		plugin_options = parent._application.plugin_options
+		self._options = plugin_options.create_section(self.__class__.__name__)
+		self._options.update({
+					'max_size': 0,
+					'skip_binary': True,
+					'regular_expression': False
+				})
+
+		# connect notify signal
+		parent.connect('notify-start', self.__handle_notify_start)
+
 		# create container
-		vbox = Gtk.VBox(False, 0)
+		vbox = Gtk.VBox(False, 5)
+		vbox_text = Gtk.VBox(False, 0)
 
 		viewport = Gtk.ScrolledWindow()
 		viewport.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
@@ -25,34 +167,73 @@ class ContentsFindFiles(FindExtension):
 		self._buffer = Gtk.TextBuffer()
 		self._text_view = Gtk.TextView(buffer=self._buffer)
 
+		# create options
+		self._checkbox_regex = Gtk.CheckButton(_('Regular expression'))
+		self._checkbox_regex.set_active(self._options.get('regular_expression'))
+
+		self._checkbox_skip_binary = Gtk.CheckButton(_('Skip binary files'))
+		self._checkbox_skip_binary.set_active(self._options.get('skip_binary'))
+
+		hbox_size = Gtk.HBox(False, 5)
+
+		label_size = Gtk.Label(label=_('Skip files larger than:'))
+		label_size.set_alignment(0, 0.5)
+		label_size_unit = Gtk.Label(label=_('MB (0 for no limit)'))
+
+		self._adjustment_size = Gtk.Adjustment(value=self._options.get('max_size'), lower=0, upper=1048576, step_incr=1, page_incr=100)
+		self._entry_size = Gtk.SpinButton(adjustment=self._adjustment_size, digits=0)
+
 		# pack interface
 		viewport.add(self._text_view)
 
-		vbox.pack_start(label_content, False, False, 0)
-		vbox.pack_start(viewport, True, True, 0)
+		vbox_text.pack_start(label_content, False, False, 0)
+		vbox_text.pack_start(viewport, True, True, 0)
+
+		hbox_size.pack_start(label_size, False, False, 0)
+		hbox_size.pack_start(self._entry_size, False, False, 0)
+		hbox_size.pack_start(label_size_unit, False, False, 0)
+
+		vbox.pack_start(vbox_text, True, True, 0)
+		vbox.pack_start(self._checkbox_regex, False, False, 0)
+		vbox.pack_start(self._checkbox_skip_binary, False, False, 0)
+		vbox.pack_start(hbox_size, False, False, 0)
 
 		self.container.pack_start(vbox, True, True, 0)
 
+	def __handle_notify_start(self, data=None):
+		"""Prepare search pattern once for the whole search."""
+		text = self._buffer.get_text(*self._buffer.get_bounds(), include_hidden_chars=True)
+		max_size = int(self._entry_size.get_value())
+		use_regex = self._checkbox_regex.get_active()
+		skip_binary = self._checkbox_skip_binary.get_active()
+
+		self._matcher = ContentMatcher(text, use_regex, max_size * 1048576, skip_binary)
+
+		# save options
+		self._options.set('max_size', max_size)
+		self._options.set('skip_binary', skip_binary)
+		self._options.set('regular_expression', use_regex)
+
 	def get_title(self):
 		"""Return i18n title for extension"""
 		return _('Content')
 
+	def get_process_predicate(self):
+		"""Return content matcher for use in separate processes."""
+		return self._matcher
+
 	def is_path_ok(self, provider, path):
 		"""Check if specified path fits the criteria"""
 		result = False
-		file_type = provider.get_stat(path).type
 
-		if file_type is FileType.REGULAR:
-			# get buffer
-			text = self._buffer.get_text(*self._buffer.get_bounds(), include_hidden_chars=True)
+		# try finding content in file
+		try:
+			if provider.protocol == 'file':
+				result = self._matcher.search_local(path)
+			else:
+				result = self._matcher.search_remote(provider, path)
 
-			# try finding content in file
-			try:
-				with provider.get_file_handle(path, Mode.READ) as raw_file:  # make sure file is closed afterwards
-					result = text.encode() in raw_file.read()
-
-			except IOError:
-				pass
+		except (IOError, OSError, ValueError):
+			pass
 
 		return result
-
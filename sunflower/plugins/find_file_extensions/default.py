@@ -114,6 +114,16 @@ class DefaultFindFiles(FindExtension):
 		"""Return i18n title for extension"""
 		return _('Basic')
 
+	def find_in_index(self, file_index, path, recursive):
+		"""Return paths from index matching pattern"""
+		patterns = (self._pattern,) if ';' not in self._pattern else self._pattern.split(';')
+		candidates = file_index.find(path, patterns, recursive)
+
+		if candidates is None:
+			return None
+
+		return [item for item in candidates if self.is_path_ok(None, item)]
+
 	def is_path_ok(self, provider, path):
 		"""Check is specified path fits the cirteria"""
 		result = False
@@ -0,0 +1,77 @@
+from __future__ import absolute_import
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DirectoryWalker:
+	"""Walk through directory tree listing multiple directories at the same time.
+
+	Directories are added for scanning with `add` method and results are
+	obtained by iterating walker object. Each step yields tuple containing
+	directory path, `relative_to` value it was added with, list of (name,
+	file_info) pairs and error raised while listing directory or None.
+
+	Results are yielded in the order directories were added, while listing of
+	following directories is already running in the background. Walker doesn't
+	descend into directories on its own, instead it's up to the caller to add
+	subdirectories it wishes to scan, usually while processing results.
+
+	"""
+	workers = 4  # number of directories listed at the same time
+
+	def __init__(self, provider, abort_event=None, pause_event=None, extended=False):
+		self._provider = provider
+		self._abort = abort_event
+		self._can_continue = pause_event
+		self._extended = extended
+		self._queue = deque()
+
+	def __list_dir(self, path, relative_to):
+		"""Get directory listing along with file information."""
+		try:
+			result = list(self._provider.list_dir_info(path, relative_to=relative_to, extended=self._extended))
+			error = None
+
+		except Exception as list_error:
+			result = []
+			error = list_error
+
+		return result, error
+
+	def __iter__(self):
+		"""Yield directory listings in order directories were added."""
+		running = deque()
+
+		executor = ThreadPoolExecutor(max_workers=self.workers)
+
+		try:
+			while self._queue or running:
+				# keep workers busy while limiting number of pending listings
+				while self._queue and len(running) < 2 * self.workers:
+					path, relative_to = self._queue.popleft()
+					future = executor.submit(self.__list_dir, path, relative_to)
+					running.append((path, relative_to, future))
+
+				if self._abort is not None and self._abort.is_set():
+					break  # abort scanning if requested
+
+				if self._can_continue is not None:
+					self._can_continue.wait()  # pause lock
+
+				path, relative_to, future = running.popleft()
+				item_list, error = future.result()
+
+				yield path, relative_to, item_list, error
+
+		finally:
+			# don't start listings which are no longer needed
+			for path, relative_to, future in running:
+				future.cancel()
+
+			self._queue.clear()
+			executor.shutdown(wait=False)
+
+	def add(self, path, relative_to=None):
+		"""Add directory to the scan queue."""
+		self._queue.append((path, relative_to))
@@ -2,12 +2,23 @@ from __future__ import absolute_import
 
 import os
 
+from collections import OrderedDict
 from threading import Thread, Event, Lock
 from sunflower.plugin_base.monitor import MonitorSignals
+from sunflower.plugin_base.provider import FileType
+from sunflower.tools.directory_walker import DirectoryWalker
 
 
 class DiskUsage:
-	"""Dedicated object for counting disk usage for specified directories."""
+	"""Dedicated object for counting disk usage for specified directories.
+
+	Totals for each scanned directory subtree are cached for the whole application
+	using device, inode and modification time of directory as a key. Cached subtrees
+	are reused by following calculations, from any tab, until monitors report changes
+	inside of them.
+
+	"""
+	cache_size = 100000
 
 	def __init__(self, application):
 		self._stop_events = {}
@@ -15,6 +26,10 @@ class DiskUsage:
 		self._counts = {}
 		self._lock = Lock()
 
+		self._subtree_cache = OrderedDict()  # key to (count, size)
+		self._path_keys = {}  # path to subtree cache key
+		self._key_paths = {}  # subtree cache key to set of paths
+
 	def __update_totals(self, parent_id, path, total_count, total_size):
 		"""Update global dictionaries with new statistics."""
 		key = (parent_id, path)
@@ -24,59 +39,157 @@ class DiskUsage:
 		self._counts[key] = total_count
 		self._lock.release()
 
+	def __get_cache_key(self, stat):
+		"""Return subtree cache key for specified directory statistics."""
+		if not stat.inode:
+			return None  # provider can't uniquely identify directories
+
+		return (stat.device, stat.inode, stat.time_modify_ns)
+
+	def __set_path_key(self, path, key):
+		"""Associate path with subtree cache key. Lock must be held by caller."""
+		self._path_keys[path] = key
+		self._key_paths.setdefault(key, set()).add(path)
+
+	def __forget(self, key):
+		"""Remove cached subtree and paths pointing to it. Lock must be held by caller."""
+		self._subtree_cache.pop(key, None)
+
+		for path in self._key_paths.pop(key, ()):
+			if self._path_keys.get(path) == key:
+				del self._path_keys[path]
+
+	def __get_cached(self, key, path):
+		"""Return cached totals for directory or None."""
+		if key is None:
+			return None
+
+		with self._lock:
+			result = self._subtree_cache.get(key)
+
+			if result is not None:
+				self._subtree_cache.move_to_end(key)
+				self.__set_path_key(path, key)
+
+		return result
+
+	def __store_subtrees(self, directories):
+		"""Calculate and cache totals for all directories from completed scan."""
+		# directories are listed in scan order so children always come after parents,
+		# subtree containing unreadable directory is incomplete up to the root
+		for path, key, parent_index, count, size, complete in reversed(directories[1:]):
+			directories[parent_index][3] += count
+			directories[parent_index][4] += size
+
+			if not complete:
+				directories[parent_index][5] = False
+
+		with self._lock:
+			for path, key, parent_index, count, size, complete in directories:
+				if key is None or not complete:
+					continue
+
+				self._subtree_cache[key] = (count, size)
+				self._subtree_cache.move_to_end(key)
+				self.__set_path_key(path, key)
+
+			# remove least recently used subtrees
+			while len(self._subtree_cache) > self.cache_size:
+				self.__forget(next(iter(self._subtree_cache)))
+
 	def __calculate_usage(self, parent_id, monitor_queue, provider, path, stop_event):
 		"""Threaded method used for calculating disk usage."""
 		total_count = 0
 		total_size = 0
-		scan_list = []
+		item_count = 0
+
+		# check if whole tree is already known
+		key = self.__get_cache_key(provider.get_stat(path, extended=True))
+		cached = self.__get_cached(key, path)
+
+		if cached is not None:
+			total_count, total_size = cached
+			self.__update_totals(parent_id, path, total_count, total_size)
+			monitor_queue.put((MonitorSignals.DIRECTORY_SIZE_CHANGED, path, None), False)
+			monitor_queue.put((MonitorSignals.DIRECTORY_SIZE_STOPPED, path, None), False)
+			stop_event.set()
+			return
+
+		# add initial path for scanning, each directory is stored as
+		# [path, cache key, parent index, count, size, complete] list
+		directories = [[path, key, None, 0, 0, True]]
+		indexes = {path: 0}
 
-		# add initial path for scanning
-		scan_list.append(path)
+		walker = DirectoryWalker(provider, stop_event, extended=True)
+		walker.add(path)
 
 		# loop through all paths and calculate
-		while not stop_event.is_set():
-			# get path for scanning
-			try:
-				scan_path = scan_list.pop(0)
-
-			except IndexError:
-				# no more directories to traverse
-				self.__update_totals(parent_id, path, total_count, total_size)
-				monitor_queue.put((MonitorSignals.DIRECTORY_SIZE_CHANGED, path, None), False)
-				stop_event.set()
+		for scan_path, relative_to, item_list, error in walker:
+			index = indexes.pop(scan_path)
+			directory = directories[index]
+
+			# silently ignore errors but don't cache incomplete directory
+			if error is not None:
+				directory[5] = False
 				continue
 
-			# get list of items in specified directory
-			try:
-				item_list = provider.list_dir(scan_path, relative_to=path)
+			for item, stat in item_list:
+				item_count += 1
 
-			except OSError:
-				# silently ignore errors
-				continue
+				if stat.type is FileType.DIRECTORY:
+					item_path = os.path.join(scan_path, item)
+					key = self.__get_cache_key(stat)
+					cached = self.__get_cached(key, item_path)
 
-			else:
-				relative_path = os.path.join(path, scan_path)
+					if cached is not None:
+						# reuse previously calculated subtree
+						directory[3] += cached[0]
+						directory[4] += cached[1]
+						total_count += cached[0]
+						total_size += cached[1]
 
-			for item in item_list:
-				if provider.is_dir(item, relative_to=relative_path) \
-				and not provider.is_link(item, relative_to=relative_path):
-					# queue up new directory to check
-					scan_list.append(os.path.join(scan_path, item))
+					else:
+						# queue up new directory to check
+						indexes[item_path] = len(directories)
+						directories.append([item_path, key, index, 0, 0, True])
+						walker.add(item_path)
 
 				else:
 					# update total statistics
-					stat = provider.get_stat(item, relative_to=relative_path, extended=False, follow=False)
+					directory[3] += 1
+					directory[4] += stat.size
 					total_count += 1
 					total_size += stat.size
 
 				# update monitor only once in a while
-				if total_count % 50 == 0:
+				if item_count % 50 == 0:
 					self.__update_totals(parent_id, path, total_count, total_size)
 					monitor_queue.put((MonitorSignals.DIRECTORY_SIZE_CHANGED, path, None), False)
 
+		# no more directories to traverse
+		if not stop_event.is_set():
+			self.__store_subtrees(directories)
+			self.__update_totals(parent_id, path, total_count, total_size)
+			monitor_queue.put((MonitorSignals.DIRECTORY_SIZE_CHANGED, path, None), False)
+			stop_event.set()
+
 		# notify monitor we are done
 		monitor_queue.put((MonitorSignals.DIRECTORY_SIZE_STOPPED, path, None), False)
 
+	def invalidate(self, path):
+		"""Remove cached totals for specified path and all of its parents."""
+		with self._lock:
+			while True:
+				key = self._path_keys.get(path)
+				if key is not None:
+					self.__forget(key)
+
+				parent_path = os.path.dirname(path)
+				if parent_path == path or not parent_path:
+					break
+
+				path = parent_path
+
 	def get(self, parent_object, path):
 		"""Get statistics for specified path."""
 		key = (id(parent_object), path)
@@ -0,0 +1,400 @@
+from __future__ import absolute_import
+
+import os
+import re
+import time
+import sqlite3 as sql
+
+from collections import deque
+from threading import Thread, Event, Lock
+from sunflower.common import get_cache_directory
+from sunflower.plugin_base.monitor import MonitorSignals
+from sunflower.plugin_base.provider import FileType
+from sunflower.tools.directory_walker import DirectoryWalker
+
+
+class FileIndex:
+	"""Persistent index of local file names used by find files tool.
+
+	Directory trees are indexed in background thread on request and kept in
+	database in cache directory. Monitor events reported by file lists are
+	queued to the same thread and keep indexed directories up to date while
+	trees which weren't refreshed for a while are scanned again on next request.
+
+	"""
+	batch_size = 500  # number of directories stored in single transaction
+	refresh_interval = 3600  # number of seconds before indexed tree is scanned again
+
+	def __init__(self, application):
+		self._application = application
+		self._connection = None
+		self._full_text = False
+		self._lock = Lock()  # guards database
+
+		self._roots = None  # indexed path to time of last completed scan
+		self._queue_lock = Lock()  # guards queues and worker thread
+		self._requests = deque()
+		self._events = deque()
+		self._thread = None
+		self._stop_event = Event()
+
+	def _connect_to_database(self):
+		"""Create a connection to database."""
+		cache_directory = get_cache_directory()
+
+		# generate database file name
+		if os.path.isdir(cache_directory):
+			database_file = os.path.join(cache_directory, 'sunflower_file_index.db')
+		else:
+			database_file = os.path.expanduser('~/.sunflower_file_index.db')
+
+		# connect to database
+		result = sql.connect(database_file, check_same_thread=False)
+		result.execute('PRAGMA journal_mode=WAL')
+		result.execute('PRAGMA synchronous=NORMAL')
+
+		return result
+
+	def _create_database(self, cursor):
+		"""Create database tables if needed."""
+		cursor.executescript('''
+				CREATE TABLE IF NOT EXISTS roots (
+					path TEXT PRIMARY KEY,
+					time_indexed REAL NOT NULL
+				);
+
+				CREATE TABLE IF NOT EXISTS directories (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					path TEXT NOT NULL UNIQUE
+				);
+
+				CREATE TABLE IF NOT EXISTS files (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					directory INTEGER NOT NULL,
+					name TEXT NOT NULL
+				);
+				CREATE INDEX IF NOT EXISTS files_by_directory ON files(directory, name);
+			''')
+
+		# trigram index allows substring matching without scanning all names
+		try:
+			cursor.executescript('''
+					CREATE VIRTUAL TABLE IF NOT EXISTS file_names
+						USING fts5(name, content='files', content_rowid='id', tokenize='trigram');
+
+					CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+						INSERT INTO file_names(rowid, name) VALUES (new.id, new.name);
+					END;
+
+					CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+						INSERT INTO file_names(file_names, rowid, name) VALUES ('delete', old.id, old.name);
+					END;
+				''')
+			self._full_text = True
+
+		except sql.OperationalError:
+			self._full_text = False  # sqlite was built without fts5 or trigram tokenizer
+
+		self._connection.commit()
+
+	def _get_cursor(self):
+		"""Return new cursor for database, connecting if needed."""
+		if self._connection is None:
+			self._connection = self._connect_to_database()
+			cursor = self._connection.cursor()
+			self._create_database(cursor)
+
+			# load list of indexed trees
+			cursor.execute('SELECT path, time_indexed FROM roots')
+			self._roots = dict(cursor.fetchall())
+
+		return self._connection.cursor()
+
+	def _get_root(self, path):
+		"""Return indexed tree containing specified path or None."""
+		if self._roots is None:
+			self._get_cursor()
+
+		for root in self._roots:
+			if path == root or path.startswith(os.path.join(root, '')):
+				return root
+
+		return None
+
+	def _get_subtree_range(self, path):
+		"""Return path bounds matching all descendants of path."""
+		prefix = os.path.join(path, '')
+		return prefix, prefix[:-1] + chr(ord(os.path.sep) + 1)
+
+	def _get_directory_id(self, cursor, path, create=False):
+		"""Return id of indexed directory."""
+		cursor.execute('SELECT id FROM directories WHERE path=?', (path,))
+		row = cursor.fetchone()
+
+		if row is not None:
+			return row[0]
+
+		if not create:
+			return None
+
+		cursor.execute('INSERT INTO directories(path) VALUES(?)', (path,))
+		return cursor.lastrowid
+
+	def _remove_tree(self, cursor, path):
+		"""Remove directory and all of its descendants from index."""
+		lower, upper = self._get_subtree_range(path)
+		condition = 'path=? OR (path>? AND path<?)'
+
+		cursor.execute('DELETE FROM files WHERE directory IN (SELECT id FROM directories WHERE {0})'.format(condition), (path, lower, upper))
+		cursor.execute('DELETE FROM directories WHERE {0}'.format(condition), (path, lower, upper))
+
+	def _store_directories(self, directories):
+		"""Replace content of scanned directories in index."""
+		with self._lock:
+			cursor = self._get_cursor()
+
+			for path, names in directories:
+				directory_id = self._get_directory_id(cursor, path, create=True)
+
+				cursor.execute('DELETE FROM files WHERE directory=?', (directory_id,))
+				cursor.executemany('INSERT INTO files(directory, name) VALUES(?, ?)', ((directory_id, name) for name in names))
+
+			self._connection.commit()
+
+	def _remove_stale_directories(self, path, scanned):
+		"""Remove directories which were not found during scan of tree."""
+		with self._lock:
+			cursor = self._get_cursor()
+			lower, upper = self._get_subtree_range(path)
+
+			cursor.execute('SELECT path FROM directories WHERE path>? AND path<?', (lower, upper))
+			stale = [row[0] for row in cursor.fetchall() if row[0] not in scanned]
+
+			for directory in stale:
+				self._remove_tree(cursor, directory)
+
+			self._connection.commit()
+
+	def _mark_indexed(self, path):
+		"""Record time of completed scan for tree."""
+		with self._lock:
+			cursor = self._get_cursor()
+			indexed = time.time()
+
+			# new tree replaces trees it contains
+			lower, upper = self._get_subtree_range(path)
+			cursor.execute('DELETE FROM roots WHERE path>? AND path<?', (lower, upper))
+			cursor.execute('INSERT OR REPLACE INTO roots(path, time_indexed) VALUES(?, ?)', (path, indexed))
+			self._connection.commit()
+
+			self._roots = {root: value for root, value in self._roots.items() if not lower < root < upper}
+			self._roots[path] = indexed
+
+	def __index_tree(self, provider, path):
+		"""Scan directory tree and store its content."""
+		walker = DirectoryWalker(provider, self._stop_event)
+		walker.add(path)
+
+		batch = []
+		scanned = set()
+
+		for directory, relative_to, item_list, error in walker:
+			# leave previous content of unreadable directories
+			if error is not None:
+				scanned.add(directory)
+				continue
+
+			batch.append((directory, [name for name, stat in item_list]))
+			scanned.add(directory)
+
+			# symbolic links are not followed to avoid indexing same tree twice
+			for name, stat in item_list:
+				if stat.type is FileType.DIRECTORY:
+					walker.add(os.path.join(directory, name))
+
+			if len(batch) >= self.batch_size:
+				self._store_directories(batch)
+				batch = []
+
+		if self._stop_event.is_set():
+			return
+
+		if batch:
+			self._store_directories(batch)
+
+		self._remove_stale_directories(path, scanned)
+
+		# subtrees of indexed trees don't need to be tracked separately
+		if self._get_root(path) is None or path in self._roots:
+			self._mark_indexed(path)
+
+	def __apply_event(self, provider, event, directory, name, other_name):
+		"""Update indexed directory content based on monitor event."""
+		# too many changes, scan indexed directory again
+		if event is MonitorSignals.DIRECTORY_CHANGED:
+			with self._lock:
+				indexed = self._get_directory_id(self._get_cursor(), directory) is not None
+
+			if indexed:
+				self.index(provider, directory)
+
+			return
+
+		added_path = None
+
+		with self._lock:
+			cursor = self._get_cursor()
+			directory_id = self._get_directory_id(cursor, directory)
+
+			# remove old entry
+			if directory_id is not None and event in (MonitorSignals.DELETED, MonitorSignals.MOVED):
+				cursor.execute('DELETE FROM files WHERE directory=? AND name=?', (directory_id, name))
+				self._remove_tree(cursor, os.path.join(directory, name))
+
+			# moved items can end up in different directory
+			if event is MonitorSignals.MOVED and other_name is not None:
+				if os.path.isabs(other_name):
+					directory = os.path.dirname(other_name)
+					directory_id = self._get_directory_id(cursor, directory)
+
+				name = os.path.basename(other_name)
+
+			# add new entry
+			if directory_id is not None and event in (MonitorSignals.CREATED, MonitorSignals.MOVED):
+				cursor.execute('SELECT id FROM files WHERE directory=? AND name=?', (directory_id, name))
+
+				if cursor.fetchone() is None:
+					cursor.execute('INSERT INTO files(directory, name) VALUES(?, ?)', (directory_id, name))
+
+				added_path = os.path.join(directory, name)
+
+			self._connection.commit()
+
+		# scan content of new directories
+		if added_path is not None and provider.is_dir(added_path) and not provider.is_link(added_path):
+			self.index(provider, added_path)
+
+	def __process_requests(self):
+		"""Threaded method applying monitor events and indexing requested trees one by one."""
+		while True:
+			with self._queue_lock:
+				if self._stop_event.is_set() or not (self._events or self._requests):
+					self._thread = None
+					break
+
+				# events are cheap to apply and keep existing index accurate
+				event = self._events.popleft() if self._events else None
+				request = self._requests.popleft() if event is None else None
+
+			try:
+				if event is not None:
+					self.__apply_event(*event)
+				else:
+					self.__index_tree(*request)
+
+			except sql.Error:
+				pass  # don't let database problems break the application
+
+	def _start_thread(self):
+		"""Start worker thread if needed. Queue lock must be held by caller."""
+		if self._thread is None:
+			self._stop_event.clear()
+			self._thread = Thread(target=self.__process_requests)
+			self._thread.start()
+
+	def _get_literals(self, pattern):
+		"""Return parts of shell pattern which must appear in matching names."""
+		pattern = re.sub(r'\[!?\]?[^\]]*\]', '*', pattern)
+		return [literal for literal in re.split(r'[*?]', pattern) if len(literal) >= 3]
+
+	def index(self, provider, path):
+		"""Schedule indexing of directory tree in background."""
+		if provider.protocol != 'file':
+			return
+
+		with self._queue_lock:
+			if (provider, path) in self._requests:
+				return
+
+			self._requests.append((provider, path))
+			self._start_thread()
+
+	def is_fresh(self, path):
+		"""Check if path is indexed and was scanned recently."""
+		with self._lock:
+			root = self._get_root(path)
+
+			if root is None:
+				return False
+
+			return time.time() - self._roots[root] < self.refresh_interval
+
+	def find(self, path, patterns, recursive=True):
+		"""Return paths from indexed tree which possibly match any of the patterns.
+
+		Patterns are only used to narrow down results, caller is expected to
+		match returned names exactly. If specified path is not indexed None is
+		returned instead.
+
+		"""
+		with self._lock:
+			if self._get_root(path) is None:
+				return None
+
+			cursor = self._get_cursor()
+			result = set()
+
+			# limit search to path and optionally its descendants
+			if recursive:
+				lower, upper = self._get_subtree_range(path)
+				path_condition = '(directories.path=? OR (directories.path>? AND directories.path<?))'
+				path_params = (path, lower, upper)
+
+			else:
+				path_condition = 'directories.path=?'
+				path_params = (path,)
+
+			for pattern in patterns:
+				literals = self._get_literals(pattern)
+
+				if self._full_text and literals:
+					query = ' AND '.join('"{0}"'.format(literal.replace('"', '""')) for literal in literals)
+					cursor.execute(
+							'SELECT directories.path, files.name FROM file_names '
+							'JOIN files ON files.id=file_names.rowid '
+							'JOIN directories ON directories.id=files.directory '
+							'WHERE file_names MATCH ? AND ' + path_condition,
+							(query,) + path_params
+						)
+
+				else:
+					cursor.execute(
+							'SELECT directories.path, files.name FROM files '
+							'JOIN directories ON directories.id=files.directory '
+							'WHERE ' + path_condition,
+							path_params
+						)
+
+				result.update(os.path.join(directory, name) for directory, name in cursor.fetchall())
+
+		return sorted(result)
+
+	def update(self, provider, event, directory, name, other_name=None):
+		"""Queue monitor event to update indexed directory content."""
+		if provider.protocol != 'file' or not self._roots:
+			return
+
+		if event not in (MonitorSignals.CREATED, MonitorSignals.DELETED, MonitorSignals.MOVED, MonitorSignals.DIRECTORY_CHANGED):
+			return
+
+		with self._queue_lock:
+			self._events.append((provider, event, directory, name, other_name))
+			self._start_thread()
+
+	def cancel_all(self):
+		"""Stop indexing and forget pending requests."""
+		with self._queue_lock:
+			self._requests.clear()
+			self._events.clear()
+
+		self._stop_event.set()
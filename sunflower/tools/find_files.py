@@ -3,7 +3,12 @@ from __future__ import absolute_import
 import os
 
 from gi.repository import Gtk, Gdk, Pango, GObject
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context
 from threading import Thread, Event
+from sunflower.plugin_base.provider import FileType
+from sunflower.tools.directory_walker import DirectoryWalker
 
 
 class Column:
@@ -12,6 +17,20 @@ class Column:
 	DIRECTORY = 2
 
 
+_process_predicates = ()
+
+
+def _set_process_predicates(predicates):
+	"""Store extension predicates in worker process."""
+	global _process_predicates
+	_process_predicates = predicates
+
+
+def _test_path(path):
+	"""Test path against all extension predicates in worker process."""
+	return all(predicate(path) for predicate in _process_predicates)
+
+
 class FindFiles(GObject.GObject):
 	"""Find files tool"""
 
@@ -21,6 +40,9 @@ class FindFiles(GObject.GObject):
 				'notify-stop': (GObject.SignalFlags.RUN_LAST, None, ())
 			}
 
+	process_batch_size = 100  # number of results added to the list at once
+	process_pending_limit = 1000  # maximum number of paths waiting to be tested in processes
+
 	def __init__(self, parent, application):
 		GObject.GObject.__init__(self)
 
@@ -104,6 +126,14 @@ class FindFiles(GObject.GObject):
 		self._checkbox_recursive.set_active(True)
 		vbox_search.pack_start(self._checkbox_recursive, False, False, 0)
 
+		self._checkbox_processes = Gtk.CheckButton.new_with_label(_('Use multiple processes for local files'))
+		self._checkbox_processes.set_tooltip_text(_('Check file content on all processor cores'))
+		vbox_search.pack_start(self._checkbox_processes, False, False, 0)
+
+		self._checkbox_index = Gtk.CheckButton.new_with_label(_('Use file name index for local files'))
+		self._checkbox_index.set_tooltip_text(_('Searched directories are indexed in background for faster searches later'))
+		vbox_search.pack_start(self._checkbox_index, False, False, 0)
+
 		# create extensions container
 		hbox = Gtk.HBox.new(False, 0)
 		vbox.pack_start(hbox, True, True, 0)
@@ -225,46 +255,184 @@ class FindFiles(GObject.GObject):
 			self.button_stop.set_sensitive(False)
 			self.spinner.stop()
 
-	def __find_files(self, path, extensions, scan_recursively):
+	def __append_results(self, results):
+		"""Add batch of results to the list."""
+		for row in results:
+			self._list.append(row)
+
+	def __collect_results(self, pending, keep=0):
+		"""Add results of paths tested in worker processes to the list.
+
+		Results are collected in order paths were submitted. Besides already finished
+		tests this method waits for tests until no more than `keep` are pending.
+
+		"""
+		batch = []
+
+		while pending and not self._abort.is_set():
+			future, name, directory = pending[0]
+
+			if not future.done():
+				if len(pending) <= keep:
+					break
+
+				# wait for result while staying responsive to abort requests
+				wait((future,), timeout=0.5)
+				continue
+
+			pending.popleft()
+
+			try:
+				matched = future.result()
+
+			except Exception:
+				matched = False
+
+			if matched:
+				icon = self._application.icon_manager.get_icon_for_file(os.path.join(directory, name))
+				batch.append((icon, name, directory))
+
+			if len(batch) >= self.process_batch_size:
+				GObject.idle_add(self.__append_results, batch)
+				batch = []
+
+		if batch:
+			GObject.idle_add(self.__append_results, batch)
+
+	def __create_process_pool(self, extension_list):
+		"""Split extensions and create process pool for those which support it.
+
+		Returns tuple containing pool or None and list of extensions which need
+		to be tested in search thread.
+
+		"""
+		predicates = []
+		thread_extensions = []
+
+		for extension in extension_list:
+			predicate = extension.get_process_predicate()
+
+			if predicate is None:
+				thread_extensions.append(extension)
+			else:
+				predicates.append(predicate)
+
+		if not predicates:
+			return None, extension_list
+
+		# worker processes are spawned as forking multi-threaded GTK application is not safe,
+		# they execute main module again which doesn't import or start application
+		pool = ProcessPoolExecutor(
+					mp_context=get_context('spawn'),
+					initializer=_set_process_predicates,
+					initargs=(predicates,)
+				)
+
+		return pool, thread_extensions
+
+	def __walk_directories(self, path, scan_recursively):
+		"""Generate (path, name, directory) for each item found by walking directories."""
+		walker = DirectoryWalker(self._provider, self._abort)
+		walker.add(path)
+
+		for directory, relative_to, item_list, error in walker:
+			for name, item_stat in item_list:
+				if self._abort.is_set():
+					break
+
+				item = os.path.join(directory, name)
+
+				# links need to be resolved in order to find out where they point to
+				if item_stat.type is FileType.LINK:
+					is_dir = self._provider.is_dir(item)
+				else:
+					is_dir = item_stat.type is FileType.DIRECTORY
+
+				# extend scan queue with directory content
+				if is_dir and scan_recursively:
+					walker.add(item)
+
+				yield item, name, directory
+
+	def __find_in_index(self, path, extension_list, scan_recursively):
+		"""Try getting candidates from file index.
+
+		Returns tuple containing list of paths or None and list of extensions
+		which still need to test found paths.
+
+		"""
+		file_index = self._application.file_index
+
+		for extension in extension_list:
+			items = extension.find_in_index(file_index, path, scan_recursively)
+
+			if items is not None:
+				return items, [other for other in extension_list if other is not extension]
+
+		return None, extension_list
+
+	def __find_files(self, path, extensions, scan_recursively, use_processes, use_index):
 		"""Threaded find files method."""
-		scan_queue = []
 		extension_list = list(map(lambda child: child.extension, extensions))
+		is_local = self._provider.protocol == 'file'
 
 		self.emit('notify-start')
 		GObject.idle_add(self.__update_status, True)
 
-		# add current path to scan queue
+		# answer name queries from index when possible
+		indexed_items = None
+
+		if use_index and is_local:
+			indexed_items, extension_list = self.__find_in_index(path, extension_list, scan_recursively)
+
+		if indexed_items is not None:
+			candidates = ((item, os.path.basename(item), os.path.dirname(item)) for item in indexed_items)
+		else:
+			candidates = self.__walk_directories(path, scan_recursively)
+
+		# offload expensive checks of local files to worker processes
+		pool = None
+		pending = deque()
+
+		if use_processes and is_local:
+			pool, extension_list = self.__create_process_pool(extension_list)
+
 		try:
-			item_list = self._provider.list_dir(path)
-			item_list = map(lambda new_item: os.path.join(path, new_item), item_list)
-			scan_queue.extend(item_list)
-		except:
-			pass
-
-		# traverse through directories
-		while not self._abort.is_set() and len(scan_queue) > 0:
-			item = scan_queue.pop(0)
-
-			# extend scan queue with directory content
-			if self._provider.is_dir(item) and scan_recursively:
-				try:
-					item_list = self._provider.list_dir(item)
-					item_list = map(lambda new_item: os.path.join(item, new_item), item_list)
-					scan_queue.extend(item_list)
-				except:
-					pass
-
-			match = True
-			for extension in extension_list:
-				match &= extension.is_path_ok(self._provider, item)
-				if not match: break  # no point in testing other extensions
-
-			if match:
-				name = os.path.basename(item)
-				path = os.path.dirname(item)
-				icon = self._application.icon_manager.get_icon_for_file(item)
-
-				self._list.append((icon, name, path))
+			for item, name, directory in candidates:
+				if self._abort.is_set():
+					break
+
+				match = True
+				for extension in extension_list:
+					match &= extension.is_path_ok(self._provider, item)
+					if not match: break  # no point in testing other extensions
+
+				if not match:
+					continue
+
+				if pool is not None:
+					# let worker processes finish testing
+					pending.append((pool.submit(_test_path, item), name, directory))
+					self.__collect_results(pending, self.process_pending_limit)
+
+				else:
+					icon = self._application.icon_manager.get_icon_for_file(item)
+					self._list.append((icon, name, directory))
+
+			# wait for remaining results
+			self.__collect_results(pending)
+
+		finally:
+			if pool is not None:
+				for future, name, directory in pending:
+					future.cancel()
+
+				pool.shutdown(wait=False)
+
+		# build or refresh index in background for following searches
+		if use_index and is_local and not self._abort.is_set():
+			if not self._application.file_index.is_fresh(path):
+				self._application.file_index.index(self._provider, path)
 
 		# update thread status
 		GObject.idle_add(self.__update_status, False)
@@ -365,7 +533,9 @@ class FindFiles(GObject.GObject):
 		params = {
 				'path': path,
 				'extensions': active_extensions,
-				'scan_recursively': self._checkbox_recursive.get_active()
+				'scan_recursively': self._checkbox_recursive.get_active(),
+				'use_processes': self._checkbox_processes.get_active(),
+				'use_index': self._checkbox_index.get_active()
 			}
 		thread = Thread(target=self.__find_files, kwargs=params)
 		thread.start()
@@ -0,0 +1,478 @@
+from __future__ import absolute_import
+
+from array import array
+from gi.repository import Gtk, GObject
+
+
+class PackedColumn:
+	"""Text column storing all values encoded in a single buffer."""
+	__slots__ = ('_buffer', '_starts', '_lengths')
+
+	def __init__(self):
+		self._buffer = bytearray()
+		self._starts = array('Q')
+		self._lengths = array('L')
+
+	def prepare(self, value):
+		return value.encode('utf-8', 'surrogateescape')
+
+	def append(self, row, data):
+		self._starts.append(len(self._buffer))
+		self._lengths.append(len(data))
+		self._buffer.extend(data)
+
+	def get(self, row):
+		start = self._starts[row]
+		return self._buffer[start:start + self._lengths[row]].decode('utf-8', 'surrogateescape')
+
+	def set(self, row, data):
+		# old value is left in buffer and reclaimed when model is cleared
+		self._starts[row] = len(self._buffer)
+		self._lengths[row] = len(data)
+		self._buffer.extend(data)
+
+	def clear(self):
+		self._buffer = bytearray()
+		self._starts = array('Q')
+		self._lengths = array('L')
+
+
+class ArrayColumn:
+	"""Numeric column stored in typed array."""
+	__slots__ = ('_typecode', '_values', '_convert')
+
+	def __init__(self, typecode, convert):
+		self._typecode = typecode
+		self._values = array(typecode)
+		self._convert = convert
+
+	def prepare(self, value):
+		# values are converted the same way as typed columns of Gtk.ListStore do,
+		# for example floating point modification time stored in integer column
+		return self._convert(value)
+
+	def append(self, row, value):
+		self._values.append(value)
+
+	def get(self, row):
+		return self._convert(self._values[row])
+
+	def set(self, row, value):
+		self._values[row] = value
+
+	def clear(self):
+		self._values = array(self._typecode)
+
+
+class InternedColumn:
+	"""Text column with small number of distinct values, like icon names."""
+	__slots__ = ('_indices', '_values', '_lookup')
+
+	def __init__(self):
+		self._indices = array('L')
+		self._values = [None]
+		self._lookup = {None: 0}
+
+	def _get_index(self, value):
+		index = self._lookup.get(value)
+
+		if index is None:
+			index = self._lookup[value] = len(self._values)
+			self._values.append(value)
+
+		return index
+
+	def prepare(self, value):
+		return value
+
+	def append(self, row, value):
+		self._indices.append(self._get_index(value))
+
+	def get(self, row):
+		return self._values[self._indices[row]]
+
+	def set(self, row, value):
+		self._indices[row] = self._get_index(value)
+
+	def clear(self):
+		self._indices = array('L')
+		self._values = [None]
+		self._lookup = {None: 0}
+
+
+class SparseColumn:
+	"""Object column storing only values which are not None."""
+	__slots__ = ('_values',)
+
+	def __init__(self):
+		self._values = {}
+
+	def prepare(self, value):
+		return value
+
+	def append(self, row, value):
+		if value is not None:
+			self._values[row] = value
+
+	def get(self, row):
+		return self._values.get(row)
+
+	def set(self, row, value):
+		if value is None:
+			self._values.pop(row, None)
+		else:
+			self._values[row] = value
+
+	def clear(self):
+		self._values = {}
+
+
+class RowView:
+	"""Lightweight read-only access to row values used while sorting."""
+	__slots__ = ('_model', 'row')
+
+	def __init__(self, model, row=0):
+		self._model = model
+		self.row = row
+
+	def __getitem__(self, column):
+		return self._model._columns[column].get(self.row)
+
+
+class CompactListModel(GObject.Object, Gtk.TreeModel):
+	"""Flat list model keeping column values in compact storage.
+
+	Instead of boxing every value as it's done by `Gtk.ListStore` values are
+	kept in typed arrays, text columns listed in `packed_columns` are encoded
+	into one buffer and other text columns are interned. Object columns store
+	only values which are set. Rows are served to the view on demand.
+
+	Model supports subset of `Gtk.TreeStore` methods, but has no children. Each
+	row has permanent identifier stored in iterators, so iterators stay valid
+	until row is removed or model cleared. Sorting is done with key functions
+	set through `set_sort_key` instead of comparison function.
+
+	"""
+
+	def __init__(self, column_types, packed_columns=()):
+		GObject.Object.__init__(self)
+
+		self._types = []
+		self._columns = []
+		self._order = array('L')  # row identifiers in display order
+		self._positions = array('L')  # row identifier to position in display order
+		self._positions_valid = 0  # positions are up to date for rows before this one
+
+		self._sort_key = None
+		self._sort_group = None
+		self._sort_order = None
+
+		for index, column_type in enumerate(column_types):
+			if index in packed_columns:
+				column = PackedColumn()
+				column_type = GObject.TYPE_PYOBJECT
+
+			elif column_type is bool:
+				column = ArrayColumn('B', bool)
+				column_type = GObject.TYPE_BOOLEAN
+
+			elif column_type is int:
+				column = ArrayColumn('q', int)
+				column_type = GObject.TYPE_INT
+
+			elif column_type is float:
+				column = ArrayColumn('d', float)
+				column_type = GObject.TYPE_DOUBLE
+
+			elif column_type is str:
+				column = InternedColumn()
+				column_type = GObject.TYPE_STRING
+
+			else:
+				column = SparseColumn()
+
+			self._types.append(column_type)
+			self._columns.append(column)
+
+		self._row_count = 0  # number of allocated rows, including removed ones
+
+	def _create_iter(self, row, position=None):
+		"""Create iterator for specified row with optional position hint."""
+		result = Gtk.TreeIter()
+		result.user_data = row + 1
+		result.user_data2 = position + 1 if position is not None else None
+
+		return result
+
+	def _get_row(self, tree_iter):
+		"""Return row identifier from iterator."""
+		return tree_iter.user_data - 1
+
+	def _get_position(self, tree_iter):
+		"""Return current position of row in the list."""
+		row = tree_iter.user_data - 1
+		hint = tree_iter.user_data2
+
+		# position hint is invalidated by sorting and removal of rows
+		if hint is not None and 0 < hint <= len(self._order) and self._order[hint - 1] == row:
+			return hint - 1
+
+		position = self._positions[row]
+		if position < self._positions_valid:
+			return position
+
+		# update positions of rows moved since last lookup
+		for position in range(self._positions_valid, len(self._order)):
+			self._positions[self._order[position]] = position
+
+		self._positions_valid = len(self._order)
+
+		return self._positions[row]
+
+	def _invalidate_positions(self, position):
+		"""Mark positions of rows starting with specified one as outdated."""
+		self._positions_valid = min(self._positions_valid, position)
+
+	def _get_sort_data(self, row_view):
+		"""Return sort group and key for row."""
+		group = self._sort_group(row_view) if self._sort_group is not None else None
+		return group, self._sort_key(row_view)
+
+	def _is_before(self, data1, data2):
+		"""Check if row with first sort data belongs in front of the second one."""
+		if data1[0] != data2[0]:
+			return data1[0] < data2[0]
+
+		if self._sort_order == Gtk.SortType.DESCENDING:
+			return data1[1] > data2[1]
+
+		return data1[1] < data2[1]
+
+	def _find_sorted_position(self, row):
+		"""Find position for row which keeps list sorted."""
+		row_view = RowView(self)
+		row_view.row = row
+		data = self._get_sort_data(row_view)
+
+		low = 0
+		high = len(self._order)
+
+		while low < high:
+			middle = (low + high) // 2
+			row_view.row = self._order[middle]
+
+			if self._is_before(data, self._get_sort_data(row_view)):
+				high = middle
+			else:
+				low = middle + 1
+
+		return low
+
+	def _is_sorted(self):
+		"""Check if rows should be kept in order."""
+		return self._sort_order is not None and self._sort_key is not None
+
+	def do_get_flags(self):
+		return Gtk.TreeModelFlags.LIST_ONLY | Gtk.TreeModelFlags.ITERS_PERSIST
+
+	def do_get_n_columns(self):
+		return len(self._types)
+
+	def do_get_column_type(self, column):
+		return self._types[column]
+
+	def do_get_iter(self, path):
+		indices = path.get_indices()
+
+		if len(indices) == 1 and 0 <= indices[0] < len(self._order):
+			return True, self._create_iter(self._order[indices[0]], indices[0])
+
+		return False, None
+
+	def do_get_path(self, tree_iter):
+		return Gtk.TreePath((self._get_position(tree_iter),))
+
+	def do_get_value(self, tree_iter, column):
+		return self._columns[column].get(self._get_row(tree_iter))
+
+	def do_iter_next(self, tree_iter):
+		position = self._get_position(tree_iter) + 1
+
+		if position >= len(self._order):
+			return False
+
+		tree_iter.user_data = self._order[position] + 1
+		tree_iter.user_data2 = position + 1
+
+		return True
+
+	def do_iter_previous(self, tree_iter):
+		position = self._get_position(tree_iter) - 1
+
+		if position < 0:
+			return False
+
+		tree_iter.user_data = self._order[position] + 1
+		tree_iter.user_data2 = position + 1
+
+		return True
+
+	def do_iter_children(self, parent):
+		if parent is None and len(self._order) > 0:
+			return True, self._create_iter(self._order[0], 0)
+
+		return False, None
+
+	def do_iter_has_child(self, tree_iter):
+		return False
+
+	def do_iter_n_children(self, tree_iter):
+		return len(self._order) if tree_iter is None else 0
+
+	def do_iter_nth_child(self, parent, index):
+		if parent is None and 0 <= index < len(self._order):
+			return True, self._create_iter(self._order[index], index)
+
+		return False, None
+
+	def do_iter_parent(self, child):
+		return False, None
+
+	def append(self, parent, row):
+		"""Add new row to the list. When list is sorted row is inserted in its place."""
+		assert parent is None, 'Compact list model does not support children.'
+
+		# convert all values first so invalid value doesn't leave columns uneven
+		values = [column.prepare(value) for column, value in zip(self._columns, row)]
+
+		new_row = self._row_count
+		self._row_count += 1
+
+		for column, value in zip(self._columns, values):
+			column.append(new_row, value)
+
+		# find where to put new row
+		if self._is_sorted():
+			position = self._find_sorted_position(new_row)
+			self._order.insert(position, new_row)
+
+		else:
+			position = len(self._order)
+			self._order.append(new_row)
+
+		# rows after inserted one have moved, unless it was added to the end
+		self._positions.append(position)
+		if position == self._positions_valid == len(self._order) - 1:
+			self._positions_valid += 1
+		else:
+			self._invalidate_positions(position)
+
+		result = self._create_iter(new_row, position)
+		self.row_inserted(Gtk.TreePath((position,)), result)
+
+		return result
+
+	def remove(self, tree_iter):
+		"""Remove row from the list. Storage is reclaimed once model is cleared."""
+		position = self._get_position(tree_iter)
+		row = self._order.pop(position)
+		self._invalidate_positions(position)
+
+		# free object values right away
+		for column in self._columns:
+			if isinstance(column, SparseColumn):
+				column.set(row, None)
+
+		self.row_deleted(Gtk.TreePath((position,)))
+
+		return False
+
+	def clear(self):
+		"""Remove all rows from the list."""
+		while self._order:
+			self._order.pop()
+			self.row_deleted(Gtk.TreePath((len(self._order),)))
+
+		self.reset()
+
+	def reset(self):
+		"""Remove all rows without notifying views. Model must not be attached
+		to any view when calling this method.
+
+		"""
+		self._order = array('L')
+		self._positions = array('L')
+		self._positions_valid = 0
+		self._row_count = 0
+
+		for column in self._columns:
+			column.clear()
+
+	def set_value(self, tree_iter, column, value):
+		"""Change value of specified column."""
+		column = self._columns[column]
+		column.set(self._get_row(tree_iter), column.prepare(value))
+		self.row_changed(self.get_path(tree_iter), tree_iter)
+
+	def set_sort_key(self, key, group=None):
+		"""Set functions used to sort rows.
+
+		Both functions receive row which can be indexed by column number. Rows are
+		ordered by result of `group` function in ascending order first and by
+		result of `key` function in order specified in `set_sort_column_id`.
+
+		"""
+		self._sort_key = key
+		self._sort_group = group
+
+	def set_sort_column_id(self, column, order):
+		"""Sort rows in specified order. Column is only checked for being unsorted."""
+		if column == Gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID:
+			self._sort_order = None
+			return
+
+		self._sort_order = order
+		if not self._is_sorted() or len(self._order) == 0:
+			return
+
+		# sort row identifiers, stable sorting allows applying group afterwards
+		row_view = RowView(self)
+
+		def get_key(row):
+			row_view.row = row
+			return self._sort_key(row_view)
+
+		def get_group(row):
+			row_view.row = row
+			return self._sort_group(row_view)
+
+		positions = {row: position for position, row in enumerate(self._order)}
+		new_order = sorted(self._order, key=get_key, reverse=order == Gtk.SortType.DESCENDING)
+
+		if self._sort_group is not None:
+			new_order.sort(key=get_group)
+
+		self._order = array('L', new_order)
+		self._invalidate_positions(0)
+		self.rows_reordered(Gtk.TreePath(), None, [positions[row] for row in new_order])
+
+	def update_position(self, tree_iter):
+		"""Move row to keep list sorted after its values have changed."""
+		if not self._is_sorted():
+			return
+
+		position = self._get_position(tree_iter)
+		row = self._order.pop(position)
+		new_position = self._find_sorted_position(row)
+		self._order.insert(new_position, row)
+		self._invalidate_positions(min(position, new_position))
+
+		if new_position == position:
+			return
+
+		# notify views about moved row
+		new_order = list(range(len(self._order)))
+		new_order.pop(position)
+		new_order.insert(new_position, position)
+
+		self.rows_reordered(Gtk.TreePath(), None, new_order)